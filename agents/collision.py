@@ -12,8 +12,6 @@ class Collision(CellAgent):
         self.life_ticks = life_ticks
         self.model = model
         self.cell = cell
-        if cell:
-            cell.add_agent(self)
 
 
     def step(self) -> None:
@@ -22,4 +20,4 @@ class Collision(CellAgent):
             self.destroy()
 
     def destroy(self) -> None:
-        self.model.agents.remove(self)
\ No newline at end of file
+        self.remove()
\ No newline at end of file
@@ -1,21 +1,32 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NamedTuple
 from mesa.discrete_space import CellAgent, Cell
 import logging
-import random
+import math
 
-from agents.obstacle import Obstacle
 from agents.package import Package
 from algorithms.base import DroneAction
 from utils.distance import *
-import math
 import numpy as np
 
 if TYPE_CHECKING:
     from model.model import DroneModel
     from agents.hub import Hub
+    from algorithms.plan import Plan
+
+class Cruise(NamedTuple):
+    """Drone state after several ticks advanced at once by adaptive stepping."""
+    cell: Cell
+    previous_cell: Cell     # cell at the start of the last planned tick
+    previous_altitude: float
+    altitude: float
+    velocity: tuple[int, int, int]
+    ticks: int
+
 
 class Drone(CellAgent):
+    max_cruise_ticks: int = 50      # upper bound of ticks a drone can be advanced at once (see plan_cruise)
+
     def __init__(self, model: DroneModel, cell: Cell = None, assigned_packages: list[Package] = None, hub: Hub = None):
         super().__init__(model)
         self.speed = model.drone_stats.drone_speed
@@ -31,14 +42,21 @@ class Drone(CellAgent):
         self.height = model.drone_stats.drone_height
         self.battery = model.drone_stats.drone_battery
         self.battery_drain_rate = model.drone_stats.battery_drain_rate
+        self.kinematics = model.kinematics
         
         self.strategy = model.strategy
         self.package = None
+        self.target_altitude: float | None = None    # altitude above ground to hold while flying (e.g. a layer by heading)
+        self.target_altitude_cell: Cell | None = None   # target of the leg target_altitude was chosen for
+        self.plan: Plan | None = None       # executable plan from the strategy, see follow_plan
+
+        if cell:    # set before the cell, the grid's occupancy index reads it
+            self.altitude = model.get_elevation(cell.coordinate) + 10 # Note: altitude reffers to the lowest part of the drone (excluding its package's height)
+            self.last_altitude = self.altitude     # altitude at the start of the current tick
+
         self.cell = cell
-        
-        if cell:
-            cell.add_agent(self)
-            self.altitude = model.get_elevation(self.cell.coordinate) + 10 # Note: altitude reffers to the lowest part of the drone (excluding its package's height)
+        self.last_cell: Cell | None = cell     # cell at the start of the current tick, used for swept collision checks
+        self.cruise: Cruise | None = None       # ticks planned ahead by adaptive stepping, applied when the drone wakes up
 
         if assigned_packages is None:
             self.assigned_packages = []
@@ -50,8 +68,58 @@ class Drone(CellAgent):
         self.model: DroneModel = model
 
     def step(self) -> None:
-        output = self.model.strategy.decide(self)
-        action, target = output
+        if not self.wants_decision():
+            self.finish_cruise()
+            return
+
+        self.prepare_decision()
+        output = self.follow_plan()
+        if output is None:
+            output = self.model.planner.decide(self)
+        self.apply(*output)
+
+    def wants_decision(self) -> bool:
+        """Whether the drone decides in this tick (a cruising drone applies the ticks planned by plan_cruise instead)."""
+        return self.cruise is None
+
+    def prepare_decision(self) -> None:
+        """Updates the drone's state before the strategy decides for it."""
+        self.last_cell = self.cell
+        self.last_altitude = self.altitude
+        if len(self.assigned_packages) > 1:
+            order = list(self.assigned_packages)
+            self.model.tours.optimize(self)
+            if self.assigned_packages != order:
+                self.invalidate_plan()
+
+    def follow_plan(self) -> tuple[DroneAction, object] | None:
+        """The next command of the drone's plan, asking the strategy for a new plan when it's done or failed.
+
+        Returns:
+            tuple[DroneAction, object] | None: The command, or None if the strategy has no plan for the drone
+                                               (the drone then asks the strategy to decide). If the tick's
+                                               planning budget is spent, the strategy's fallback command.
+        """
+        for _ in range(2):      # the current plan, then a new one
+            if self.plan is None:
+                if not self.model.planner.can_plan(self):
+                    return self.model.strategy.fallback(self)
+                self.plan = self.model.planner.plan(self)
+                if self.plan is None:
+                    return None
+            output = self.plan.next_action(self)
+            if output is not None:
+                return output
+            self.plan = None
+        return None
+
+    def invalidate_plan(self) -> None:
+        """Drops the drone's plan, e.g. after its assigned packages changed, the strategy plans again on its next decision."""
+        self.plan = None
+        self.model.planner.discard(self)
+
+    def apply(self, action: DroneAction, target) -> None:
+        """Executes the action decided by the strategy."""
         self.last_action = action
 
         if action == DroneAction.MOVE_TO_CELL:
@@ -76,6 +144,10 @@ class Drone(CellAgent):
         if action != DroneAction.REST:
             self.battery -= self.battery_drain_rate
 
+        if (action == DroneAction.MOVE_TO_CELL and self.model.adaptive_stepping
+                and self.strategy.can_skip_decisions(self, action, target)):
+            self.plan_cruise(target)
+
     def __eq__(self, other):
         if other is None:
             return False
@@ -106,28 +178,37 @@ class Drone(CellAgent):
             return distance // 5
 
 
+    def nearby_drones(self, radius: int) -> list[Drone]:
+        """Other drones that may be within radius cells, in the model's order of agents.
+
+        With the model's vertical_separation set, drones that far apart (or further) vertically are left out.
+        """
+        separation = self.model.vertical_separation
+        if separation is None:
+            candidates = self.model.occupancy.nearby(self.cell.coordinate, radius)
+        else:
+            candidates = [drone for drone in self.model.occupancy.nearby(self.cell.coordinate, radius, self.altitude, separation)
+                          if abs(drone.altitude - self.altitude) < separation]
+        return [drone for drone in candidates if drone is not self]
+
     def get_repulsive_vector(self, target_Cell: Cell):
         repulsive_vector = (0,0,0)
         drone_altitude_vector = 0
         if self.cell is None:
             return repulsive_vector, drone_altitude_vector
+        if self.model.density_field is not None:
+            return self.model.density_field.repulsion(self)
         cur_speed = hex_vector_len(self.cur_speed_vec)
-        # breaking_range (sum of arithmetic sequence)
-        max_distance_v = self.speed / 2 * math.ceil(self.speed / self.get_acceleration())
         max_distance_h = 15
 
-        breaking_range = (cur_speed + self.get_acceleration()) / 2 * math.ceil(cur_speed / self.get_acceleration())
-        breaking_range = round(breaking_range * 2.5)
+        breaking_range = self.kinematics.repulsion_range(cur_speed)
 
-        for other_drone in self.model.get_drones():
-            if other_drone.cell is None or other_drone.unique_id == self.unique_id:
-                continue
+        for other_drone in self.nearby_drones(breaking_range):
             drone_distance = hex_distance(self.cell, other_drone.cell)
             drone_altitude_difference = self.altitude - other_drone.altitude
 
             if drone_distance <= breaking_range:
-                weight_v = max(1 - drone_distance/max_distance_v, 0)
-                repulsive_vector = add_hex_vectors(repulsive_vector, normalize_hex_vector(hex_vector(other_drone.cell, self.cell), weight_v*self.get_acceleration()))
+                repulsive_vector = add_hex_vectors(repulsive_vector, self.kinematics.normalize(hex_vector(other_drone.cell, self.cell), self.kinematics.repulsion_magnitude(drone_distance)))
                 
             if drone_distance <= breaking_range:
                 if abs(drone_altitude_difference) < max_distance_h:
@@ -141,6 +222,34 @@ class Drone(CellAgent):
 
         return repulsive_vector, drone_altitude_vector
 
+    def add_ground_repulsion(self, drone_altitude_vector: float, cell: Cell, altitude: float) -> float:
+        """Adds the push away from the min/max flight height (above the given cell) to the altitude vector."""
+        drone_bottom_altitude = altitude - (self.package.height if self.package else 0)
+        min_altitude = self.min_altitude + self.model.get_elevation(cell.coordinate)
+        if drone_bottom_altitude - min_altitude < self.altitude_correct_margin:
+            weight = 1 - max(drone_bottom_altitude - min_altitude, 0) / self.altitude_correct_margin
+            drone_altitude_vector += weight * self.max_ascent_speed[0] * 2        # add more weight to the ascent
+        
+        drone_top_altitude = altitude + self.height
+        max_altitude = self.max_altitude + self.model.get_elevation(cell.coordinate)
+        if max_altitude - drone_top_altitude < self.altitude_correct_margin:
+            weight = 1 - max(max_altitude - drone_top_altitude, 0) / self.altitude_correct_margin
+            drone_altitude_vector -= weight * self.max_descent_speed[0]
+        return drone_altitude_vector
+
+    def add_altitude_hold(self, drone_altitude_vector: float, cell: Cell, altitude: float) -> float:
+        """Adds a gentle climb or descent (at most 1 per tick) towards target_altitude (above the given cell),
+        if the drone has one, so that repulsion from other drones still dominates."""
+        if self.target_altitude is None:
+            return drone_altitude_vector
+        return drone_altitude_vector + float(np.clip(self.target_altitude + self.model.get_elevation(cell.coordinate) - altitude, -1, 1))
+
+    def finish_altitude_vector(self, drone_altitude_vector: float) -> float:
+        """Clips the altitude vector to the ascent/descent limits and adds some noise to it."""
+        drone_altitude_vector = np.clip(drone_altitude_vector, -self.max_descent_speed[0], self.max_ascent_speed[0])
+        drone_altitude_vector += self.model.random.uniform(-0.2, 0.2)    # add some randomness to the height vector
+        return drone_altitude_vector
+
     def move_towards(self, target_cell: Cell,
                      end_speed_percentage: float = 0,
                      repulsive_vectors: bool = True,
@@ -157,14 +266,12 @@ class Drone(CellAgent):
         
         cur_speed = hex_vector_len(self.cur_speed_vec)
         end_speed = round(self.speed * end_speed_percentage)
-        breaking_range = (cur_speed + end_speed)/2 * math.ceil((cur_speed - end_speed) / self.get_acceleration())
+        breaking_range = self.kinematics.braking_distance(cur_speed, end_speed)
         end_speed = max(end_speed, 1)   # we need to make sure it is at least 1
         near_target = hex_distance(self.cell, target_cell) <= round(breaking_range * 1.8 + cur_speed + 5)
 
         max_speed = self.speed      # lower max speed if nearby to other drones/hubs
-        for other_drone in self.model.get_drones():
-            if other_drone.cell is None or other_drone.unique_id == self.unique_id:
-                continue
+        for other_drone in self.nearby_drones(max(5 * self.speed - 1, 10)):     # max_speed_nearby is below speed
             max_speed = min(max_speed, self.max_speed_nearby(hex_distance(self.cell, other_drone.cell)))
         for hub in self.model.get_hubs():
             if hub.cell is None:
@@ -180,27 +287,27 @@ class Drone(CellAgent):
         speed_change =  new_speed - cur_speed
         change_vector = (0,0,0)
         if speed_change > 0:    # speed up towards target
-            target_vector = normalize_hex_vector(hex_vector(self.cell, target_cell), cur_speed)
+            target_vector = self.kinematics.normalize(hex_vector(self.cell, target_cell), cur_speed)
             correct_vector = sub_hex_vectors(target_vector, self.cur_speed_vec)
             if hex_vector_len(correct_vector) <= self.get_acceleration():
-                change_vector = normalize_hex_vector(hex_vector(self.cell, target_cell), speed_change)
+                change_vector = self.kinematics.normalize(hex_vector(self.cell, target_cell), speed_change)
             else:
-                change_vector = normalize_hex_vector(correct_vector, self.get_acceleration())
+                change_vector = self.kinematics.normalize(correct_vector, self.get_acceleration())
 
         elif speed_change < 0:   # slow down, no direction
-            change_vector = reverse_hex_vector(normalize_hex_vector(self.cur_speed_vec, abs(speed_change)))
+            change_vector = reverse_hex_vector(self.kinematics.normalize(self.cur_speed_vec, abs(speed_change)))
 
         elif speed_change == 0:
             if cur_speed <= self.get_acceleration():
                 change_vector = (0,0,0)
-                self.cur_speed_vec = normalize_hex_vector(hex_vector(self.cell, target_cell), cur_speed)
+                self.cur_speed_vec = self.kinematics.normalize(hex_vector(self.cell, target_cell), cur_speed)
             elif cur_speed >= self.speed / 2:
-                target_vector = normalize_hex_vector(hex_vector(self.cell, target_cell), cur_speed)
+                target_vector = self.kinematics.normalize(hex_vector(self.cell, target_cell), cur_speed)
                 correct_vector = sub_hex_vectors(target_vector, self.cur_speed_vec)
                 if hex_vector_len(correct_vector) <= self.get_acceleration():
                     change_vector = (0,0,0)
                 else:
-                    change_vector = normalize_hex_vector(correct_vector, self.get_acceleration())
+                    change_vector = self.kinematics.normalize(correct_vector, self.get_acceleration())
 
         drone_altitude_vector = 0
 
@@ -210,27 +317,16 @@ class Drone(CellAgent):
         if repulsive_vectors:   # add repulsive vectors
             change_vector = add_hex_vectors(change_vector, repulsive_vector)
             change_vector_len = min(hex_vector_len(change_vector), self.get_acceleration())
-            change_vector = normalize_hex_vector(change_vector, change_vector_len)
+            change_vector = self.kinematics.normalize(change_vector, change_vector_len)
 
         if ground_repulsion:    # push the drone if it's too close to min/max height
-            drone_bottom_altitude = self.altitude - (self.package.height if self.package else 0)
-            min_altitude = self.min_altitude + self.model.get_elevation(self.cell.coordinate)
-            if drone_bottom_altitude - min_altitude < self.altitude_correct_margin:
-                weight = 1 - max(drone_bottom_altitude - min_altitude, 0) / self.altitude_correct_margin
-                drone_altitude_vector += weight * self.max_ascent_speed[0] * 2        # add more weight to the ascent
-            
-            drone_top_altitude = self.altitude + self.height
-            max_altitude = self.max_altitude + self.model.get_elevation(self.cell.coordinate)
-            if max_altitude - drone_top_altitude < self.altitude_correct_margin:
-                weight = 1 - max(max_altitude - drone_top_altitude, 0) / self.altitude_correct_margin
-                drone_altitude_vector -= weight * self.max_descent_speed[0]
+            drone_altitude_vector = self.add_ground_repulsion(drone_altitude_vector, self.cell, self.altitude)
+        drone_altitude_vector = self.add_altitude_hold(drone_altitude_vector, self.cell, self.altitude)
 
-        drone_altitude_vector = np.clip(drone_altitude_vector, -self.max_descent_speed[0], self.max_ascent_speed[0])
-        drone_altitude_vector += random.uniform(-0.2, 0.2)    # add some randomness to the height vector
-
-        self.altitude += drone_altitude_vector
+        self.altitude += self.finish_altitude_vector(drone_altitude_vector)
+        self.model.occupancy.on_altitude_change(self)
         new_speed = min(hex_vector_len(add_hex_vectors(self.cur_speed_vec, change_vector)), self.speed)
-        self.cur_speed_vec = normalize_hex_vector(add_hex_vectors(self.cur_speed_vec, change_vector), new_speed)
+        self.cur_speed_vec = self.kinematics.normalize(add_hex_vectors(self.cur_speed_vec, change_vector), new_speed)
 
         cur_coords_hex = xy_to_qrs(self.cell.coordinate)
         move_coords_hex = add_hex_vectors(cur_coords_hex, self.cur_speed_vec)
@@ -239,6 +335,112 @@ class Drone(CellAgent):
         move_cell = self.grid._cells[move_cell_coords]
         self.move_to_cell(move_cell)
 
+    def interaction_range(self) -> int:
+        """Distance within which another drone can affect the movement of a drone flying at full speed
+        (slowdown, see max_speed_nearby, repulsion and the collision distance)."""
+        repulsion_range = self.kinematics.repulsion_range(self.speed)
+        if self.model.density_field is not None:
+            repulsion_range = self.model.density_field.reach
+        return max(5 * self.speed, repulsion_range) + 2
+
+    def safe_horizon(self) -> int:
+        """Number of upcoming ticks in which no other drone or hub can affect the drone's movement.
+
+        Other drones and hubs (which may deploy drones) are assumed to close in at full speed,
+        a drone that is cruising itself may be anywhere on its planned segment.
+        Other hazards (target, terrain, obstacles, battery) are checked tick by tick in plan_cruise.
+        """
+        speed = self.speed
+        drone_range = self.interaction_range()
+        horizon = math.inf
+
+        others = [drone for drone in self.model.get_drones() if drone.cell is not None and drone is not self]
+        if others:
+            coords = np.array([drone.cell.coordinate for drone in others])
+            slack = np.array([hex_distance(drone.cell, drone.cruise.cell) if drone.cruise else 0 for drone in others])
+            distances = hex_distance_batch(np.array(self.cell.coordinate), coords) - slack
+            horizon = min(horizon, (distances.min() - drone_range) // (2 * speed))
+
+        hubs = [hub for hub in self.model.get_hubs() if hub.cell is not None]
+        if hubs:
+            coords = np.array([hub.cell.coordinate for hub in hubs])
+            hub_range = max(drone_range, max(hub.airspace_radius for hub in hubs) + 1)
+            distances = hex_distance_batch(np.array(self.cell.coordinate), coords)
+            horizon = min(horizon, (distances.min() - hub_range) // (2 * speed))
+
+        return int(min(horizon, self.max_cruise_ticks))
+
+    def cruise_tick(self, cell: Cell, altitude: float, velocity: tuple[int, int, int], target_cell: Cell):
+        """One tick of move_towards for a drone flying at full speed with nothing nearby.
+
+        Returns:
+            tuple[Cell, float, tuple[int, int, int]] | None: The new cell, altitude and velocity, or None if the tick
+            needs the full per-tick update (the drone slows down or turns, or hits the map edge, terrain or an obstacle).
+        """
+        cur_speed = hex_vector_len(velocity)
+        if hex_distance(cell, target_cell) <= round(self.kinematics.braking_distance(cur_speed, 0) * 1.8 + cur_speed + 5):
+            return None
+        if cur_speed <= self.get_acceleration():
+            velocity = self.kinematics.normalize(hex_vector(cell, target_cell), cur_speed)
+        elif cur_speed >= self.speed / 2:
+            target_vector = self.kinematics.normalize(hex_vector(cell, target_cell), cur_speed)
+            if hex_vector_len(sub_hex_vectors(target_vector, velocity)) > self.get_acceleration():
+                return None
+
+        velocity = self.kinematics.normalize(velocity, min(hex_vector_len(velocity), self.speed))
+        x, y = qrs_to_xy(add_hex_vectors(xy_to_qrs(cell.coordinate), velocity))
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height) or self.model.is_obstacle((x, y)):
+            return None
+
+        # check the terrain at the lowest altitude the noise can lead to, so that no random number is drawn for a tick
+        # that isn't planned (keeps the random stream the same as with per-tick updates)
+        drone_altitude_vector = self.add_altitude_hold(self.add_ground_repulsion(0, cell, altitude), cell, altitude)
+        lowest_altitude = altitude + max(drone_altitude_vector, -self.max_descent_speed[0]) - 0.2
+        if not self.model.terrain.segment_clear(cell.coordinate, (x, y), lowest_altitude):
+            return None
+        altitude += self.finish_altitude_vector(drone_altitude_vector)
+        return self.grid._cells[(x, y)], altitude, velocity
+
+    def plan_cruise(self, target_cell: Cell) -> None:
+        """Advances the drone over the following ticks in a single update, if they are free of interactions.
+
+        The drone sleeps until the last planned tick and then jumps to its final cell (see finish_cruise),
+        so at the end of every tick its state is at least as safe as with per-tick updates.
+        """
+        if self.cell is None or hex_vector_len(self.cur_speed_vec) != self.speed:
+            return
+        horizon = self.safe_horizon()
+        if horizon < 2:
+            return
+
+        cell, altitude, velocity = self.cell, self.altitude, self.cur_speed_vec
+        previous_cell, previous_altitude = cell, altitude
+        ticks = 0
+        while ticks < horizon and self.battery - (ticks + 1) * self.battery_drain_rate > 0:
+            result = self.cruise_tick(cell, altitude, velocity, target_cell)
+            if result is None:
+                break
+            previous_cell, previous_altitude = cell, altitude
+            cell, altitude, velocity = result
+            ticks += 1
+        if ticks == 0:      # even a single planned tick has to be kept, its random numbers were already drawn
+            return
+
+        self.cruise = Cruise(cell, previous_cell, previous_altitude, altitude, velocity, ticks)
+        self.model.scheduler.sleep_until(self, self.model.steps + ticks)
+
+    def finish_cruise(self) -> None:
+        """Applies the ticks planned by plan_cruise."""
+        cruise, self.cruise = self.cruise, None
+        self.last_cell = cruise.previous_cell
+        self.last_altitude = cruise.previous_altitude
+        self.altitude = cruise.altitude
+        self.cur_speed_vec = cruise.velocity
+        self.battery -= cruise.ticks * self.battery_drain_rate
+        self.last_action = DroneAction.MOVE_TO_CELL
+        self.move_to(cruise.cell)
+        self.model.occupancy.on_altitude_change(self)
+
     def pickup(self, package: Package) -> None:
         if package and package in self.assigned_packages:
             self.package = package
@@ -252,26 +454,24 @@ class Drone(CellAgent):
             self.package.deliver()
             self.package = None     # Don't delete package, its stored as completed in model
 
-    def check_for_collision_with_drone(self, other: Drone) -> bool:
-        if self.altitude > other.altitude:
-            higher_drone_bottom = self.altitude - (self.package.height if self.package else 0)
-            lower_drone_top = other.altitude + other.height
-        else:
-            higher_drone_bottom = other.altitude - (other.package.height if other.package else 0)
-            lower_drone_top = self.altitude + self.height
+    def vertical_contact_range(self, other: Drone) -> tuple[float, float]:
+        """Range of altitude differences (self.altitude - other.altitude) at which the drones overlap vertically,
+        i.e. the bottom of the higher drone (its package) is not above the top of the lower one."""
+        return (-(other.package.height if other.package else 0) - self.height,
+                (self.package.height if self.package else 0) + other.height)
 
-        return higher_drone_bottom <= lower_drone_top
+    def check_for_collision_with_drone(self, other: Drone) -> bool:
+        lowest, highest = self.vertical_contact_range(other)
+        return lowest <= self.altitude - other.altitude <= highest
 
     def check_for_collision_with_terrain(self) -> bool:
-        return self.altitude < self.model.get_elevation(self.cell.coordinate)
+        """Checks the whole segment flown this tick (from last_cell to cell), not only the destination cell."""
+        if self.last_cell is None or self.last_cell is self.cell:
+            return self.altitude < self.model.get_elevation(self.cell.coordinate)
+        return not self.model.terrain.segment_clear(self.last_cell.coordinate, self.cell.coordinate, self.altitude)
 
     def check_for_collision_with_obstacle(self) -> bool:
-        result = False
-        for agent in self.cell.agents:
-            if isinstance(agent, Obstacle):
-                result = True
-                break
-        return result
+        return self.model.is_obstacle(self.cell.coordinate)
 
     def check_for_lack_of_energy(self) -> bool:
         return self.battery <= 0
@@ -281,17 +481,20 @@ class Drone(CellAgent):
             self.hub.incomming_drones.remove(self)
         if self.package is not None:
             self.model.failed_deliveries.append(self.package)   # Don't delete package, its stored as completed in model
-        self.model.agents.remove(self)  
         logging.warning(f"Drone destroyed at {self.cell.coordinate}, id: {self.unique_id}, altitide: {self.altitude}")
+        self.model.tours.forget(self)
+        self.remove()   # also removes the drone from its cell
 
     def ascent(self) -> None:
         self.altitude += self.max_ascent_speed
+        self.model.occupancy.on_altitude_change(self)
 
     def descent(self, elevation) -> None:
         new_altitude = self.altitude - self.max_descent_speed
         if new_altitude < elevation:
             new_altitude = elevation
         self.altitude = new_altitude
+        self.model.occupancy.on_altitude_change(self)
 
     def change_altitude(self, altitude) -> None:
         """
@@ -303,4 +506,5 @@ class Drone(CellAgent):
             altitude_change = min(altitude_change, self.max_ascent_speed)
         else:
             altitude_change = max(altitude_change, -self.max_descent_speed)
-        self.altitude = altitude + altitude_change
\ No newline at end of file
+        self.altitude = altitude + altitude_change
+        self.model.occupancy.on_altitude_change(self)
\ No newline at end of file
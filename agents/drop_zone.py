@@ -5,9 +5,6 @@ class DropZone(CellAgent):
     def __init__(self, model, cell: Cell = None):
         super().__init__(model)
         self.cell = cell
-        
-        if cell:
-            cell.add_agent(self)
 
     def __eq__(self, other):
         if other is None:
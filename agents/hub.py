@@ -6,24 +6,31 @@ from agents.package import Package
 from algorithms.base import HubAction
 from agents.drop_zone import DropZone
 from agents.drone import Drone
+from model.dispatch import RequestQueue
 
 if TYPE_CHECKING:
     from model.model import DroneModel
     
 class Hub(CellAgent):
     """Station for drones: charges them, sends them on missions, and collects them upon return."""
-    package_requests: list[Package] = []
-
     def __init__(self, model: DroneModel, cell: Cell = None, capacity: int = 5):
         super().__init__(model)
+        self.package_requests: RequestQueue = RequestQueue()
         self.stored_drones: list[Drone] = []
         self.incomming_drones: set[Drone] = set()
         self.model: DroneModel = model
         self.cell: Cell = cell
         self.capacity = capacity
+        model.dispatcher.register(self)
+
+        # airspace around the hub that has to be clear of drones before deploying one
+        self.airspace_radius: int = model.drone_stats.drone_acceleration * 2 + 5
+        self.airspace_occupancy: int = 0                # number of airborne drones in the airspace
+        self.docking_queue: dict[Drone, None] = {}      # drones on the hub's cell, in order of arrival
         
         if cell:
-            cell.add_agent(self)
+            self.register_airspace()
+            model.nearest_hubs.invalidate()
     
     def __eq__(self, other):
         if other is None:
@@ -35,25 +42,83 @@ class Hub(CellAgent):
     def __hash__(self):
         return hash(self.unique_id)
 
+    def remove(self) -> None:
+        # while the hub still has its cell
+        self.model.dispatcher.unregister(self)
+        self.unregister_airspace()
+        super().remove()
+        self.model.nearest_hubs.invalidate()
+
+    def has_free_capacity(self) -> bool:
+        """Whether the hub can accept one more drone (stored and incoming drones count against its capacity)."""
+        return self.capacity > len(self.stored_drones) + len(self.incomming_drones)
+
+    def register_airspace(self) -> None:
+        """Subscribes the hub to agents entering and leaving the cells of its airspace."""
+        for cell in self.cell.get_neighborhood(radius=self.airspace_radius, include_center=True):
+            cell.airspace = cell.airspace + (self,)
+            for agent in cell.agents:
+                self.on_agent_enter(agent, cell)
+
+    def unregister_airspace(self) -> None:
+        """Unsubscribes the hub from the cells of its airspace, e.g. when it's removed."""
+        for cell in self.cell.get_neighborhood(radius=self.airspace_radius, include_center=True):
+            cell.airspace = tuple(hub for hub in cell.airspace if hub is not self)
+        self.airspace_occupancy = 0
+        self.docking_queue.clear()
+
+    def on_agent_enter(self, agent: CellAgent, cell: Cell) -> None:
+        if not isinstance(agent, Drone):
+            return
+        self.airspace_occupancy += 1
+        if cell is self.cell:
+            self.docking_queue[agent] = None
+
+    def on_agent_leave(self, agent: CellAgent, cell: Cell) -> None:
+        if not isinstance(agent, Drone):
+            return
+        self.airspace_occupancy -= 1
+        if cell is self.cell:
+            self.docking_queue.pop(agent, None)
+
     def step(self):
-        action, target = self.model.strategy.decide(self)
+        self.prepare_decision()
+        self.apply(*self.model.strategy.decide(self))
+
+    def wants_decision(self) -> bool:
+        return True
 
+    def prepare_decision(self) -> None:
+        pass
+
+    def apply(self, action: HubAction, target) -> None:
+        """Executes the action decided by the strategy."""
         if action == HubAction.DEPLOY_DRONE:
-            drone = self.stored_drones.pop()
+            dispatch = self.model.dispatcher.dispatch(self)
+            if dispatch is None:
+                return
+            drone, package = dispatch
             drone.cell = self.cell
-            drone.assigned_packages=[Hub.package_requests.pop()]
+            drone.last_cell, drone.last_altitude = drone.cell, drone.altitude     # takes off from the hub
+            drone.assigned_packages = [package]
+            drone.invalidate_plan()
+            self.model.scheduler.wake(drone)
 
         elif action == HubAction.COLLECT_DRONE:
-            self.stored_drones.append(target)
-            self.incomming_drones.remove(target)
+            if target.cell is not self.cell:    # left since the decision (see DroneModel.decide_and_apply)
+                return
+            self.model.dispatcher.store(self, target)
+            if target.hub is not None:      # the drone may have been heading to another hub
+                target.hub.incomming_drones.discard(target)
             target.cell = None
             target.hub = None
+            self.model.tours.forget(target)
+            self.model.scheduler.sleep(target)     # stored drones have nothing to do until deployed
 
         elif action == HubAction.CREATE_DELIVERY_REQUEST:
-            empty_cells = [c for c in self.model.grid.all_cells.cells if len(c.agents) == 0]
+            empty_cells = self.model.empty_cells.sample(2, self.model.random)
             if len(empty_cells) < 2:
                 return
-            self.model.random.shuffle(empty_cells)
             package = Package(
                 model=self.model,
                 cell=empty_cells[0],
@@ -61,7 +126,7 @@ class Hub(CellAgent):
                 weight=1,
                 height=0.1,
             )
-            Hub.package_requests.append(package)
+            self.model.dispatcher.submit(self, package)
 
         elif action == HubAction.WAIT:
             pass
\ No newline at end of file
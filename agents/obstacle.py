@@ -12,5 +12,5 @@ class Obstacle(CellAgent):
         self.cell = cell
 
         if cell:
-            cell.add_agent(self)
+            model.set_obstacle(cell.coordinate)
         
\ No newline at end of file
@@ -15,9 +15,6 @@ class Package(CellAgent):
         self.weight = weight
         self.drop_zone = drop_zone
         self.model: DroneModel = model
-        
-        if cell:
-            cell.add_agent(self)
 
     def __eq__(self, other):
         if other is None:
@@ -30,7 +27,8 @@ class Package(CellAgent):
         return hash(self.unique_id)
     
     def deliver(self):
-        self.model.agents.remove(self.drop_zone)
+        self.drop_zone.remove()
         self.model.completed_deliveries.append(self)
+        self.remove()   # delivered packages are only kept by the model's delivery log
     
     
\ No newline at end of file
@@ -6,6 +6,7 @@ from enum import Enum, auto
 if TYPE_CHECKING:
     from model.model import DroneModel
     from agents.drone import Drone
+    from algorithms.plan import Plan
 
 class DroneAction(Enum):
     """The set of low-level commands a drone can execute."""
@@ -44,10 +45,49 @@ class Strategy(ABC):
         """Called by a drone every step to get its command."""
         pass
 
+    def decide_all(self, agents: list) -> list[tuple]:
+        """
+        Commands of several agents, decided on the same snapshot of the model
+        (see DroneModel batched_decisions). Strategies can override it to decide
+        in bulk, by default decide is called for every agent.
+        """
+        return [self.decide(agent) for agent in agents]
+
     
+    def plan(self, drone: Drone) -> Plan | None:
+        """
+        An optional executable plan for the drone (see algorithms.plan), followed by
+        the drone without calling decide until it's completed, fails or is invalidated.
+        None means the drone asks decide every tick.
+        """
+        return None
+
+    def fallback(self, drone: Drone):
+        """
+        A cheap command for a drone whose decision or plan was deferred because the
+        tick's time budget is spent (see DroneModel tick_budget). Holds position by default.
+        """
+        return DroneAction.WAIT, drone.cell
+
     def step(self):
         """
         An optional global step for the strategy,
         run *before* any drones make a decision.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def can_skip_decisions(self, drone: Drone, action: DroneAction, target) -> bool:
+        """
+        Whether decide(drone) keeps returning the same (action, target) for as long
+        as the drone cruises towards the target without reaching it, so the drone may be
+        advanced over several ticks at once (see DroneModel adaptive_stepping).
+        """
+        return False
+
+    def next_event_tick(self) -> int | None:
+        """
+        An optional hint for time skipping: the earliest future tick at which
+        the strategy acts on its own while no drone is airborne (e.g. a new
+        delivery request). None means the strategy can't tell, so no ticks are skipped.
+        """
+        return None
\ No newline at end of file
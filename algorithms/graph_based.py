@@ -4,7 +4,6 @@ import heapq
 from typing import TYPE_CHECKING, Optional, Callable
 
 from agents.drop_zone import DropZone
-from agents.obstacle import Obstacle
 from agents.package import Package
 from algorithms.base import Strategy, HubAction, DroneAction
 from mesa.discrete_space import Cell
@@ -58,6 +57,14 @@ class GraphBased(Strategy):
 
     def decide(self, agent):
         self._create_adjacency_matrix()
+        return self._decide(agent)
+
+    def decide_all(self, agents):
+        # the adjacency matrix only depends on the snapshot, build it once for the whole batch
+        self._create_adjacency_matrix()
+        return [self._decide(agent) for agent in agents]
+
+    def _decide(self, agent):
         if isinstance(agent, Drone):
             return self.decide_for_drone(agent)
         elif isinstance(agent, Hub):
@@ -175,7 +182,7 @@ class GraphBased(Strategy):
 
         A cell is considered a valid neighbor if:
         - It lies within the grid boundaries.
-        - It does not contain an `Obstacle` agent.
+        - It is not marked in the model's obstacle layer.
 
         Parameters
         ----------
@@ -199,7 +206,7 @@ class GraphBased(Strategy):
             neighbor_cell = None
             if 0 <= col < self.model.grid.width and 0 <= row < self.model.grid.height:
                 neighbor_cell = self.coord_map[col, row]
-            if neighbor_cell and all(not isinstance(agent, Obstacle) for agent in neighbor_cell.agents):
+            if neighbor_cell and not self.model.is_obstacle(xy):
                 neighbors.append(neighbor_cell)
 
         return neighbors
@@ -262,15 +269,12 @@ class GraphBased(Strategy):
 
         Notes
         -----
-        - Elevation values are obtained from `self.model.get_elevation(cell.coordinate)`.
+        - Elevation values are obtained from `self.model.get_elevation(cell.coordinate)`,
+          the maximum along the path from `self.model.terrain`.
         - The method assumes the path contains at least one cell.
         """
 
-        max_elevation = 0
-        for cell in path:
-            cell_elevation = self.model.get_elevation(cell.coordinate)
-            if cell_elevation > max_elevation:
-                max_elevation = cell_elevation
+        max_elevation = max(self.model.terrain.max_over_cells([cell.coordinate for cell in path]), 0)
 
         start_elevation = self.model.get_elevation(path[0].coordinate)
         target_elevation = self.model.get_elevation(path[-1].coordinate)
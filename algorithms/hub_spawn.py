@@ -1,17 +1,44 @@
+import math
+
 from agents.drop_zone import DropZone
 from agents.package import Package
 from algorithms.base import Strategy, HubAction, DroneAction
+from algorithms.plan import Plan, Waypoint
 from mesa.discrete_space import Cell
 from agents.drone import Drone
 from agents.hub import Hub
 from agents.collision import Collision
 from utils.distance import *
-from utils.agent_utils import get_closest_available_hub
 
 class HubSpawn(Strategy):
+    request_probability: float = 0.03   # chance of a hub creating a delivery request in a given tick
+
+    def __init__(self, model):
+        super().__init__(model)
+        # demand is pre-sampled as geometric inter-arrival times per hub, which is equivalent
+        # to rolling request_probability every tick but lets the model skip idle ticks
+        self.next_request_tick: dict[Hub, int] = {}
+
     def register_drone(self, drone):
         pass
 
+    def _ticks_until_request(self) -> int:
+        u = self.model.random.random()
+        return 1 + int(math.log(1 - u) / math.log(1 - self.request_probability))
+
+    def next_event_tick(self) -> int | None:
+        hubs = self.model.get_hubs()
+        if len(hubs) == 0:
+            return None
+        for hub in hubs:
+            if hub not in self.next_request_tick:
+                self.next_request_tick[hub] = self.model.steps + self._ticks_until_request()
+        return min(self.next_request_tick[hub] for hub in hubs)
+
+    def can_skip_decisions(self, drone, action, target):
+        # a moving drone's target (hub, package or drop zone) only changes once it arrives there
+        return action == DroneAction.MOVE_TO_CELL
+
     def decide(self, agent):
         if isinstance(agent, Drone):
             return self.decide_for_drone(agent)
@@ -31,7 +58,7 @@ class HubSpawn(Strategy):
         # if idle, go home to Hub
         if drone.cell is not None and not drone.package and not drone.assigned_packages:
             if drone.hub is None:
-                drone.hub = get_closest_available_hub(drone.cell, drone.model.get_hubs())
+                drone.hub = drone.model.nearest_hubs.closest_available_hub(drone.cell)
             if drone.hub is not None:
                 drone.hub.incomming_drones.add(drone)
                 return self.move_towards(drone, drone.hub.cell)
@@ -54,38 +81,97 @@ class HubSpawn(Strategy):
         
         return DroneAction.WAIT, None
     
+    def plan(self, drone: Drone) -> Plan | None:
+        """The legs decide_for_drone would fly: the carried package's drop zone, then every assigned
+        package and its drop zone in order, or the way home to a hub for an idle drone."""
+        if drone.cell is None:
+            return None
+        if not drone.package and not drone.assigned_packages:
+            if drone.hub is None:
+                drone.hub = drone.model.nearest_hubs.closest_available_hub(drone.cell)
+            if drone.hub is None:
+                return None
+            drone.hub.incomming_drones.add(drone)
+            return Plan([Waypoint(drone.hub.cell, altitude=self.leg_altitude(drone, drone.cell, drone.hub.cell, None))])
+
+        waypoints = []
+        cell = drone.cell
+        if drone.package:
+            drop_off = drone.package.drop_zone.cell
+            waypoints.append(Waypoint(drop_off, DroneAction.DROPOFF_PACKAGE, drone.package,
+                                      self.leg_altitude(drone, cell, drop_off, drone.package)))
+            cell = drop_off
+        for package in drone.assigned_packages:
+            if package is drone.package or package.cell is None:
+                continue
+            drop_off = package.drop_zone.cell
+            waypoints.append(Waypoint(package.cell, DroneAction.PICKUP_PACKAGE, package,
+                                      self.leg_altitude(drone, cell, package.cell, None)))
+            waypoints.append(Waypoint(drop_off, DroneAction.DROPOFF_PACKAGE, package,
+                                      self.leg_altitude(drone, package.cell, drop_off, package)))
+            cell = drop_off
+        return Plan(waypoints)
+
+    def fallback(self, drone: Drone):
+        """Keeps the drone going to its current target: the drop zone of its package, its next package
+        or the hub it's heading home to. Doesn't look for a hub or choose a flight layer, holds position
+        when there's nothing to fly to (or when it arrived too fast to pick up or drop off)."""
+        if drone.cell is None:
+            return super().fallback(drone)
+        if drone.package:
+            action, target, cell = DroneAction.DROPOFF_PACKAGE, drone.cell, drone.package.drop_zone.cell
+        elif drone.assigned_packages:
+            action, target, cell = DroneAction.PICKUP_PACKAGE, drone.assigned_packages[0], drone.assigned_packages[0].cell
+        elif drone.hub is not None:
+            action, target, cell = None, None, drone.hub.cell
+        else:
+            return super().fallback(drone)
+
+        if drone.cell != cell:
+            return DroneAction.MOVE_TO_CELL, cell
+        if action is not None and hex_vector_len(drone.cur_speed_vec) <= 1:
+            return action, target
+        return super().fallback(drone)
+
     def decide_for_hub(self, hub: Hub):
         # create requests
-        if hub.model.random.randint(1, 100) <= 3:
+        if hub not in self.next_request_tick:
+            self.next_request_tick[hub] = hub.model.steps - 1 + self._ticks_until_request()
+        if self.next_request_tick[hub] <= hub.model.steps:
+            self.next_request_tick[hub] = hub.model.steps + self._ticks_until_request()
             return HubAction.CREATE_DELIVERY_REQUEST, None
         
         # deploy Drones
-        elif hub.package_requests and hub.stored_drones:
-            safe = True
-            for drone in hub.model.get_drones():
-                if drone.cell is None:
-                    continue
-                if hex_distance(hub.cell, drone.cell) <= drone.get_acceleration()*2 + 5:
-                    safe = False
-            if safe:
+        elif hub.model.dispatcher.can_dispatch(hub):
+            if hub.airspace_occupancy == 0:     # no airborne drones near the hub
                 print('hub deploy')
                 return HubAction.DEPLOY_DRONE, None
         
-        # collect Drones
-        for drone in hub.model.get_drones():
-            if drone.cell is None:
-                continue # skip drones that are already stored/collected
-            
-            # check if drone is at the hub location
-            if drone.cell.coordinate == hub.cell.coordinate and drone.cell:
-                if len(drone.assigned_packages)==0 and drone.package is None and hex_vector_len(drone.cur_speed_vec) <= 1:
-                    if hub.capacity > len(hub.stored_drones):
-                        print('hub collect')
-                        return HubAction.COLLECT_DRONE, drone
+        # collect Drones (only the ones that arrived at the hub's cell)
+        for drone in hub.docking_queue:
+            if len(drone.assigned_packages)==0 and drone.package is None and hex_vector_len(drone.cur_speed_vec) <= 1:
+                if hub.capacity > len(hub.stored_drones):
+                    print('hub collect')
+                    return HubAction.COLLECT_DRONE, drone
 
         return HubAction.WAIT, None
 
     def move_towards(self, drone: Drone, target_cell: Cell):
         if drone.cell == target_cell:
             return DroneAction.WAIT, drone.cell
-        return DroneAction.MOVE_TO_CELL, target_cell
\ No newline at end of file
+        if drone.model.heading_layers and drone.target_altitude_cell is not target_cell:
+            drone.target_altitude_cell = target_cell
+            drone.target_altitude = self.layer_altitude(drone, hex_vector(drone.cell, target_cell), drone.package)
+        return DroneAction.MOVE_TO_CELL, target_cell
+
+    def leg_altitude(self, drone: Drone, start: Cell, target_cell: Cell, package: Package | None) -> float | None:
+        """Flight layer of a planned leg (carrying the package), None if layers are off or there's nowhere to fly."""
+        if not drone.model.heading_layers or start is target_cell:
+            return None
+        return self.layer_altitude(drone, hex_vector(start, target_cell), package)
+
+    def layer_altitude(self, drone: Drone, heading: tuple[int, int, int], package: Package | None) -> float:
+        """Flight layer for a leg with the given heading, within the drone's altitude limits (with margins)."""
+        lowest = drone.min_altitude + drone.altitude_correct_margin + (package.height if package else 0)
+        highest = drone.max_altitude - drone.altitude_correct_margin - drone.height
+        return drone.model.occupancy.layer_altitude(heading, lowest, highest)
@@ -0,0 +1,66 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, NamedTuple
+from mesa.discrete_space import Cell
+
+from algorithms.base import DroneAction
+from utils.distance import hex_vector_len
+
+if TYPE_CHECKING:
+    from agents.drone import Drone
+
+
+class Waypoint(NamedTuple):
+    """A leg of a plan: fly to the cell, then execute the action once there (slow enough to stop)."""
+    cell: Cell
+    action: DroneAction | None = None       # PICKUP_PACKAGE, DROPOFF_PACKAGE or None (the leg ends on arrival)
+    target: Any = None                      # target of the action (the package to pick up / drop off)
+    altitude: float | None = None           # altitude above ground to hold during the leg (see Drone.target_altitude)
+    max_arrival_speed: int = 1
+
+
+class Plan:
+    """Executable plan of a drone, a list of waypoints produced by Strategy.plan.
+
+    The drone follows it on its own (see Drone.follow_plan) and only calls back into the strategy
+    once the plan is completed, fails (its next action can't be executed anymore, e.g. the package
+    was taken out of the drone's assigned packages) or is invalidated (see Drone.invalidate_plan).
+    """
+    def __init__(self, waypoints: list[Waypoint]):
+        self.waypoints = waypoints
+        self.index = 0
+
+    @property
+    def done(self) -> bool:
+        return self.index >= len(self.waypoints)
+
+    def is_valid(self, drone: Drone) -> bool:
+        """Whether the action of the current waypoint can still be executed."""
+        waypoint = self.waypoints[self.index]
+        if waypoint.action == DroneAction.PICKUP_PACKAGE:
+            package = waypoint.target
+            return drone.package is None and package in drone.assigned_packages and package.cell is waypoint.cell
+        if waypoint.action == DroneAction.DROPOFF_PACKAGE:
+            return drone.package is waypoint.target
+        return True
+
+    def next_action(self, drone: Drone) -> tuple[DroneAction, Any] | None:
+        """The drone's command for this tick, or None if the plan is done or failed."""
+        if self.done or not self.is_valid(drone):
+            return None
+        waypoint = self.waypoints[self.index]
+
+        if drone.cell is not waypoint.cell:
+            if waypoint.altitude is not None and drone.target_altitude_cell is not waypoint.cell:
+                drone.target_altitude_cell = waypoint.cell
+                drone.target_altitude = waypoint.altitude
+            return DroneAction.MOVE_TO_CELL, waypoint.cell
+
+        if waypoint.action is None:
+            self.index += 1
+            return DroneAction.WAIT, drone.cell
+        if hex_vector_len(drone.cur_speed_vec) > waypoint.max_arrival_speed:
+            return DroneAction.WAIT, drone.cell
+        self.index += 1
+        if waypoint.action == DroneAction.DROPOFF_PACKAGE:
+            return waypoint.action, drone.cell
+        return waypoint.action, waypoint.target
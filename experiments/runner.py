@@ -0,0 +1,150 @@
+from __future__ import annotations
+import contextlib
+import gc
+import io
+import os
+import pickle
+import select
+import traceback
+from typing import Any, Callable
+import numpy as np
+
+from model.model import DroneModel
+
+
+def summary(model: DroneModel) -> dict[str, float]:
+    """Default report of a run: its tick and the last row of the model's metrics."""
+    metrics = model.datacollector.get_model_vars_dataframe()
+    return {"Step": model.steps, **(metrics.iloc[-1].to_dict() if len(metrics) else {})}
+
+
+class HeadlessRunner:
+    """Runs a DroneModel without visualization, and branches runs into what-if variants.
+
+    fork runs every variant in a child process created with os.fork, so the children share the parent's
+    model (grid, terrain, agents...) copy-on-write instead of rebuilding the scenario, and only the pages
+    a branch changes are copied. A variant is a function applied to the child's model before it runs on,
+    e.g. to switch strategies, take a hub out or add demand:
+
+        runner = HeadlessRunner(preset_name="shanghai_56909", algorithm_name="hub_spawn", seed=1).run(500)
+        results = runner.fork([None, lambda m: m.get_hubs()[0].remove(), ...], ticks=1000)
+    """
+    def __init__(self, model: DroneModel | None = None, quiet: bool = True, **model_params):
+        """
+        Args:
+            model (DroneModel | None, optional): The model to run. Defaults to None (created from model_params).
+            quiet (bool, optional): Whether to silence what agents and strategies print. Defaults to True.
+            **model_params: DroneModel parameters, if no model is given.
+        """
+        self.quiet = quiet
+        with self._output():
+            self.model = model if model is not None else DroneModel(**model_params)
+
+    def _output(self):
+        return contextlib.redirect_stdout(io.StringIO()) if self.quiet else contextlib.nullcontext()
+
+    def run(self, ticks: int) -> HeadlessRunner:
+        """Steps the model the given number of ticks (or until it stops running)."""
+        with self._output():
+            for _ in range(ticks):
+                if not self.model.running:
+                    break
+                self.model.step()
+        return self
+
+    def fork(self, variants: list[Callable[[DroneModel], None] | None], ticks: int,
+             report: Callable[[DroneModel], Any] = summary, max_workers: int | None = None,
+             reseed: bool = True) -> list[Any]:
+        """Runs every variant from the current state in a forked child process, the parent's model is left untouched.
+
+        Args:
+            variants (list[Callable[[DroneModel], None] | None]): Functions changing the child's model before it runs,
+                                                                  None runs the model as it is.
+            ticks (int): Ticks every branch is run for.
+            report (Callable[[DroneModel], Any], optional): Result of a branch, computed in the child from its model
+                                                            at the end of the run (must be picklable). Defaults to summary.
+            max_workers (int | None, optional): Branches running at the same time. Defaults to None (the number of CPUs).
+            reseed (bool, optional): Whether every branch gets its own RNG stream (derived from the model's seed and
+                                     the branch's index), otherwise all branches continue the parent's. Defaults to True.
+
+        Raises:
+            RuntimeError: If a branch failed (with the child's traceback).
+
+        Returns:
+            list[Any]: The reports, in the order of the variants.
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Forking runs requires os.fork (not available on this platform)")
+        if self.model.datacollector.directory is not None or self.model.simulator is not None:
+            raise ValueError("Can't fork models streaming records to files or run by a simulator")
+        if self.model.trajectory is not None:
+            self.model.trajectory.flush()
+        max_workers = max_workers or os.cpu_count() or 1
+        entropy = np.random.SeedSequence(self.model._seed if isinstance(self.model._seed, int) else None).entropy
+
+        results: list[Any] = [None] * len(variants)
+        running: dict[int, tuple[int, int, list[bytes]]] = {}     # read end of a child's pipe -> (pid, branch, data)
+        # keep the parent's objects out of the collector's reach, so children don't write to their pages by collecting
+        gc.freeze()
+        try:
+            for branch, variant in enumerate(variants):
+                while len(running) >= max_workers:
+                    self._collect(running, results)
+                read_end, write_end = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(read_end)
+                    seed = np.random.SeedSequence(entropy, spawn_key=(branch,)) if reseed else None
+                    self._run_branch(variant, ticks, report, seed, write_end)
+                os.close(write_end)
+                running[read_end] = (pid, branch, [])
+            while running:
+                self._collect(running, results)
+        finally:
+            for read_end, (pid, _, _) in running.items():     # only left if interrupted
+                os.close(read_end)
+                os.waitpid(pid, 0)
+            gc.unfreeze()
+        return results
+
+    def _run_branch(self, variant: Callable[[DroneModel], None] | None, ticks: int, report: Callable[[DroneModel], Any],
+                    seed: np.random.SeedSequence | None, write_end: int) -> None:
+        """Body of a child process, sends (ok, report or traceback) to the parent and exits."""
+        try:
+            if seed is not None:
+                self.model.random.seed(int(seed.generate_state(1, np.uint64)[0]))
+                self.model.rng.bit_generator.state = np.random.default_rng(seed).bit_generator.state
+            with self._output():
+                if variant is not None:
+                    variant(self.model)
+            self.run(ticks)
+            message = pickle.dumps((True, report(self.model)))
+        except BaseException:
+            message = pickle.dumps((False, traceback.format_exc()))
+        try:
+            with os.fdopen(write_end, "wb") as pipe:
+                pipe.write(message)
+        finally:
+            os._exit(0)     # skip the parent's exit handlers
+
+    @staticmethod
+    def _collect(running: dict[int, tuple[int, int, list[bytes]]], results: list[Any]) -> None:
+        """Reads from the children's pipes until one of them is done."""
+        while True:
+            ready, _, _ = select.select(list(running), [], [])
+            for read_end in ready:
+                pid, branch, data = running[read_end]
+                chunk = os.read(read_end, 1 << 16)
+                if chunk:
+                    data.append(chunk)
+                    continue
+                os.close(read_end)
+                del running[read_end]
+                os.waitpid(pid, 0)
+                if not data:
+                    raise RuntimeError(f"Branch {branch} exited without a result")
+                ok, result = pickle.loads(b"".join(data))
+                if not ok:
+                    raise RuntimeError(f"Branch {branch} failed:\n{result}")
+                results[branch] = result
+                return
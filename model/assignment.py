@@ -0,0 +1,115 @@
+from __future__ import annotations
+import math
+from typing import TYPE_CHECKING, Sequence
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from utils.distance import xy_to_qrs_batch, hex_distance_batch
+
+if TYPE_CHECKING:
+    from agents.drone import Drone
+    from agents.package import Package
+
+
+INFEASIBLE_COST = 1e9   # added to the cost of deliveries a drone can't make on its remaining battery
+
+
+def estimate_energy(distance: np.ndarray, legs: int, speed: int, acceleration: int, drain_rate: float) -> np.ndarray:
+    """Battery a drone spends flying the given distance, split into legs it starts from a standstill.
+
+    Args:
+        distance (np.ndarray): Total distance of the legs, in hex cells.
+        legs (int): Number of legs (the drone speeds up at the start of each of them).
+        speed (int): The drone's top speed.
+        acceleration (int): The drone's acceleration.
+        drain_rate (float): Battery spent per tick of flight.
+
+    Returns:
+        np.ndarray: Estimated battery spent, with the shape of distance.
+    """
+    ticks = np.ceil(np.asarray(distance) / speed) + legs * math.ceil(speed / acceleration)
+    return ticks * drain_rate
+
+
+def delivery_distances(origins: np.ndarray, pickups: np.ndarray, drop_offs: np.ndarray) -> np.ndarray:
+    """Drone by package matrix of the distance a drone flies to deliver a package.
+
+    Args:
+        origins (np.ndarray): (n, 2) offset coords the drones start from.
+        pickups (np.ndarray): (m, 2) offset coords of the packages.
+        drop_offs (np.ndarray): (m, 2) offset coords of the packages' drop zones.
+
+    Returns:
+        np.ndarray: (n, m) integer distances, from the origin to the package and on to its drop zone.
+    """
+    return _distances_from(xy_to_qrs_batch(origins), xy_to_qrs_batch(pickups), hex_distance_batch(pickups, drop_offs))
+
+
+def _distances_from(origins_qrs: np.ndarray, pickups_qrs: np.ndarray, legs: np.ndarray) -> np.ndarray:
+    # max(|dq|, |dr|, |ds|) one component at a time, much faster than on (n, m, 3) arrays
+    distances = np.abs(origins_qrs[:, None, 0] - pickups_qrs[None, :, 0])
+    np.maximum(distances, np.abs(origins_qrs[:, None, 1] - pickups_qrs[None, :, 1]), out=distances)
+    np.maximum(distances, np.abs(origins_qrs[:, None, 2] - pickups_qrs[None, :, 2]), out=distances)
+    return distances + legs
+
+
+def delivery_cost_matrix(distances: np.ndarray, batteries: np.ndarray, speed: int, acceleration: int, drain_rate: float) -> np.ndarray:
+    """Cost matrix of the deliveries: their distance, plus INFEASIBLE_COST where the energy estimate exceeds the drone's battery.
+
+    Args:
+        distances (np.ndarray): (n, m) distances, see delivery_distances.
+        batteries (np.ndarray): (n,) remaining battery of the drones.
+        speed (int): Top speed of the drones.
+        acceleration (int): Acceleration of the drones.
+        drain_rate (float): Battery spent per tick of flight.
+
+    Returns:
+        np.ndarray: (n, m) float costs.
+    """
+    energy = estimate_energy(distances, 2, speed, acceleration, drain_rate)
+    infeasible = energy > np.asarray(batteries, dtype=float)[:, None]
+    return np.where(infeasible, distances + INFEASIBLE_COST, distances).astype(float)
+
+
+def solve(costs: np.ndarray) -> list[tuple[int, int]]:
+    """Minimum cost matching of the rows and columns of a (possibly rectangular) cost matrix.
+
+    Returns:
+        list[tuple[int, int]]: (row, column) pairs, min(n, m) of them, sorted by row.
+    """
+    if costs.size == 0:
+        return []
+    rows, columns = linear_sum_assignment(costs)
+    return list(zip(rows.tolist(), columns.tolist()))
+
+
+def assign_packages(drones: Sequence[Drone], packages: Sequence[Package]) -> None:
+    """Distributes the packages over the drones' assigned_packages.
+
+    Packages are assigned in rounds of one package per drone: every round solves the assignment of
+    the drones (starting from their last drop zone, with the battery left after their previous deliveries)
+    to the remaining packages, so the cheapest deliveries are made first.
+    """
+    drones = [drone for drone in drones if drone.cell is not None]
+    remaining = [package for package in packages if package.cell is not None and package.drop_zone is not None]
+    if not drones or not remaining:
+        return
+
+    stats = drones[0].model.drone_stats
+    origins = xy_to_qrs_batch([drone.cell.coordinate for drone in drones])
+    batteries = np.array([drone.battery for drone in drones], dtype=float)
+    pickups = xy_to_qrs_batch([package.cell.coordinate for package in remaining])
+    drop_offs = xy_to_qrs_batch([package.drop_zone.cell.coordinate for package in remaining])
+    legs = np.abs(pickups - drop_offs).max(axis=1)
+    while remaining:
+        distances = _distances_from(origins, pickups, legs)
+        pairs = solve(delivery_cost_matrix(distances, batteries, stats.drone_speed, stats.drone_acceleration, stats.battery_drain_rate))
+        for row, column in pairs:
+            drones[row].assigned_packages.append(remaining[column])
+            origins[row] = drop_offs[column]
+            batteries[row] -= estimate_energy(distances[row, column], 2, stats.drone_speed,
+                                              stats.drone_acceleration, stats.battery_drain_rate)
+        keep = np.ones(len(remaining), dtype=bool)
+        keep[[column for _, column in pairs]] = False
+        remaining = [package for package, kept in zip(remaining, keep) if kept]
+        pickups, drop_offs, legs = pickups[keep], drop_offs[keep], legs[keep]
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from random import Random
+from typing import TYPE_CHECKING, Iterable
+from mesa.discrete_space import Cell, CellAgent
+
+if TYPE_CHECKING:
+    from agents.hub import Hub
+    from model.occupancy import OccupancyIndex
+
+
+class EmptyCellIndex:
+    """Indexed set of the grid's empty cells, the cells without agents that aren't obstacles.
+
+    Cells are kept in a list together with a cell -> list position map, so adding,
+    removing (swap with the last element) and sampling k random cells are O(1) / O(k).
+    Obstacle cells are reported by the model (see DroneModel.set_obstacle) and never added.
+    """
+    def __init__(self, cells: Iterable[TrackedCell]):
+        self._cells: list[TrackedCell] = []
+        self._positions: dict[TrackedCell, int] = {}
+        self._blocked: set[TrackedCell] = set()
+        for cell in cells:
+            cell.empty_cells = self
+            if cell.is_empty:
+                self.add(cell)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __contains__(self, cell: Cell) -> bool:
+        return cell in self._positions
+
+    def add(self, cell: TrackedCell) -> None:
+        if cell in self._positions or cell in self._blocked:
+            return
+        self._positions[cell] = len(self._cells)
+        self._cells.append(cell)
+
+    def discard(self, cell: TrackedCell) -> None:
+        position = self._positions.pop(cell, None)
+        if position is None:
+            return
+        last = self._cells.pop()
+        if last is not cell:
+            self._cells[position] = last
+            self._positions[last] = position
+
+    def block(self, cell: TrackedCell) -> None:
+        """Keeps the (obstacle) cell out of the index, even when it has no agents."""
+        self._blocked.add(cell)
+        self.discard(cell)
+
+    def unblock(self, cell: TrackedCell) -> None:
+        self._blocked.discard(cell)
+        if cell.is_empty:
+            self.add(cell)
+
+    def sample(self, k: int, random: Random) -> list[TrackedCell]:
+        """Returns k distinct random empty cells (or fewer, if there aren't enough)."""
+        k = min(k, len(self._cells))
+        return [self._cells[i] for i in random.sample(range(len(self._cells)), k)]
+
+
+class TrackedCell(Cell):
+    """A Cell that reports agents entering and leaving it.
+
+    Keeps the grid's EmptyCellIndex and OccupancyIndex up to date and notifies the hubs whose airspace contains the cell.
+    """
+    empty_cells: EmptyCellIndex | None = None
+    occupancy: OccupancyIndex | None = None
+    airspace: tuple[Hub, ...] = ()     # hubs whose airspace contains this cell, see Hub.register_airspace
+
+    def add_agent(self, agent: CellAgent) -> None:
+        was_empty = not self._agents
+        super().add_agent(agent)
+        if was_empty and self.empty_cells is not None:
+            self.empty_cells.discard(self)
+        if self.occupancy is not None:
+            self.occupancy.on_agent_enter(agent, self)
+        for hub in self.airspace:
+            hub.on_agent_enter(agent, self)
+
+    def remove_agent(self, agent: CellAgent) -> None:
+        super().remove_agent(agent)
+        if not self._agents and self.empty_cells is not None:
+            self.empty_cells.add(self)
+        if self.occupancy is not None:
+            self.occupancy.on_agent_leave(agent, self)
+        for hub in self.airspace:
+            hub.on_agent_leave(agent, self)
@@ -0,0 +1,291 @@
+from __future__ import annotations
+import heapq
+import itertools
+import math
+from typing import TYPE_CHECKING
+
+from algorithms.base import DroneAction
+import numpy as np
+
+from utils.distance import *
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+    from agents.drone import Drone
+
+
+CONTACT_DISTANCE = 2    # drones closer than this (at any point of a tick's sweep) collide
+
+
+def sweep_contacts(a_start: np.ndarray, a_end: np.ndarray, b_start: np.ndarray, b_end: np.ndarray,
+                   dz_start: np.ndarray, dz_end: np.ndarray, dz_min: np.ndarray, dz_max: np.ndarray
+                   ) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the first contact of pairs of drones moving along straight 3D segments during a tick.
+
+    The hex distance between the drones, (|dq| + |dr| + |ds|) / 2, is piecewise linear in time with breakpoints
+    where a component of their relative position changes sign. So the times at which it is within CONTACT_DISTANCE
+    are found exactly from its values at these breakpoints, and intersected with the times at which the drones
+    overlap vertically (their altitude difference changes linearly).
+
+    Args:
+        a_start (np.ndarray): (n, 3) cubic coords of the first drones at the start of the tick.
+        a_end (np.ndarray): (n, 3) cubic coords of the first drones at the end of the tick.
+        b_start (np.ndarray): (n, 3) cubic coords of the second drones at the start of the tick.
+        b_end (np.ndarray): (n, 3) cubic coords of the second drones at the end of the tick.
+        dz_start (np.ndarray): (n,) altitude of the first minus the second drones at the start of the tick.
+        dz_end (np.ndarray): (n,) altitude of the first minus the second drones at the end of the tick.
+        dz_min (np.ndarray): (n,) lowest altitude difference at which the drones overlap vertically.
+        dz_max (np.ndarray): (n,) highest altitude difference at which the drones overlap vertically.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Boolean mask of the pairs in contact and the time of the first contact
+                                       (as a fraction of the tick, only meaningful where the mask is set).
+    """
+    n = len(a_start)
+    rows = np.arange(n)
+    d0 = np.asarray(a_start, dtype=float) - b_start                # relative position is d0 + t * dv
+    dv = (np.asarray(a_end, dtype=float) - a_start) - (np.asarray(b_end, dtype=float) - b_start)
+
+    roots = np.divide(-d0, dv, out=np.zeros_like(d0), where=dv != 0)
+    times = np.sort(np.clip(np.concatenate([np.zeros((n, 1)), np.ones((n, 1)), roots], axis=1), 0, 1), axis=1)
+    distances = np.abs(d0[:, None, :] + times[..., None] * dv[:, None, :]).sum(axis=-1) / 2
+
+    # the distance is convex, so it's within the contact distance on a single interval [enter, leave]
+    inside = distances <= CONTACT_DISTANCE
+    planar_contact = inside.any(axis=1)
+    first = inside.argmax(axis=1)
+    last = times.shape[1] - 1 - inside[:, ::-1].argmax(axis=1)
+    before, after = np.maximum(first - 1, 0), np.minimum(last + 1, times.shape[1] - 1)
+    enter_drop = distances[rows, before] - distances[rows, first]
+    leave_rise = distances[rows, after] - distances[rows, last]
+    enter_fraction = np.divide(distances[rows, before] - CONTACT_DISTANCE, enter_drop, out=np.zeros(n), where=enter_drop != 0)
+    leave_fraction = np.divide(CONTACT_DISTANCE - distances[rows, last], leave_rise, out=np.zeros(n), where=leave_rise != 0)
+    enter = np.where(first == 0, 0.0, times[rows, before] + enter_fraction * (times[rows, first] - times[rows, before]))
+    leave = np.where(last == times.shape[1] - 1, 1.0, times[rows, last] + leave_fraction * (times[rows, after] - times[rows, last]))
+
+    dz_start = np.asarray(dz_start, dtype=float)
+    dz_speed = np.asarray(dz_end, dtype=float) - dz_start
+    constant = dz_speed == 0
+    t_min = np.divide(dz_min - dz_start, dz_speed, out=np.zeros(n), where=~constant)
+    t_max = np.divide(dz_max - dz_start, dz_speed, out=np.zeros(n), where=~constant)
+    overlapping = (dz_min <= dz_start) & (dz_start <= dz_max)
+    vertical_enter = np.where(constant, np.where(overlapping, 0.0, np.inf), np.minimum(t_min, t_max))
+    vertical_leave = np.where(constant, np.where(overlapping, 1.0, -np.inf), np.maximum(t_min, t_max))
+
+    contact_time = np.maximum(np.maximum(enter, vertical_enter), 0.0)
+    contact = planar_contact & (contact_time <= np.minimum(np.minimum(leave, vertical_leave), 1.0))
+    return contact, contact_time
+
+
+def is_moving(drone: Drone) -> bool:
+    return drone.last_action == DroneAction.MOVE_TO_CELL and hex_vector_len(drone.cur_speed_vec) > 0
+
+
+def find_contacts(pairs: list[tuple[Drone, Drone]]) -> list[tuple[float, tuple[float, float, float]] | None]:
+    """Checks pairs of drones for a collision during the last tick.
+
+    Drones that moved in the last tick fly straight from last_cell/last_altitude to their current cell/altitude,
+    the others hover in their cell. Pairs of hovering drones are never in contact.
+
+    Returns:
+        list[tuple[float, tuple[float, float, float]] | None]: For every pair, the time of the first contact
+            (fraction of the tick) and the contact point (cubic coords, midpoint of the drones), or None.
+    """
+    contacts: list[tuple[float, tuple[float, float, float]] | None] = [None] * len(pairs)
+    checked = [i for i, (drone, other) in enumerate(pairs) if is_moving(drone) or is_moving(other)]
+    if not checked:
+        return contacts
+
+    segments = {}
+    for i in checked:
+        for drone in pairs[i]:
+            if drone not in segments:
+                start, start_altitude = (drone.last_cell, drone.last_altitude) if is_moving(drone) else (drone.cell, drone.altitude)
+                segments[drone] = (xy_to_qrs(start.coordinate), xy_to_qrs(drone.cell.coordinate), start_altitude, drone.altitude)
+    firsts = [segments[pairs[i][0]] for i in checked]
+    seconds = [segments[pairs[i][1]] for i in checked]
+    a_start, a_end, b_start, b_end = (np.array([segment[k] for segment in drones], dtype=float)
+                                      for drones, k in ((firsts, 0), (firsts, 1), (seconds, 0), (seconds, 1)))
+    dz_start = np.array([first[2] - second[2] for first, second in zip(firsts, seconds)], dtype=float)
+    dz_end = np.array([first[3] - second[3] for first, second in zip(firsts, seconds)], dtype=float)
+    dz_min, dz_max = np.array([pairs[i][0].vertical_contact_range(pairs[i][1]) for i in checked], dtype=float).T
+
+    contact, time = sweep_contacts(a_start, a_end, b_start, b_end, dz_start, dz_end, dz_min, dz_max)
+    t = np.where(contact, time, 0.0)[:, None]
+    points = (a_start + t * (a_end - a_start) + b_start + t * (b_end - b_start)) / 2
+    for j in np.flatnonzero(contact):
+        contacts[checked[j]] = (float(time[j]), tuple(points[j].tolist()))
+    return contacts
+
+
+class CollisionScheduler:
+    """Kinetic scheduler of the drone pairs that have to be checked for collisions.
+
+    Airborne drones are binned into square blocks of hex cells, as large as the distance two drones can close
+    in a tick plus CONTACT_DISTANCE. Only pairs of drones in the same or adjacent blocks (near pairs) can have
+    touched during the last tick, so only they are kept in the queue; a pair is queued when a drone's block
+    changes and brings it near the other. A cruising drone (see Drone.plan_cruise) covers the blocks of every
+    cell it may be in.
+
+    Drones speed up by at most drone_acceleration per tick up to drone_speed and climb or descend by at most
+    their max ascent/descent speed, so a near pair that is far apart (in the hex plane or in altitude)
+    provably can't collide for a number of ticks. Every near pair is kept in a priority queue keyed by the tick
+    at which this lower bound on the time to contact expires, and only pairs that are due are checked.
+    So the cost of a tick and the size of the queue depend on the number of near pairs, not on all N^2 pairs.
+    """
+    def __init__(self, model: DroneModel):
+        self.model = model
+        self.max_speed: int = model.drone_stats.drone_speed
+        self.acceleration: int = model.drone_stats.drone_acceleration
+        # largest altitude change of a drone in a tick (see Drone.finish_altitude_vector)
+        self.max_climb: float = max(model.drone_stats.drone_max_ascent_speed[0], model.drone_stats.drone_max_descent_speed[0]) + 0.2
+        # drones further apart than this at the end of a tick can't have touched during it
+        self.block_size: int = 2 * (self.max_speed + CONTACT_DISTANCE)
+        self._queue: list[tuple[int, int, Drone, Drone]] = []     # (due tick, token, drone, drone)
+        self._counter = itertools.count()
+        self._tokens: dict[tuple[int, int], int] = {}       # unique ids of a queued pair -> token of its entry in the queue
+        self._partners: dict[Drone, set[Drone]] = {}        # drones queued in a pair with the drone
+        self._footprints: dict[Drone, tuple[int, int, int, int]] = {}      # airborne drones -> blocks they cover
+        self._blocks: dict[tuple[int, int], dict[Drone, None]] = {}
+
+    def ticks_to_contact(self, distance: float, speed_a: int, speed_b: int) -> int:
+        """Lower bound of the number of ticks before two drones can come within CONTACT_DISTANCE.
+
+        Args:
+            distance (float): Current distance between the drones.
+            speed_a (int): Current speed of the first drone.
+            speed_b (int): Current speed of the second drone.
+
+        Returns:
+            int: The pair has to be checked again in this many ticks (at least 1).
+        """
+        gap = distance - CONTACT_DISTANCE
+        reach = 0   # distance both drones can cover in the ticks before the current one
+        ticks = 0
+        while True:
+            ticks += 1
+            speed_a = min(speed_a + self.acceleration, self.max_speed)
+            speed_b = min(speed_b + self.acceleration, self.max_speed)
+            # the sweep of a tick starts up to one tick of movement behind the drone's cell
+            if gap - reach - 2 * (speed_a + speed_b) <= 0:
+                return ticks
+            reach += speed_a + speed_b
+            if speed_a == speed_b == self.max_speed:    # from now on the gap shrinks by 2 * max_speed per tick
+                return ticks + 1 + max(0, math.ceil((gap - reach - 4 * self.max_speed) / (2 * self.max_speed)))
+
+    def ticks_to_vertical_contact(self, gap: float) -> int:
+        """Lower bound of the number of ticks before two drones gap apart vertically can overlap (at least 1)."""
+        # the sweep of a tick starts at the drones' altitudes at the start of it
+        return max(1, math.ceil(gap / (2 * self.max_climb)))
+
+    def footprint(self, drone: Drone) -> tuple[int, int, int, int]:
+        """Range of blocks (first column, first row, last column, last row) the drone may be in."""
+        # a hex step changes the column and the row by at most one, so a cruising drone (anywhere within
+        # the distance to its final cell, see schedule) stays within a square of that radius
+        radius = hex_distance(drone.cell, drone.cruise.cell) if drone.cruise is not None else 0
+        col, row = drone.cell.coordinate
+        return ((col - radius) // self.block_size, (row - radius) // self.block_size,
+                (col + radius) // self.block_size, (row + radius) // self.block_size)
+
+    @staticmethod
+    def _near(footprint: tuple[int, int, int, int], other: tuple[int, int, int, int]) -> bool:
+        return (footprint[0] - 1 <= other[2] and other[0] <= footprint[2] + 1
+                and footprint[1] - 1 <= other[3] and other[1] <= footprint[3] + 1)
+
+    def _blocks_around(self, footprint: tuple[int, int, int, int]):
+        for x in range(footprint[0] - 1, footprint[2] + 2):
+            for y in range(footprint[1] - 1, footprint[3] + 2):
+                block = self._blocks.get((x, y))
+                if block is not None:
+                    yield block
+
+    def _set_footprint(self, drone: Drone, footprint: tuple[int, int, int, int] | None) -> None:
+        old = self._footprints.pop(drone, None)
+        if old is not None:
+            for x in range(old[0], old[2] + 1):
+                for y in range(old[1], old[3] + 1):
+                    block = self._blocks[(x, y)]
+                    del block[drone]
+                    if not block:
+                        del self._blocks[(x, y)]
+        if footprint is not None:
+            self._footprints[drone] = footprint
+            for x in range(footprint[0], footprint[2] + 1):
+                for y in range(footprint[1], footprint[3] + 1):
+                    self._blocks.setdefault((x, y), {})[drone] = None
+
+    @staticmethod
+    def _key(drone: Drone, other: Drone) -> tuple[int, int]:
+        return (drone.unique_id, other.unique_id) if drone.unique_id < other.unique_id else (other.unique_id, drone.unique_id)
+
+    def _push(self, due: int, drone: Drone, other: Drone) -> None:
+        token = next(self._counter)     # replaces the pair's previous entry, if any
+        self._tokens[self._key(drone, other)] = token
+        self._partners.setdefault(drone, set()).add(other)
+        self._partners.setdefault(other, set()).add(drone)
+        heapq.heappush(self._queue, (due, token, drone, other))
+
+    def _forget(self, drone: Drone, other: Drone) -> None:
+        del self._tokens[self._key(drone, other)]
+        self._partners[drone].discard(other)
+        self._partners[other].discard(drone)
+
+    def schedule(self, drone: Drone, other: Drone) -> None:
+        """Computes the pair's time to contact and queues its next check."""
+        distance = hex_distance(drone.cell, other.cell)
+        lowest, highest = drone.vertical_contact_range(other)
+        altitude_difference = drone.altitude - other.altitude
+        vertical_gap = max(altitude_difference - highest, lowest - altitude_difference)
+        # cruising drones are advanced several ticks at once (see Drone.plan_cruise), they may be anywhere on their segment
+        for d in (drone, other):
+            if d.cruise is not None:
+                distance -= hex_distance(d.cell, d.cruise.cell)
+                vertical_gap -= self.max_climb * d.cruise.ticks
+        ticks = max(self.ticks_to_contact(distance, hex_vector_len(drone.cur_speed_vec), hex_vector_len(other.cur_speed_vec)),
+                    self.ticks_to_vertical_contact(vertical_gap))
+        self._push(self.model.steps + ticks, drone, other)
+
+    def _update_airborne(self, drones: list[Drone]) -> None:
+        """Forgets drones that landed or were destroyed, re-bins the drones that moved and queues the new near pairs."""
+        airborne = set(drones)
+        for drone in [d for d in self._footprints if d not in airborne]:
+            for other in list(self._partners.get(drone, ())):
+                self._forget(drone, other)
+            self._partners.pop(drone, None)
+            self._set_footprint(drone, None)
+
+        moved = []
+        for drone in drones:
+            footprint = self.footprint(drone)
+            if self._footprints.get(drone) != footprint:
+                self._set_footprint(drone, footprint)
+                moved.append(drone)
+        # every near pair has an entry in the queue, a pair that just came near is checked right away
+        for drone in moved:
+            footprint = self._footprints[drone]
+            for block in self._blocks_around(footprint):
+                for other in block:
+                    if (other is not drone and self._key(drone, other) not in self._tokens
+                            and self._near(footprint, self._footprints[other])):
+                        self._push(self.model.steps, drone, other)
+
+    def due_pairs(self, drones: list[Drone]) -> list[tuple[Drone, Drone]]:
+        """Returns the pairs of airborne drones that have to be checked in the current tick.
+
+        The returned pairs are taken out of the queue, they have to be queued again with schedule
+        (unless one of the drones is destroyed). Due pairs that aren't near anymore are dropped,
+        they are queued again when they come near.
+
+        Args:
+            drones (list[Drone]): The drones that are currently on the grid.
+        """
+        self._update_airborne(drones)
+        pairs = []
+        while self._queue and self._queue[0][0] <= self.model.steps:
+            _, token, drone, other = heapq.heappop(self._queue)
+            if self._tokens.get(self._key(drone, other)) != token:
+                continue    # replaced, or one of the drones landed
+            self._forget(drone, other)
+            if self._near(self._footprints[drone], self._footprints[other]):
+                pairs.append((drone, other))
+        return pairs
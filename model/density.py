@@ -0,0 +1,104 @@
+from __future__ import annotations
+import math
+from typing import TYPE_CHECKING
+import numpy as np
+from scipy.ndimage import gaussian_filter
+
+from utils.distance import hex_vector_len, round_hex_vector
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+    from agents.drone import Drone
+
+
+class DensityField:
+    """Smoothed drone density over the grid, an O(N + grid) alternative to pairwise drone repulsion.
+
+    Every tick the drones are splatted into a (possibly coarser) grid of counts and altitude sums,
+    which are smoothed with a gaussian kernel. A drone is pushed down the density gradient at its cell
+    and away from the mean altitude of the drones around it (its own contribution is taken out).
+    """
+    def __init__(self, model: DroneModel, sigma: float, downsample: int = 1):
+        """
+        Args:
+            model (DroneModel): The model.
+            sigma (float): Standard deviation of the smoothing kernel, in hex cells.
+            downsample (int, optional): Size (in hex cells) of the field's cells, trades accuracy for speed on big maps:
+                                        drones sharing a field cell don't push each other apart. Defaults to 1.
+        """
+        self.model = model
+        self.downsample = downsample
+        self.sigma = sigma / self.downsample
+        self.shape = (math.ceil(model.width / self.downsample), math.ceil(model.height / self.downsample))
+
+        # response to a single drone: its value at the drone and its steepest gradient
+        impulse = np.zeros((2 * math.ceil(4 * self.sigma) + 3,) * 2)
+        center = impulse.shape[0] // 2
+        impulse[center, center] = 1
+        kernel = gaussian_filter(impulse, self.sigma, mode="constant")
+        self.self_density = kernel[center, center]
+        self.max_gradient = np.hypot(*np.gradient(kernel)).max()
+
+        # distance (in hex cells) beyond which a drone doesn't affect the field (gaussian_filter truncates at 4 sigma)
+        self.reach: int = (int(4 * self.sigma + 0.5) + 1) * self.downsample
+
+        self.density = np.zeros(self.shape)
+        self.altitudes = np.zeros(self.shape)
+        self.gradient = (np.zeros(self.shape), np.zeros(self.shape))
+
+    def update(self, drones: list[Drone]) -> None:
+        """Splats the drones into the field, called once per tick."""
+        counts = np.zeros(self.shape)
+        altitude_sums = np.zeros(self.shape)
+        if drones:
+            coords = np.array([drone.cell.coordinate for drone in drones]) // self.downsample
+            np.add.at(counts, (coords[:, 0], coords[:, 1]), 1)
+            np.add.at(altitude_sums, (coords[:, 0], coords[:, 1]), [drone.altitude for drone in drones])
+        # smoothed with a margin of one cell, so the gradient is a central difference up to the grid's edges
+        # (a one-sided difference would push a drone at the edge away from itself)
+        density = gaussian_filter(np.pad(counts, 1), self.sigma, mode="constant")
+        self.density = density[1:-1, 1:-1]
+        self.altitudes = gaussian_filter(altitude_sums, self.sigma, mode="constant")
+        self.gradient = ((density[2:, 1:-1] - density[:-2, 1:-1]) / 2, (density[1:-1, 2:] - density[1:-1, :-2]) / 2)
+
+    def repulsion(self, drone: Drone, max_distance_h: float = 15) -> tuple[tuple[int, int, int], float]:
+        """Repulsive vector and altitude vector of a drone, see Drone.get_repulsive_vector.
+
+        Returns:
+            tuple[tuple[int, int, int], float]: Hex vector of length up to the drone's acceleration
+                                                (at the steepest gradient a single other drone can cause)
+                                                and the altitude change away from the surrounding drones.
+        """
+        repulsive_vector = (0,0,0)
+        drone_altitude_vector = 0
+        # like with pairwise repulsion, a drone too slow to have a repulsion range (see Drone.get_repulsive_vector) isn't pushed
+        if drone.kinematics.repulsion_range(hex_vector_len(drone.cur_speed_vec)) == 0:
+            return repulsive_vector, drone_altitude_vector
+
+        col, row = drone.cell.coordinate
+        x, y = col // self.downsample, row // self.downsample
+        acceleration = drone.get_acceleration()
+
+        d_col, d_row = self.gradient[0][x, y], self.gradient[1][x, y]   # the drone's own gradient at its cell is 0
+        steepness = math.hypot(d_col, d_row)
+        if steepness > 1e-12:
+            # down the gradient, offset (col, row) -> pixel -> cubic coordinates (pointy hexes of size 1)
+            px, py = -d_col / math.sqrt(3), -d_row / 1.5
+            q, r = math.sqrt(3) / 3 * px - py / 3, 2 / 3 * py
+            scale = 2 * drone.speed / max(abs(q), abs(r), abs(q + r))
+            direction = round_hex_vector((q * scale, r * scale, -(q + r) * scale))
+            magnitude = min(steepness / self.max_gradient, 1) * acceleration
+            repulsive_vector = drone.kinematics.normalize(direction, magnitude)
+
+        others = self.density[x, y] - self.self_density
+        if others > 1e-9:
+            mean_altitude = (self.altitudes[x, y] - self.self_density * drone.altitude) / others
+            difference = drone.altitude - mean_altitude
+            if abs(difference) < max_distance_h:
+                weight_h = (1 - abs(difference) / max_distance_h) * min(others / self.self_density, 1)
+                if difference >= 0:
+                    drone_altitude_vector = min(weight_h * acceleration, drone.max_ascent_speed[0])
+                else:
+                    drone_altitude_vector = - min(weight_h * acceleration, drone.max_descent_speed[0])
+
+        return repulsive_vector, drone_altitude_vector
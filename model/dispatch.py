@@ -0,0 +1,217 @@
+from __future__ import annotations
+import heapq
+import itertools
+from typing import TYPE_CHECKING
+import numpy as np
+
+from model.assignment import delivery_distances, delivery_cost_matrix, solve
+from utils.distance import hex_distance
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+    from agents.drone import Drone
+    from agents.hub import Hub
+    from agents.package import Package
+
+
+class RequestQueue:
+    """Priority queue of a hub's pending delivery requests.
+
+    Requests are ordered by priority (lower first), then by creation tick, then by insertion order.
+    Requests taken out of the middle of the queue (see remove) are only marked, and skipped once they reach the top.
+    """
+    def __init__(self):
+        self._heap: list[tuple[int, int, int, Package]] = []
+        self._counter = itertools.count()
+        self._removed: set[Package] = set()
+
+    def __len__(self) -> int:
+        return len(self._heap) - len(self._removed)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self):
+        return (package for _, _, package in self.entries())
+
+    def push(self, package: Package, created_at: int, priority: int = 0) -> None:
+        heapq.heappush(self._heap, (priority, created_at, next(self._counter), package))
+
+    def _discard_removed(self) -> None:
+        while self._heap and self._heap[0][-1] in self._removed:
+            self._removed.discard(heapq.heappop(self._heap)[-1])
+
+    def peek_key(self) -> tuple[int, int, int] | None:
+        """Sort key of the next request, or None if the queue is empty."""
+        self._discard_removed()
+        return self._heap[0][:3] if self._heap else None
+
+    def pop(self) -> Package:
+        self._discard_removed()
+        return heapq.heappop(self._heap)[-1]
+
+    def entries(self) -> list[tuple[int, int, Package]]:
+        """(priority, creation tick, package) of the pending requests, in order."""
+        return [(priority, created_at, package) for priority, created_at, _, package in sorted(self._heap)
+                if package not in self._removed]
+
+    def remove(self, package: Package) -> None:
+        """Takes the given (pending) request out of the queue."""
+        self._removed.add(package)
+        self._discard_removed()
+
+
+class DispatchScheduler:
+    """Model-scoped scheduler pairing drones stored in hubs with pending delivery requests.
+
+    Every hub owns a RequestQueue. In "matching" mode, whenever requests or stored drones change, the stored
+    drones of all hubs are matched with all pending requests at once (see model.assignment): a drone's cost
+    for a request is the distance from its hub to the package and on to the drop zone, minus the ticks the
+    request has waited (so old requests aren't starved), plus a penalty per priority level. A hub deploying
+    a drone serves the request its drone was matched with, wherever it was submitted.
+
+    In "queue" mode a hub deploying a drone serves its own most urgent request, or if its queue is empty
+    the most urgent request waiting at any other hub, found in O(log n) with a heap of the queues' heads.
+    """
+    def __init__(self, model: DroneModel, mode: str = "matching", age_weight: float = 1.0):
+        """
+        Args:
+            model (DroneModel): The model.
+            mode (str, optional): "matching" or "queue", see above. Defaults to "matching".
+            age_weight (float, optional): Cost (in hex cells) taken off a request per tick it has waited,
+                                          in "matching" mode. Defaults to 1.0.
+        """
+        if mode not in ("matching", "queue"):
+            raise ValueError(f"Unknown dispatch mode {mode}, expected 'matching' or 'queue'")
+        self.model = model
+        self.mode = mode
+        self.age_weight = age_weight
+        self.pending = 0
+        self._hubs: list[Hub] = []
+        # (head key, hub id, hub) of the hubs' queues in "queue" mode, entries whose key isn't the head's anymore are skipped
+        self._heads: list[tuple[tuple[int, int, int], int, Hub]] = []
+        # pending requests in "matching" mode -> (hub they were submitted to, priority, creation tick)
+        self._requests: dict[Package, tuple[Hub, int, int]] = {}
+        self._matches: dict[Hub, list[tuple[Drone, Hub, Package]]] = {}
+        self._stale = False     # whether requests, stored drones or hubs changed since the matching was solved
+
+    def register(self, hub: Hub) -> None:
+        self._hubs.append(hub)
+        self._stale = True
+
+    def unregister(self, hub: Hub) -> None:
+        """Takes out a hub leaving the grid, its pending requests move to the closest remaining hub
+        (keeping their priority and creation tick), or are dropped if there is none."""
+        self._hubs.remove(hub)
+        self._stale = True
+        entries = hub.package_requests.entries()
+        hub.package_requests = RequestQueue()
+        others = [other for other in self._hubs if other.cell is not None]
+        if not others:
+            self.pending -= len(entries)
+            for _, _, package in entries:
+                self._requests.pop(package, None)
+            return
+        target = min(others, key=lambda other: hex_distance(other.cell, hub.cell))
+        for priority, created_at, package in entries:
+            target.package_requests.push(package, created_at=created_at, priority=priority)
+            if package in self._requests:
+                self._requests[package] = (target, priority, created_at)
+        if self.mode == "queue":
+            self._push_head(target)
+
+    def submit(self, hub: Hub, package: Package, priority: int = 0) -> None:
+        """Queues a delivery request at the given hub."""
+        head = hub.package_requests.peek_key()
+        hub.package_requests.push(package, created_at=self.model.steps, priority=priority)
+        self.pending += 1
+        if self.mode == "queue":
+            if hub.package_requests.peek_key() != head:
+                self._push_head(hub)
+        else:
+            self._requests[package] = (hub, priority, self.model.steps)
+            self._stale = True
+
+    def store(self, hub: Hub, drone: Drone) -> None:
+        """Stores a drone in the hub, it can be dispatched from there."""
+        hub.stored_drones.append(drone)
+        self._stale = True
+
+    def _push_head(self, hub: Hub) -> None:
+        key = hub.package_requests.peek_key()
+        if key is not None:
+            heapq.heappush(self._heads, (key, hub.unique_id, hub))
+
+    def _most_urgent_hub(self) -> Hub | None:
+        """Hub whose next request is the most urgent of all, in "queue" mode."""
+        while self._heads:
+            key, _, hub = self._heads[0]
+            if hub.package_requests.peek_key() == key:
+                return hub
+            heapq.heappop(self._heads)      # stale, the hub's head was taken since
+        return None
+
+    def _assignment(self) -> dict[Hub, list[tuple[Drone, Hub, Package]]]:
+        """Matches of the stored drones with pending requests, by the drones' hub in order of cost.
+
+        Solved again only when requests were submitted or drones stored since. A dispatch only takes its match
+        out: the other matches are still an optimal matching of the remaining drones and requests. The time
+        requests have waited doesn't change the matching either, it lowers the cost of all of them alike.
+        """
+        if not self._stale:
+            return self._matches
+        self._stale = False
+        self._matches = {}
+
+        drones = [(hub, drone) for hub in self._hubs if hub.cell is not None for drone in hub.stored_drones]
+        requests = [(hub, priority, created_at, package) for package, (hub, priority, created_at) in self._requests.items()
+                    if hub.cell is not None]
+        if not drones or not requests:
+            return self._matches
+
+        # packages without a cell (or drop zone) are served at the hub they were submitted to
+        pickups = np.array([(package.cell or hub.cell).coordinate for hub, _, _, package in requests])
+        drop_offs = np.array([package.drop_zone.cell.coordinate if package.drop_zone is not None and package.drop_zone.cell is not None
+                              else pickup for (_, _, _, package), pickup in zip(requests, pickups)])
+        distances = delivery_distances(np.array([hub.cell.coordinate for hub, _ in drones]), pickups, drop_offs)
+        stats = self.model.drone_stats
+        costs = delivery_cost_matrix(distances, np.array([drone.battery for _, drone in drones]),
+                                     stats.drone_speed, stats.drone_acceleration, stats.battery_drain_rate)
+        waited = self.model.steps - np.array([created_at for _, _, created_at, _ in requests])
+        priorities = np.array([priority for _, priority, _, _ in requests])
+        priority_penalty = self.model.width + self.model.height     # longer than any delivery leg
+        costs += priorities * priority_penalty - waited * self.age_weight
+
+        for row, column in sorted(solve(costs), key=lambda pair: costs[pair]):
+            hub, drone = drones[row]
+            source, _, _, package = requests[column]
+            self._matches.setdefault(hub, []).append((drone, source, package))
+        return self._matches
+
+    def can_dispatch(self, hub: Hub) -> bool:
+        if self.mode == "queue":
+            return self.pending > 0 and bool(hub.stored_drones)
+        return self.pending > 0 and bool(hub.stored_drones) and hub in self._assignment()
+
+    def dispatch(self, hub: Hub) -> tuple[Drone, Package] | None:
+        """Takes a stored drone out of the hub together with the request it was matched with (or should serve)."""
+        if not self.can_dispatch(hub):
+            return None
+
+        if self.mode == "queue":
+            source = hub if hub.package_requests else self._most_urgent_hub()
+            package = source.package_requests.pop()
+            self._push_head(source)
+            self.pending -= 1
+            return hub.stored_drones.pop(), package
+
+        matches = self._matches[hub]
+        drone, source, package = matches.pop(0)
+        if not matches:
+            del self._matches[hub]
+        source.package_requests.remove(package)
+        del self._requests[package]
+        hub.stored_drones.remove(drone)
+        self.pending -= 1
+
+        return drone, package
@@ -6,8 +6,8 @@ from noise import pnoise2
 from agents.drone import Drone
 from agents.drop_zone import DropZone
 from agents.package import Package
+from model.assignment import assign_packages
 from agents.hub import Hub
-from agents.obstacle import Obstacle
 
 if TYPE_CHECKING:
     from model.model import DroneModel
@@ -88,9 +88,7 @@ class RandomInitialStateSetter(InitialStateSetter):
             d = Drone(model, cell=cell)
             drones.append(d)
 
-        for i, package in enumerate(packages):
-            drone_index = i % len(drones)
-            drones[drone_index].assigned_packages.append(package)
+        assign_packages(drones, packages)
             
         
         hubs = []
@@ -99,11 +97,9 @@ class RandomInitialStateSetter(InitialStateSetter):
             h = Hub(model, cell=cell)
             hubs.append(h)
         
-        obstacles = []
         for _ in range(model.num_obstacles):
             cell = available_cells.pop()
-            o = Obstacle(model, cell=cell)
-            obstacles.append(o)
+            model.add_obstacle(cell)
 
 class HubsInitialStateSetter(InitialStateSetter):
     def set_initial_state(self, model: DroneModel) -> None:
@@ -162,11 +158,9 @@ class HubsInitialStateSetter(InitialStateSetter):
             h = Hub(model, cell=cell)
             hubs.append(h)
         
-        obstacles = []
         for _ in range(model.num_obstacles):
             cell = available_cells.pop()
-            o = Obstacle(model, cell=cell)
-            obstacles.append(o)
+            model.add_obstacle(cell)
 
 def get_initial_state_setter_instance(name: str) -> InitialStateSetter:
     """Returns an InitialStateSetter subclass instance from a string representing its name.
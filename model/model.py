@@ -3,15 +3,30 @@ from typing import TYPE_CHECKING
 import logging
 import math
 from pathlib import Path
+import numpy as np
 from mesa import Model
 from mesa.discrete_space import HexGrid
 from algorithms.helpers import get_algorithm_instance
 from algorithms.base import DroneAction
 from mesa.experimental.devs import ABMSimulator
+from mesa.experimental.devs.eventlist import Priority
 from mesa.space import PropertyLayer
-from mesa.datacollection import DataCollector
 from utils.distance import *
+from utils.kinematics import KinematicsTable
+from utils.terrain import TerrainIndex
+from utils.agent_utils import NearestHubMap
 
+from model.cells import EmptyCellIndex, TrackedCell
+from model.collisions import CollisionScheduler, find_contacts
+from model.occupancy import OccupancyIndex
+from model.density import DensityField
+from model.dispatch import DispatchScheduler
+from model.tours import TourOptimizer
+from model.planning import PlanningScheduler
+from model.recording import DeliveryLog, MetricsRecorder
+from model.trajectory import TrajectoryRecorder
+from model.shared_terrain import SharedTerrain
+from model.scheduler import ActiveAgentScheduler
 from model.initial_state import RandomInitialStateSetter, get_initial_state_setter_instance
 from model.presets.base import Preset
 from model.presets.helpers import get_preset_instance
@@ -50,6 +65,40 @@ class DroneStats:
         self.battery_drain_rate = drain_rate
 
 
+# module-level functions (not lambdas) so the model can be pickled, see model.snapshot
+def _active_drones(model: DroneModel) -> int:
+    return len(model.get_drones())
+
+def _collisions_percent(model: DroneModel) -> float:
+    return 100 * model.collided_drones / model.num_drones if model.num_drones else 0
+
+def _completed_deliveries(model: DroneModel) -> int:
+    return len(model.completed_deliveries)
+
+def _failed_deliveries(model: DroneModel) -> int:
+    return len(model.failed_deliveries)
+
+def _budget_overruns(model: DroneModel) -> int:
+    return model.planner.overruns
+
+def _overrun_time_ms(model: DroneModel) -> float:
+    return model.planner.overrun_time * 1000
+
+def _deferred_decisions(model: DroneModel) -> int:
+    return model.planner.deferred
+
+
+MODEL_REPORTERS = {
+    "Active Drones": _active_drones,
+    "Collisions(%)": _collisions_percent,
+    "Completed Deliveries": _completed_deliveries,
+    "Failed Deliveries": _failed_deliveries,
+    "Budget Overruns": _budget_overruns,
+    "Overrun Time (ms)": _overrun_time_ms,
+    "Deferred Decisions": _deferred_decisions,
+}
+
+
 class DroneModel(Model):
     def __init__(
             self,
@@ -74,6 +123,23 @@ class DroneModel(Model):
             simulator: ABMSimulator = None,
             background: Path = None,
             show_gridlines: bool = True,
+            obstacle_agents: bool = True,
+            obstacle_elevation: float = None,
+            seed: int = None,
+            time_skipping: bool = False,
+            adaptive_stepping: bool = False,
+            vertical_separation: float = None,
+            heading_layers: bool = False,
+            repulsion: str = "pairwise",
+            dispatch: str = "matching",
+            tour_time_budget: float = None,
+            batched_decisions: bool = False,
+            tick_budget: float = None,
+            record_path: Path = None,
+            record_drones: bool = False,
+            record_chunks: int | None = 16,
+            record_trajectory: bool = False,
+            shared_terrain: SharedTerrain = None,
     ):
         """_summary_
 
@@ -101,8 +167,51 @@ class DroneModel(Model):
             simulator (ABMSimulator, optional): Simulato object to use to run the model. Defaults to None.
             background (Path, optional): Background image path. Defaults to None.
             show_gridlines (bool, optional): Whether grid lines should be rendered, useful to improve performance. Defaults to True.
+            obstacle_agents (bool, optional): Whether to create Obstacle agents (visualization only) in addition to
+                                              marking obstacles in the grid's obstacle layer. Defaults to True.
+            obstacle_elevation (float, optional): If set, presets mark every cell at or above this elevation
+                                                  (e.g. tall buildings) as an obstacle. Defaults to None.
+            seed (int, optional): Seed of the model's random number generators. Defaults to None.
+            time_skipping (bool, optional): Whether to jump over ticks in which no drone is airborne and nothing
+                                            is scheduled to happen (see DroneModel.skip_idle_ticks). Defaults to False.
+            adaptive_stepping (bool, optional): Whether drones cruising far from any other drone, hub and hazard are advanced
+                                                over several ticks in a single update (see Drone.plan_cruise). Defaults to False.
+            vertical_separation (float, optional): If set, drones this far (or further) apart vertically ignore each other
+                                                   when slowing down and repelling. Also the height of the altitude bands
+                                                   of the occupancy index. Defaults to None (drones always interact).
+            heading_layers (bool, optional): Whether strategies should send drones to altitude layers by heading
+                                             (see OccupancyIndex.layer_altitude), vertical_separation apart if set,
+                                             otherwise sized from the drones' height. Defaults to False.
+            repulsion (str, optional): How drones repel each other, "pairwise" (every drone within range, exact)
+                                       or "field" (gradient of a smoothed density field, see model.density). Defaults to "pairwise".
+            dispatch (str, optional): How hubs pair stored drones with delivery requests, "matching" (all drones with all requests
+                                      at once, by cost) or "queue" (a hub's own most urgent request first), see model.dispatch.
+                                      Defaults to "matching".
+            tour_time_budget (float, optional): Seconds a drone's tour optimization may take per tick (see model.tours),
+                                                e.g. for interactive runs. Defaults to None (every tour is optimized to convergence).
+            batched_decisions (bool, optional): Whether a tick first decides for all drones and hubs at once on the same state
+                                                (see Strategy.decide_all) and then applies the decisions, instead of every agent
+                                                deciding and acting in turn (see DroneModel.decide_and_apply). Defaults to False.
+            tick_budget (float, optional): Wall-clock seconds a tick should take, e.g. for live demos. Once spent, drone decisions
+                                           and planning are deferred (see model.planning), overruns are reported by the
+                                           datacollector. Defaults to None (no limit).
+            record_path (Path, optional): Directory the datacollector streams its records to as Parquet files
+                                          (see model.recording), the last records are written by close.
+                                          Defaults to None (records are kept in memory).
+            record_drones (bool, optional): Whether the datacollector also records the position, altitude, speed, battery
+                                            and action of every drone each tick. Defaults to False.
+            record_chunks (int | None, optional): Without record_path, chunks of 4096 rows of each record kept in memory,
+                                                  older ones are dropped (see model.recording). None keeps the whole run,
+                                                  with memory growing with it. Defaults to 16.
+            record_trajectory (bool, optional): Whether to record the agents' positions, altitudes and events of every tick
+                                                compactly, to replay the run without simulating it (see model.trajectory).
+                                                Written to <record_path>/trajectory if record_path is set. Defaults to False.
+            shared_terrain (SharedTerrain, optional): Terrain published into shared memory (see model.shared_terrain), used as
+                                                      the grid's height and obstacle layers instead of private copies, e.g. by the
+                                                      workers of a sweep. Must match the grid's size. Defaults to None.
         """
-        super().__init__()
+        super().__init__(seed=seed)
+        self.scheduler = ActiveAgentScheduler(self.random)
         self.width = width
         self.height = height
         
@@ -117,13 +226,31 @@ class DroneModel(Model):
             drone_battery=drone_battery,
             drain_rate=drain_rate
         )
+        self.kinematics = KinematicsTable(self.drone_stats)
         self.num_drones = num_drones
         self.num_packages = num_packages
         self.num_hubs = num_hubs
         self.num_obstacles = num_obstacles
+        self.obstacle_agents = obstacle_agents
+        self.obstacle_elevation = obstacle_elevation
+        self.time_skipping = time_skipping
+        self.adaptive_stepping = adaptive_stepping
+        self.vertical_separation = vertical_separation
+        self.heading_layers = heading_layers
+        if repulsion not in ("pairwise", "field"):
+            raise ValueError(f"Unknown repulsion mode {repulsion}, expected 'pairwise' or 'field'")
+        self.repulsion = repulsion
+        self.batched_decisions = batched_decisions
+        self.shared_terrain = shared_terrain
 
-        self.completed_deliveries: list[Package] = []
-        self.failed_deliveries: list[Package] = []
+        self.completed_deliveries = DeliveryLog()
+        self.failed_deliveries = DeliveryLog()
+        self.collided_drones = 0
+        self.dispatcher = DispatchScheduler(self, dispatch)
+        self.nearest_hubs = NearestHubMap(self)
+        self.collision_scheduler = CollisionScheduler(self)
+        self.tours = TourOptimizer(tour_time_budget)
+        self.planner = PlanningScheduler(self, tick_budget)
 
         
         self.initial_state_setter = get_initial_state_setter_instance(initial_state_setter_name)
@@ -149,19 +276,44 @@ class DroneModel(Model):
             elif preset_name != "None":
                 logging.warning(f"Preset with name {preset_name} doesn't exist.")
         
-        self.grid = HexGrid((self.width, self.height), torus=False, capacity=math.inf, random=self.random)
+        self.grid = HexGrid((self.width, self.height), torus=False, capacity=math.inf, random=self.random, cell_klass=TrackedCell)
+        self.empty_cells = EmptyCellIndex(self.grid.all_cells)
+        # blocks as large as the range in which drones slow down for each other (see Drone.max_speed_nearby)
+        # without a vertical separation, flight layers are twice the vertical contact envelope of two drones apart
+        # (a drone and a package as tall as itself, see Drone.vertical_contact_range)
+        self.occupancy = OccupancyIndex(self.grid.all_cells, block_size=max(5 * self.drone_stats.drone_speed, 10),
+                                        band_height=self.vertical_separation or 15,
+                                        layer_height=self.vertical_separation or 4 * self.drone_stats.drone_height)
+        self.density_field: DensityField | None = None
+        if self.repulsion == "field":     # as wide as pairwise repulsion, which fades out at max_repulsion_distance
+            self.density_field = DensityField(self, sigma=max(self.kinematics.max_repulsion_distance / 3, 1))
         
         # height to be interpeted as height above sea level
         self.grid.height_layer = PropertyLayer("height", self.width, self.height, default_value=0, dtype=int)
+        self._terrain: TerrainIndex | None = None
+        # cells drones cannot enter, the source of truth for obstacle checks (Obstacle agents are only drawn)
+        self.grid.obstacle_layer = PropertyLayer("obstacle", self.width, self.height, default_value=False, dtype=bool)
+        if self.shared_terrain is not None:
+            if self.shared_terrain.elevation.shape != (self.width, self.height):
+                raise ValueError(f"Shared terrain of shape {self.shared_terrain.elevation.shape} doesn't match "
+                                 f"the grid's ({self.width}, {self.height})")
+            # read-only views, copied by the first change (see _writable_data)
+            self.grid.height_layer.data = self.shared_terrain.elevation
+            self.grid.obstacle_layer.data = self.shared_terrain.obstacles
+            for pos in np.argwhere(self.shared_terrain.obstacles):
+                self.empty_cells.block(self.grid[tuple(pos)])
         
         self.initial_state_setter.set_initial_state(self)
         
-        self.datacollector = DataCollector(
-            model_reporters={
-                "Active Drones": lambda m: len(m.get_drones()),
-                "Collisions(%)": lambda m: 0 # TODO
-            }
+        self.datacollector = MetricsRecorder(
+            model_reporters=MODEL_REPORTERS,
+            directory=record_path,
+            record_drones=record_drones,
+            keep_chunks=record_chunks,
         )
+        self.trajectory: TrajectoryRecorder | None = None
+        if record_trajectory:
+            self.trajectory = TrajectoryRecorder(self, directory=Path(record_path) / "trajectory" if record_path else None)
 
 
     def get_elevation(self, pos: tuple[int, int]) -> int:
@@ -183,45 +335,86 @@ class DroneModel(Model):
             pos (tuple[int, int]): Coords of cell (as returned by cell.coordinate).
             value (int): The desired height.
         """
-        self.grid.height_layer.set_cell(pos, value)
+        if self.grid.height_layer.data[pos] == value:
+            return      # keeps a shared layer shared
+        self._writable_data(self.grid.height_layer)[pos] = value
+        self._terrain = None
+
+    def load_elevation(self, elevation: np.ndarray) -> None:
+        """Bulk-set the elevations from an array of shape (width, height)."""
+        self._writable_data(self.grid.height_layer)[...] = elevation
+        self._terrain = None
+
+    @staticmethod
+    def _writable_data(layer: PropertyLayer) -> np.ndarray:
+        """The layer's data, first copied if it's a read-only view of a shared terrain (see model.shared_terrain)."""
+        if not layer.data.flags.writeable:
+            layer.data = layer.data.copy()
+        return layer.data
+
+    @property
+    def terrain(self) -> TerrainIndex:
+        """Max-elevation query structure over the current heightfield, rebuilt lazily after elevation changes."""
+        if self._terrain is None:
+            shared = self.shared_terrain is not None and self.grid.height_layer.data is self.shared_terrain.elevation
+            self._terrain = TerrainIndex(self.grid.height_layer.data, self.shared_terrain.levels if shared else None)
+        return self._terrain
+
+    def is_obstacle(self, pos: tuple[int, int]) -> bool:
+        """Check whether the cell at given coords (as returned by cell.coordinate) is blocked by an obstacle."""
+        return self.grid.obstacle_layer.data[pos]
+
+    def set_obstacle(self, pos: tuple[int, int], value: bool = True) -> None:
+        """Mark (or unmark) the cell at given coords (as returned by cell.coordinate) as an obstacle."""
+        if self.grid.obstacle_layer.data[pos] != value:
+            self._writable_data(self.grid.obstacle_layer)[pos] = value
+            if value:
+                self.empty_cells.block(self.grid[pos])
+            else:
+                self.empty_cells.unblock(self.grid[pos])
+
+    def add_obstacle(self, cell: Cell) -> None:
+        """Block a cell, creating an Obstacle agent for it if obstacle_agents is enabled."""
+        if self.obstacle_agents:
+            Obstacle(self, cell=cell)
+        else:
+            self.set_obstacle(cell.coordinate)
+
+    def load_obstacles(self, mask: np.ndarray) -> None:
+        """Bulk-load obstacles from a boolean array of shape (width, height), added to the existing ones.
+
+        No Obstacle agents are created, cells are only marked in the obstacle layer.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        added = mask & ~self.grid.obstacle_layer.data
+        if added.any():
+            data = self._writable_data(self.grid.obstacle_layer)
+            data |= mask
+            for pos in np.argwhere(added):
+                self.empty_cells.block(self.grid[tuple(pos)])
 
     def get_drone_collisions(self, delete_drones=True) -> list[Cell]:
         collision_cells: list[Cell] = []
         delete_drones: set[Drone] = set()
-        for drone in self.get_drones():
-            if drone.cell is None:
+        drones = [drone for drone in self.get_drones() if drone.cell is not None]
+
+        # only the pairs whose time to contact expired are checked, see CollisionScheduler
+        order = {drone: i for i, drone in enumerate(drones)}
+        pairs = [tuple(sorted(pair, key=order.get)) for pair in self.collision_scheduler.due_pairs(drones)]
+        hits = []
+        for pair, contact in zip(pairs, find_contacts(pairs)):
+            if contact is None:
+                self.collision_scheduler.schedule(*pair)
                 continue
-            for second_drone in self.get_drones():
-                if second_drone.cell is None or drone.unique_id == second_drone.unique_id or drone.last_action != DroneAction.MOVE_TO_CELL:
-                    continue
-                drone_last_pos = sub_hex_vectors(xy_to_qrs(drone.cell.coordinate), drone.cur_speed_vec)
-                if second_drone.last_action != DroneAction.MOVE_TO_CELL:
-                    num_check = hex_vector_len(drone.cur_speed_vec)
-                    if num_check == 0:
-                        continue
-                    second_drone_speed = (0,0,0)
-                    second_drone_last_pos = xy_to_qrs(second_drone.cell.coordinate)
-                else:
-                    num_check = max(hex_vector_len(drone.cur_speed_vec), hex_vector_len(second_drone.cur_speed_vec))
-                    if num_check == 0:
-                        continue
-                    second_drone_speed = divide_hex_vector(second_drone.cur_speed_vec, num_check)
-                    second_drone_last_pos = sub_hex_vectors(xy_to_qrs(second_drone.cell.coordinate), second_drone.cur_speed_vec)
-                
-                drone_speed = divide_hex_vector(drone.cur_speed_vec, num_check)
-
-                for _ in range(num_check + 1):
-                    if qrs_hex_distance(drone_last_pos, second_drone_last_pos) <= 2:
-                        x,y = qrs_to_xy(round_hex_vector(drone_last_pos))
-                        print(x,y)
-                        cell = self.grid[(x,y)]
-                        collision_cells.append(cell)
-                        delete_drones.add(drone)
-                        delete_drones.add(second_drone)
-                        break
-                    drone_last_pos = add_hex_vectors(drone_last_pos, drone_speed)
-                    second_drone_last_pos = add_hex_vectors(second_drone_last_pos, second_drone_speed)
+            hits.append(((order[pair[0]], order[pair[1]]), contact[1]))
+            delete_drones.update(pair)
+        self.collided_drones += len(delete_drones)
+
+        for _, position in sorted(hits):
+            x, y = qrs_to_xy(round_hex_vector(position))
+            collision_cells.append(self.grid[(int(np.clip(x, 0, self.width - 1)), int(np.clip(y, 0, self.height - 1)))])
 
+        for drone in drones:
             if drone.check_for_collision_with_terrain() or drone.check_for_collision_with_obstacle() or drone.check_for_lack_of_energy():
                 delete_drones.add(drone)
 
@@ -251,15 +444,108 @@ class DroneModel(Model):
 
     def step(self):
         """Execute one simulation step."""
+        self.planner.start_tick()
         if hasattr(self.strategy, "step"):
             self.strategy.step()
 
-        self.agents.shuffle_do("step")
+        self.scheduler.wake_due(self.steps)
+        if self.density_field is not None:
+            self.density_field.update([drone for drone in self.get_drones() if drone.cell is not None])
+        if self.batched_decisions:
+            self.decide_and_apply()
+        else:
+            self.scheduler.shuffle_do("step")
         collision_cells = self.get_drone_collisions(delete_drones=True)
         self.create_collisions(collision_cells)
+        self.planner.end_tick()
         self.datacollector.collect(self)
+        if self.trajectory is not None:
+            self.trajectory.record(self)
+
+        if self.time_skipping:
+            self.skip_idle_ticks()
+
+    def close(self) -> None:
+        """Ends the run's records: writes the trajectory's last chunk and the datacollector's pending rows
+        and waits for the files to be written. The model shouldn't be stepped afterwards."""
+        if self.trajectory is not None:
+            self.trajectory.flush()
+        self.datacollector.close()
+
+    def decide_and_apply(self) -> None:
+        """Steps the active agents in two phases.
+
+        First the drones following a plan take its next command (see Drone.follow_plan) and the strategy
+        decides for every other drone and hub at once (Strategy.decide_all), so all decisions see the state
+        at the start of the tick. Then the agents apply their decisions in random order, agents without
+        decisions (cruising drones, collision markers) are stepped as usual.
+        Agents put to sleep during the apply phase (e.g. drones collected by a hub) are skipped.
+        """
+        agents = self.scheduler.shuffled()
+        deciding = [agent for agent in agents if isinstance(agent, (Drone, Hub)) and agent.wants_decision()]
+        for agent in deciding:
+            agent.prepare_decision()
+        decisions = {}
+        for drone in deciding:
+            if isinstance(drone, Drone) and (planned := drone.follow_plan()) is not None:
+                decisions[drone] = planned
+        unplanned = [agent for agent in deciding if agent not in decisions]
+        decisions.update(zip(unplanned, self.planner.decide_all(unplanned)))
+        for agent in agents:
+            if agent not in self.scheduler:
+                continue
+            if agent in decisions:
+                agent.apply(*decisions[agent])
+            else:
+                agent.step()
+
+    def is_idle(self) -> bool:
+        """Whether nothing can happen until the strategy acts on its own: no airborne drones,
+        no live collision markers and no hub able to deploy a drone."""
+        if self.scheduler.next_wakeup() is not None or not all(isinstance(agent, Hub) for agent in self.scheduler):
+            return False
+        return not any(self.dispatcher.can_dispatch(hub) for hub in self.get_hubs())
+
+    def skip_idle_ticks(self) -> int:
+        """Jump to the tick before the strategy's next event if the model is idle.
+
+        The skipped ticks are still recorded by the datacollector (the model state doesn't change
+        during them), so statistics are the same as if every tick was simulated.
+        If the model is run by a simulator, its next model.step event is moved accordingly.
+
+        Returns:
+            int: Number of skipped ticks.
+        """
+        if not self.is_idle():
+            return 0
+        next_tick = self.strategy.next_event_tick()
+        if next_tick is None or next_tick - self.steps <= 1:
+            return 0
+
+        skipped = next_tick - self.steps - 1
+        for _ in range(skipped):
+            self.steps += 1
+            self.datacollector.collect(self)
+            if self.trajectory is not None:
+                self.trajectory.record(self)
+
+        if self.simulator is not None and not self.simulator.event_list.is_empty():
+            for event in self.simulator.event_list.peak_ahead(len(self.simulator.event_list)):
+                if event.fn() == self.step:
+                    event.cancel()
+            self.simulator.schedule_event_absolute(self.step, next_tick, priority=Priority.HIGH)
+
+        return skipped
         
 
+    def register_agent(self, agent):
+        super().register_agent(agent)
+        self.scheduler.wake(agent)
+
+    def deregister_agent(self, agent):
+        super().deregister_agent(agent)
+        self.scheduler.sleep(agent)
+
     def next_id(self):
         self.unique_id += 1
         return self.unique_id - 1
\ No newline at end of file
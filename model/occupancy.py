@@ -0,0 +1,118 @@
+from __future__ import annotations
+import math
+from typing import TYPE_CHECKING, Iterable
+from mesa.discrete_space import CellAgent
+
+from agents.drone import Drone
+
+if TYPE_CHECKING:
+    from model.cells import TrackedCell
+
+
+class OccupancyIndex:
+    """3D occupancy index of the drones on the grid: square blocks of hex cells times altitude bands.
+
+    Kept up to date by the grid's cells (see TrackedCell), a drone is re-indexed every time it changes cell,
+    and by the drones, which report altitude changes (see on_altitude_change). Queries return candidates only,
+    callers check exact distances.
+    """
+    def __init__(self, cells: Iterable[TrackedCell], block_size: int, band_height: float, layer_height: float = None):
+        """
+        Args:
+            cells (Iterable[TrackedCell]): The grid's cells.
+            block_size (int): Side of the blocks, in hex cells.
+            band_height (float): Height of the altitude bands.
+            layer_height (float, optional): Height of the flight layers, see layer_altitude. Defaults to None (band_height).
+        """
+        self.block_size = max(int(block_size), 1)
+        self.band_height = band_height
+        self.layer_height = layer_height or band_height
+        self._blocks: dict[tuple[int, int], dict[int, dict[Drone, None]]] = {}     # block -> band -> drones
+        self._keys: dict[Drone, tuple[int, int, int]] = {}
+        for cell in cells:
+            cell.occupancy = self
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def band(self, altitude: float) -> int:
+        return math.floor(altitude / self.band_height)
+
+    def on_agent_enter(self, agent: CellAgent, cell: TrackedCell) -> None:
+        if not isinstance(agent, Drone):
+            return
+        col, row = cell.coordinate
+        key = (col // self.block_size, row // self.block_size, self.band(agent.altitude))
+        self._keys[agent] = key
+        self._blocks.setdefault(key[:2], {}).setdefault(key[2], {})[agent] = None
+
+    def on_agent_leave(self, agent: CellAgent, cell: TrackedCell) -> None:
+        key = self._keys.pop(agent, None)
+        if key is None:
+            return
+        bands = self._blocks[key[:2]]
+        del bands[key[2]][agent]
+        if not bands[key[2]]:
+            del bands[key[2]]
+            if not bands:
+                del self._blocks[key[:2]]
+
+    def on_altitude_change(self, drone: Drone) -> None:
+        """Moves the drone to the band of its current altitude, e.g. while it climbs or descends in place."""
+        key = self._keys.get(drone)
+        if key is None:
+            return
+        band = self.band(drone.altitude)
+        if band == key[2]:
+            return
+        bands = self._blocks[key[:2]]
+        del bands[key[2]][drone]
+        if not bands[key[2]]:
+            del bands[key[2]]
+        bands.setdefault(band, {})[drone] = None
+        self._keys[drone] = (key[0], key[1], band)
+
+    def nearby(self, coordinate: tuple[int, int], radius: int,
+               altitude: float = None, altitude_range: float = math.inf) -> list[Drone]:
+        """Drones that may be within radius cells of the coordinate and within altitude_range of the altitude.
+
+        A hex step changes the column and the row by at most one, so only the blocks overlapping
+        the square of side 2 * radius + 1 around the coordinate are visited, and with an altitude
+        only the bands overlapping altitude +- altitude_range.
+
+        Returns:
+            list[Drone]: Candidate drones, in the order they were created (the model's order of agents).
+        """
+        col, row = coordinate
+        bands = None
+        if altitude is not None and altitude_range != math.inf:
+            bands = range(self.band(altitude - altitude_range), self.band(altitude + altitude_range) + 1)
+
+        drones = []
+        for x in range((col - radius) // self.block_size, (col + radius) // self.block_size + 1):
+            for y in range((row - radius) // self.block_size, (row + radius) // self.block_size + 1):
+                block = self._blocks.get((x, y))
+                if block is None:
+                    continue
+                if bands is None:
+                    for band_drones in block.values():
+                        drones.extend(band_drones)
+                else:
+                    for band in bands:
+                        drones.extend(block.get(band, ()))
+        drones.sort(key=lambda drone: drone.unique_id)
+        return drones
+
+    def layer_altitude(self, heading: tuple[int, int, int], lowest: float, highest: float) -> float:
+        """Altitude (above ground) of the flight layer for the given heading, between lowest and highest.
+
+        The space is split into as many layers of layer_height as fit into it, and the six hex directions
+        are spread over them in order, so drones flying in opposite directions use different layers
+        whenever there are at least two.
+        """
+        layers = max(int((highest - lowest) // self.layer_height), 1)
+        q, r, _ = heading
+        angle = math.atan2(1.5 * r, math.sqrt(3) * (q + r / 2))    # hex directions are at multiples of 60 degrees
+        sector = math.floor((angle + math.pi / 6) / (math.pi / 3)) % 6
+        layer = sector * layers // 6
+        return lowest + (layer + 0.5) * (highest - lowest) / layers
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING
+
+from agents.drone import Drone
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+    from algorithms.plan import Plan
+
+
+class PlanningScheduler:
+    """Keeps the strategy's drone decisions and planning within a wall-clock budget per tick.
+
+    Once the tick's budget is spent, drones that need a new plan are queued and drones that need a decision
+    get the strategy's cheap fallback (see Strategy.fallback) instead. Queued plans are made at the start of the
+    following ticks, most urgent first (drones carrying a package, then drones with assigned packages,
+    then idle drones, oldest requests first), at least one per tick so no drone waits forever.
+    Ticks that take longer than the budget are counted as overruns (see the model's datacollector).
+    Without a budget the strategy is called directly and nothing is deferred.
+    """
+    def __init__(self, model: DroneModel, budget: float | None = None):
+        """
+        Args:
+            model (DroneModel): The model.
+            budget (float | None, optional): Seconds a tick may take. Defaults to None (no limit).
+        """
+        self.model = model
+        self.budget = budget
+        self.tick_time = 0.0        # seconds taken by the last tick
+        self.overruns = 0           # ticks that took longer than the budget
+        self.overrun_time = 0.0     # seconds the ticks took longer than the budget, in total
+        self.deferred = 0           # decisions replaced by the fallback and plans postponed to a later tick
+        self._tick_start = time.perf_counter()
+        self._calls = 0             # strategy calls in the current tick
+        self._requests: dict[Drone, int] = {}       # drones waiting for a plan -> tick of the request
+        self._ready: dict[Drone, Plan | None] = {}  # plans made at the start of the tick
+
+    def priority(self, drone: Drone) -> tuple[int, int, int]:
+        urgency = 0 if drone.package is not None else 1 if drone.assigned_packages else 2
+        return urgency, self._requests[drone], drone.unique_id
+
+    def has_time(self) -> bool:
+        """Whether the strategy may still be called in this tick (always at least once)."""
+        return self.budget is None or self._calls == 0 or time.perf_counter() - self._tick_start < self.budget
+
+    def start_tick(self) -> None:
+        """Starts the tick's clock and makes the queued plans that fit into the budget."""
+        self._tick_start = time.perf_counter()
+        self._calls = 0
+        for drone in sorted(self._requests, key=self.priority):
+            if not self.has_time():
+                break
+            del self._requests[drone]
+            if drone.cell is not None:      # may have been stored in a hub or destroyed meanwhile
+                self._ready[drone] = self._plan(drone)
+
+    def end_tick(self) -> None:
+        self.tick_time = time.perf_counter() - self._tick_start
+        if self.budget is not None and self.tick_time > self.budget:
+            self.overruns += 1
+            self.overrun_time += self.tick_time - self.budget
+
+    def can_plan(self, drone: Drone) -> bool:
+        """Whether a plan for the drone is ready or can be made now, otherwise the drone is queued."""
+        if drone in self._ready or self.has_time():
+            return True
+        if drone not in self._requests:
+            self._requests[drone] = self.model.steps
+        self.deferred += 1
+        return False
+
+    def plan(self, drone: Drone) -> Plan | None:
+        """The strategy's plan for the drone (see Strategy.plan), call can_plan first."""
+        if drone in self._ready:
+            return self._ready.pop(drone)
+        self._requests.pop(drone, None)
+        return self._plan(drone)
+
+    def discard(self, drone: Drone) -> None:
+        """Forgets the drone's queued or ready plan, e.g. after its plan was invalidated."""
+        self._requests.pop(drone, None)
+        self._ready.pop(drone, None)
+
+    def decide(self, drone: Drone) -> tuple:
+        """The strategy's decision for the drone, or its fallback if the tick's budget is spent."""
+        if not self.has_time():
+            self.deferred += 1
+            return self.model.strategy.fallback(drone)
+        self._calls += 1
+        return self.model.strategy.decide(drone)
+
+    def decide_all(self, agents: list) -> list[tuple]:
+        """Strategy.decide_all for the agents, with the fallback for drones if the tick's budget is spent."""
+        if self.has_time():
+            self._calls += 1
+            return self.model.strategy.decide_all(agents)
+        drones = [agent for agent in agents if isinstance(agent, Drone)]
+        others = [agent for agent in agents if not isinstance(agent, Drone)]
+        self.deferred += len(drones)
+        decisions = dict(zip(others, self.model.strategy.decide_all(others)))
+        decisions.update((drone, self.model.strategy.fallback(drone)) for drone in drones)
+        return [decisions[agent] for agent in agents]
+
+    def _plan(self, drone: Drone) -> Plan | None:
+        self._calls += 1
+        return self.model.strategy.plan(drone)
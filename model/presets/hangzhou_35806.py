@@ -6,10 +6,10 @@ import numpy as np
 from agents.drone import Drone
 from agents.drop_zone import DropZone
 from agents.hub import Hub
-from agents.obstacle import Obstacle
 from agents.package import Package
+from model.assignment import assign_packages
 from model.initial_state import InitialStateSetter
-from model.presets.utils import get_delivery_locations, load_elevation_grid
+from model.presets.utils import get_delivery_locations, load_elevation_array, load_obstacles_from_elevation
 
 from .base import Preset
 
@@ -23,6 +23,7 @@ class Hangzhou35806Preset(Preset):
     height: int = 1310 // 2
     background: Path = Path(__file__).parent.parent.parent / "visualization/assets/Hangzhou_35806.png"
     show_gridlines = False
+    elevation_path: Path = Path(__file__).parent / "elevation/Hangzhou_elevation.json"
     
     
     def set_model_params(self, model: DroneModel) -> None:
@@ -37,31 +38,33 @@ class Hangzhou35806InitialStateSetter(InitialStateSetter):
     """An InitialStateSetter implementation that places drop zones according to Hangzhou AOI 35806."""
     def set_initial_state(self, model: DroneModel) -> None:
         
-        # set cell elevations
-        elevation_data_path = Path(__file__).parent / "elevation/Hangzhou_elevation.json"
-        elevation_data = load_elevation_grid(elevation_data_path)
-        
-        
-        for cell in model.grid:
-            cell_elevation = elevation_data[cell.coordinate]
-            model.set_elevation(cell.coordinate, cell_elevation)
+        # set cell elevations (already in place if the model uses a shared terrain, see model.shared_terrain)
+        if model.shared_terrain is None:
+            model.load_elevation(load_elevation_array(Hangzhou35806Preset.elevation_path, model.width, model.height))
         ######
         
+        if model.obstacle_elevation is not None:
+            load_obstacles_from_elevation(model, model.obstacle_elevation)
+        
         # place agents
         
-        available_cells = set(model.grid)
+        available_cells = set(c for c in model.grid if not model.is_obstacle(c.coordinate))
         
         all_coords = np.array([cell.coordinate for cell in model.grid])
         max_q = np.max(all_coords[:, 0]) 
         max_r = np.max(all_coords[:, 1])
         
         drop_zone_coords = get_delivery_locations("Hangzhou", model.num_packages, max_q, max_r)
+        # drones can't enter obstacle cells, so packages can't be delivered there
+        drop_zone_coords = [coord for coord in drop_zone_coords if not model.is_obstacle(coord)]
+        if not drop_zone_coords and model.num_packages > 0:
+            raise ValueError("Every delivery location is on an obstacle, raise obstacle_elevation or set num_packages=0")
         drop_zones = []
         for x, y in drop_zone_coords:
             cell = model.grid[x, y]
             dz = DropZone(model, cell)
             
-            available_cells.remove(cell)
+            available_cells.discard(cell)
             
             drop_zones.append(dz)
         
@@ -83,9 +86,7 @@ class Hangzhou35806InitialStateSetter(InitialStateSetter):
             
             drones.append(d)
 
-        for i, package in enumerate(packages):
-            drone_index = i % len(drones)
-            drones[drone_index].assigned_packages.append(package)
+        assign_packages(drones, packages)
             
         
         hubs = []
@@ -95,9 +96,6 @@ class Hangzhou35806InitialStateSetter(InitialStateSetter):
             
             hubs.append(h)
         
-        obstacles = []
         for _ in range(model.num_obstacles):
             cell = available_cells.pop()
-            o = Obstacle(model, cell=cell)
-            
-            obstacles.append(o)
\ No newline at end of file
+            model.add_obstacle(cell)
\ No newline at end of file
@@ -1,9 +1,15 @@
+from __future__ import annotations
 from ast import literal_eval
 import ast
 import json
 from pathlib import Path
+from typing import TYPE_CHECKING
+import numpy as np
 import pandas as pd
 
+if TYPE_CHECKING:
+    from model.model import DroneModel
+
 
 def load_elevation_grid(file_path):
     with open(file_path, 'r') as f:
@@ -14,6 +20,20 @@ def load_elevation_grid(file_path):
     return parsed_data
 
 
+def load_elevation_array(file_path, width: int, height: int) -> np.ndarray:
+    """Elevation grid of shape (width, height) from an elevation file (see load_elevation_grid), as integers like the height layer."""
+    elevation = np.zeros((width, height), dtype=int)
+    for (x, y), value in load_elevation_grid(file_path).items():
+        if 0 <= x < width and 0 <= y < height:
+            elevation[x, y] = value
+    return elevation
+
+
+def load_obstacles_from_elevation(model: DroneModel, threshold: float) -> None:
+    """Marks every cell whose elevation is at least `threshold` (e.g. tall buildings) as an obstacle."""
+    model.load_obstacles(model.grid.height_layer.data >= threshold)
+
+
 def get_delivery_locations(city: str, n: int, grid_width: int, grid_height: int):
     DATA_PATH = Path(__file__).parent.parent.parent / "evaluation/validation/insights/delivery_points_relative.csv"
     
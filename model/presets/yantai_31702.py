@@ -7,10 +7,10 @@ import numpy as np
 from agents.drone import Drone
 from agents.drop_zone import DropZone
 from agents.hub import Hub
-from agents.obstacle import Obstacle
 from agents.package import Package
+from model.assignment import assign_packages
 from model.initial_state import InitialStateSetter
-from model.presets.utils import get_delivery_locations, load_elevation_grid
+from model.presets.utils import get_delivery_locations, load_elevation_array, load_obstacles_from_elevation
 
 from .base import Preset
 
@@ -24,6 +24,7 @@ class Yantai31702Preset(Preset):
     height: int = 463 // 2
     background: Path = Path(__file__).parent.parent.parent / "visualization/assets/Yantai_31702.png"
     show_gridlines = False
+    elevation_path: Path = Path(__file__).parent / "elevation/Yantai_elevation.json"
     
     
     def set_model_params(self, model: DroneModel) -> None:
@@ -38,31 +39,33 @@ class Yantai31702InitialStateSetter(InitialStateSetter):
     """An InitialStateSetter implementation that places drop zones according to Yantai AOI 31702."""
     def set_initial_state(self, model: DroneModel) -> None:
         
-        # set cell elevations
-        elevation_data_path = Path(__file__).parent / "elevation/Yantai_elevation.json"
-        elevation_data = load_elevation_grid(elevation_data_path)
-        
-        
-        for cell in model.grid:
-            cell_elevation = elevation_data[cell.coordinate]
-            model.set_elevation(cell.coordinate, cell_elevation)
+        # set cell elevations (already in place if the model uses a shared terrain, see model.shared_terrain)
+        if model.shared_terrain is None:
+            model.load_elevation(load_elevation_array(Yantai31702Preset.elevation_path, model.width, model.height))
         ######
         
+        if model.obstacle_elevation is not None:
+            load_obstacles_from_elevation(model, model.obstacle_elevation)
+        
         # place agents
         
-        available_cells = set(model.grid)
+        available_cells = set(c for c in model.grid if not model.is_obstacle(c.coordinate))
         
         all_coords = np.array([cell.coordinate for cell in model.grid])
         max_q = np.max(all_coords[:, 0]) 
         max_r = np.max(all_coords[:, 1])
         
         drop_zone_coords = get_delivery_locations("Yantai", model.num_packages, max_q, max_r)
+        # drones can't enter obstacle cells, so packages can't be delivered there
+        drop_zone_coords = [coord for coord in drop_zone_coords if not model.is_obstacle(coord)]
+        if not drop_zone_coords and model.num_packages > 0:
+            raise ValueError("Every delivery location is on an obstacle, raise obstacle_elevation or set num_packages=0")
         drop_zones = []
         for x, y in drop_zone_coords:
             cell = model.grid[x, y]
             dz = DropZone(model, cell)
             
-            available_cells.remove(cell)
+            available_cells.discard(cell)
             
             drop_zones.append(dz)
         
@@ -84,9 +87,7 @@ class Yantai31702InitialStateSetter(InitialStateSetter):
             
             drones.append(d)
 
-        for i, package in enumerate(packages):
-            drone_index = i % len(drones)
-            drones[drone_index].assigned_packages.append(package)
+        assign_packages(drones, packages)
             
         
         hubs = []
@@ -96,9 +97,6 @@ class Yantai31702InitialStateSetter(InitialStateSetter):
             
             hubs.append(h)
         
-        obstacles = []
         for _ in range(model.num_obstacles):
             cell = available_cells.pop()
-            o = Obstacle(model, cell=cell)
-            
-            obstacles.append(o)
\ No newline at end of file
+            model.add_obstacle(cell)
\ No newline at end of file
@@ -0,0 +1,289 @@
+from __future__ import annotations
+import queue
+import shutil
+import threading
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset
+import pyarrow.ipc
+import pyarrow.parquet
+
+from algorithms.base import DroneAction
+from utils.distance import hex_vector_len
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+    from agents.package import Package
+
+
+DRONE_COLUMNS = {
+    "Step": np.int64,
+    "AgentID": np.int64,
+    "Col": np.int32,
+    "Row": np.int32,
+    "Altitude": np.float64,
+    "Speed": np.int32,
+    "Battery": np.float64,
+    "Action": np.int16,     # DroneAction value, 0 if the drone hasn't acted yet
+}
+
+
+class DeliveryLog:
+    """Append-only record of deliveries that counts all of them but only keeps the most recent ones."""
+    def __init__(self, keep: int = 1000):
+        self.count = 0
+        self.recent: deque[Package] = deque(maxlen=keep)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return iter(self.recent)
+
+    def append(self, package: Package) -> None:
+        self.count += 1
+        self.recent.append(package)
+
+
+def _make_empty_directory(directory: Path) -> None:
+    if directory.exists() and any(directory.iterdir()):
+        raise ValueError(f"{directory} isn't empty, records can only be moved to a new directory")
+    directory.mkdir(parents=True, exist_ok=True)
+
+
+class _ChunkSink:
+    """Destination of a table's chunks: kept in memory, or written to part files by a background thread.
+
+    In memory only the last keep chunks are kept (all of them if keep is None), older ones are dropped.
+    Every chunk is written to its own file (part-00000.parquet, ...), so the files written so far
+    can be read at any time. The queue between the model and the writer is bounded, so a slow disk
+    slows the model down instead of piling up chunks in memory.
+    """
+    def __init__(self, directory: Path | None, file_format: str, keep: int | None = None):
+        self.directory = directory
+        self.file_format = file_format
+        self.parts = 0
+        self._tables: deque[pa.Table] = deque(maxlen=keep)
+        self._queue: queue.Queue[pa.Table | None] | None = None
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._start_writer()
+
+    def __getstate__(self) -> dict:
+        # pickled (see model.snapshot) once the pending chunks are written, without the writer thread
+        if self._queue is not None:
+            self._queue.join()
+        self._raise_error()
+        return {**self.__dict__, "_queue": None, "_thread": None}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self.directory is not None:
+            self._start_writer()
+
+    def _start_writer(self) -> None:
+        self._queue = queue.Queue(maxsize=4)
+        self._thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self._thread.start()
+
+    def put(self, table: pa.Table) -> None:
+        if self._queue is None:
+            self._tables.append(table)
+            return
+        self._raise_error()
+        self._queue.put(table)
+
+    def tables(self) -> list[pa.Table]:
+        """All the chunks so far, or the kept ones in memory (waits for the pending ones to be written)."""
+        if self._queue is None:
+            return list(self._tables)
+        self._queue.join()
+        self._raise_error()
+        if self.parts == 0:
+            return []
+        dataset = pa.dataset.dataset(self.directory, format="parquet" if self.file_format == "parquet" else "arrow")
+        return [dataset.to_table()]
+
+    def relocate(self, directory: Path) -> None:
+        """Writes the next parts to another (empty) directory, which starts with a copy of the parts written so far."""
+        self._queue.join()
+        self._raise_error()
+        _make_empty_directory(directory)
+        for part in range(self.parts):
+            name = f"part-{part:05d}.{self.file_format}"
+            shutil.copyfile(self.directory / name, directory / name)
+        self.directory = directory
+
+    def close(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def _write_chunks(self) -> None:
+        while True:
+            table = self._queue.get()
+            try:
+                if table is None:
+                    return
+                if self._error is None:
+                    self._write(table)
+            except BaseException as error:      # re-raised in the model's thread
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _write(self, table: pa.Table) -> None:
+        path = self.directory / f"part-{self.parts:05d}.{self.file_format}"
+        if self.file_format == "parquet":
+            pa.parquet.write_table(table, path)
+        else:
+            with pa.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+        self.parts += 1
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+
+class _ColumnBuffer:
+    """Preallocated numpy columns of a table, handed to the sink in chunks of chunk_size rows."""
+    def __init__(self, columns: dict[str, type], chunk_size: int, sink: _ChunkSink):
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.sink = sink
+        self.rows = 0
+        self._allocate()
+
+    def _allocate(self) -> None:
+        self.buffers = {name: np.empty(self.chunk_size, dtype=dtype) for name, dtype in self.columns.items()}
+
+    def append(self, values: dict[str, np.ndarray]) -> None:
+        """Appends rows, values holds an array (or list) of equal length for every column."""
+        n = len(next(iter(values.values())))
+        start = 0
+        while start < n:
+            count = min(n - start, self.chunk_size - self.rows)
+            for name, buffer in self.buffers.items():
+                buffer[self.rows:self.rows + count] = values[name][start:start + count]
+            self.rows += count
+            start += count
+            if self.rows == self.chunk_size:
+                self.flush()
+
+    def flush(self) -> None:
+        if self.rows == 0:
+            return
+        # the buffers are handed over without copying and replaced by new ones
+        self.sink.put(pa.table({name: buffer[:self.rows] for name, buffer in self.buffers.items()}))
+        self._allocate()
+        self.rows = 0
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Everything recorded so far, or kept by the sink (including the rows not flushed yet)."""
+        tables = self.sink.tables()
+        if self.rows:
+            tables.append(pa.table({name: buffer[:self.rows].copy() for name, buffer in self.buffers.items()}))
+        if not tables:
+            return pd.DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in self.columns.items()})
+        return pa.concat_tables(tables).to_pandas()
+
+
+class MetricsRecorder:
+    """Streaming replacement of mesa's DataCollector with columnar, constant-memory storage.
+
+    Every tick, the model reporters (and optionally the state of every drone on the grid) are appended
+    to preallocated column buffers. Full buffers are flushed as chunks, to memory as Arrow tables or,
+    if a directory is given, to Parquet or Arrow IPC part files written by a background thread
+    (<directory>/metrics and <directory>/drones, which load straight into pandas with pd.read_parquet
+    or pyarrow.dataset). The results are also available as DataFrames, like DataCollector's.
+    In memory, only the last keep_chunks chunks of each table are kept (enough for the live plots),
+    so the DataFrames start keep_chunks * chunk_size rows back at most; keep_chunks=None keeps everything.
+    """
+    def __init__(self, model_reporters: dict[str, Callable[[DroneModel], float]], directory: Path | str | None = None,
+                 record_drones: bool = False, chunk_size: int = 4096, file_format: str = "parquet",
+                 keep_chunks: int | None = 16):
+        """
+        Args:
+            model_reporters (dict[str, Callable[[DroneModel], float]]): Column name -> function of the model (numeric values).
+            directory (Path | str | None, optional): Where to write the chunks. Defaults to None (kept in memory).
+            record_drones (bool, optional): Whether to record the state of every drone on the grid each tick. Defaults to False.
+            chunk_size (int, optional): Rows per chunk. Defaults to 4096.
+            file_format (str, optional): "parquet" or "arrow" (Arrow IPC files). Defaults to "parquet".
+            keep_chunks (int | None, optional): Chunks of each table kept in memory without a directory,
+                                                None keeps all of them (unbounded memory). Defaults to 16.
+        """
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown file format {file_format}, expected 'parquet' or 'arrow'")
+        self.model_reporters = model_reporters
+        self.record_drones = record_drones
+        directory = Path(directory) if directory is not None else None
+        self.directory = directory
+        self.metrics = _ColumnBuffer({"Step": np.int64, **{name: np.float64 for name in model_reporters}}, chunk_size,
+                                     _ChunkSink(directory / "metrics" if directory else None, file_format, keep_chunks))
+        self.drones: _ColumnBuffer | None = None
+        if record_drones:
+            self.drones = _ColumnBuffer(DRONE_COLUMNS, chunk_size,
+                                        _ChunkSink(directory / "drones" if directory else None, file_format, keep_chunks))
+
+    def collect(self, model: DroneModel) -> None:
+        row = {name: [reporter(model)] for name, reporter in self.model_reporters.items()}
+        row["Step"] = [model.steps]
+        self.metrics.append(row)
+
+        if self.drones is not None:
+            drones = [drone for drone in model.get_drones() if drone.cell is not None]
+            self.drones.append({
+                "Step": np.full(len(drones), model.steps),
+                "AgentID": [drone.unique_id for drone in drones],
+                "Col": [drone.cell.coordinate[0] for drone in drones],
+                "Row": [drone.cell.coordinate[1] for drone in drones],
+                "Altitude": [drone.altitude for drone in drones],
+                "Speed": [hex_vector_len(drone.cur_speed_vec) for drone in drones],
+                "Battery": [drone.battery for drone in drones],
+                "Action": [drone.last_action.value if drone.last_action is not None else 0 for drone in drones],
+            })
+
+    def get_model_vars_dataframe(self) -> pd.DataFrame:
+        """Model metrics, one row per tick, indexed by step."""
+        return self.metrics.to_pandas().set_index("Step")
+
+    def get_agent_vars_dataframe(self) -> pd.DataFrame:
+        """Drone states, indexed by step and drone id, with the action's name."""
+        if self.drones is None:
+            raise ValueError("Drone states aren't recorded, see record_drones")
+        df = self.drones.to_pandas()
+        names = {action.value: action.name for action in DroneAction}
+        df["Action"] = pd.Categorical(df["Action"].map(names), categories=list(names.values()))
+        return df.set_index(["Step", "AgentID"])
+
+    def flush(self) -> None:
+        """Hands the rows recorded so far to the sink (e.g. to have them on disk before the end of a run)."""
+        self.metrics.flush()
+        if self.drones is not None:
+            self.drones.flush()
+
+    def relocate(self, directory: Path | str) -> None:
+        """Streams the next chunks to another directory (which must be empty), e.g. from a model restored from a snapshot
+        (see model.snapshot) while the saved model keeps writing to its own. The chunks written so far are copied over."""
+        if self.directory is None:
+            raise ValueError("The records are kept in memory, there are no files to move")
+        directory = Path(directory)
+        self.metrics.sink.relocate(directory / "metrics")
+        if self.drones is not None:
+            self.drones.sink.relocate(directory / "drones")
+        self.directory = directory
+
+    def close(self) -> None:
+        """Flushes the buffers and waits for the background writers to finish."""
+        self.flush()
+        self.metrics.sink.close()
+        if self.drones is not None:
+            self.drones.sink.close()
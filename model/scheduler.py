@@ -0,0 +1,80 @@
+from __future__ import annotations
+import heapq
+import itertools
+from random import Random
+from mesa import Agent
+
+
+class ActiveAgentScheduler:
+    """Steps only the agents that currently have behaviour.
+
+    Agents whose class doesn't override Agent.step (obstacles, packages, drop zones) are never
+    scheduled. Other agents are awake from creation until they are removed from the model,
+    and can be put to sleep and woken up on events (e.g. a hub storing and deploying a drone).
+    Agents are kept in insertion order, so the per-tick shuffle only depends on the model's RNG.
+    Agents can also sleep until a given tick (e.g. a drone advanced over several ticks at once),
+    they are woken up by wake_due at the start of that tick.
+    """
+    def __init__(self, random: Random):
+        self.random = random
+        self._active: dict[Agent, None] = {}
+        self._wake_ticks: dict[Agent, int] = {}
+        self._wakeups: list[tuple[int, int, Agent]] = []    # heap of (tick, insertion order, agent)
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, agent: Agent) -> bool:
+        return agent in self._active
+
+    def __iter__(self):
+        return iter(list(self._active))
+
+    @staticmethod
+    def has_behaviour(agent: Agent) -> bool:
+        return type(agent).step is not Agent.step
+
+    def wake(self, agent: Agent) -> None:
+        if self.has_behaviour(agent):
+            self._active[agent] = None
+
+    def sleep(self, agent: Agent) -> None:
+        self._active.pop(agent, None)
+        self._wake_ticks.pop(agent, None)
+
+    def sleep_until(self, agent: Agent, tick: int) -> None:
+        """Puts the agent to sleep, it's woken up again by wake_due(tick)."""
+        self._active.pop(agent, None)
+        self._wake_ticks[agent] = tick
+        heapq.heappush(self._wakeups, (tick, next(self._counter), agent))
+
+    def next_wakeup(self) -> int | None:
+        """Tick of the earliest pending wake-up, or None if no agent sleeps until a given tick."""
+        while self._wakeups and self._wake_ticks.get(self._wakeups[0][2]) != self._wakeups[0][0]:
+            heapq.heappop(self._wakeups)    # stale, see wake_due
+        return self._wakeups[0][0] if self._wakeups else None
+
+    def wake_due(self, tick: int) -> None:
+        """Wakes up the agents sleeping until the given tick (or an earlier one)."""
+        while self._wakeups and self._wakeups[0][0] <= tick:
+            wake_tick, _, agent = heapq.heappop(self._wakeups)
+            if self._wake_ticks.get(agent) == wake_tick:    # skip entries of agents removed or put to sleep again
+                del self._wake_ticks[agent]
+                self.wake(agent)
+
+    def shuffled(self) -> list[Agent]:
+        """The active agents in random order."""
+        agents = list(self._active)
+        self.random.shuffle(agents)
+        return agents
+
+    def shuffle_do(self, method: str, *args, **kwargs) -> None:
+        """Calls the method on every active agent in random order.
+
+        Agents put to sleep during the tick are skipped, agents woken up during the tick
+        are first stepped in the next one.
+        """
+        for agent in self.shuffled():
+            if agent in self._active:
+                getattr(agent, method)(*args, **kwargs)
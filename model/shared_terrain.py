@@ -0,0 +1,113 @@
+from __future__ import annotations
+import sys
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+from model.presets.helpers import get_preset_instance
+from model.presets.utils import load_elevation_array
+from utils.terrain import TerrainIndex
+
+_ALIGNMENT = 64
+
+
+class SharedTerrain:
+    """Elevation, obstacle mask and terrain pyramid (see TerrainIndex) of a scenario, published once into shared memory.
+
+    Every process of a sweep attaches read-only NumPy views of the same block instead of loading the terrain
+    and building the pyramid itself, and models created with shared_terrain use those views as their height
+    and obstacle layers (a model copies a layer only when it changes it, see DroneModel.set_elevation).
+    Pickling a SharedTerrain (e.g. as an argument of a pool's task) only sends the block's name and layout,
+    the receiving process attaches to it:
+
+        terrain = SharedTerrain.from_preset("chongqing_38774", obstacle_elevation=30)
+        with multiprocessing.Pool(32) as pool:
+            pool.map(run, [(terrain, seed) for seed in range(100)])   # DroneModel(..., shared_terrain=terrain)
+        terrain.unlink()
+
+    The process that published the terrain owns the block and has to unlink it once the workers are done.
+    """
+    def __init__(self, memory: SharedMemory, layout: dict[str, tuple[str, tuple[int, ...], int]]):
+        """Use publish, from_preset or attach instead.
+
+        Args:
+            memory (SharedMemory): The block.
+            layout (dict[str, tuple[str, tuple[int, ...], int]]): Array name -> (dtype, shape, offset in the block).
+        """
+        self.memory = memory
+        self.layout = layout
+        self._arrays: dict[str, np.ndarray] = {}
+        for key, (dtype, shape, offset) in layout.items():
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)
+            array.flags.writeable = False
+            self._arrays[key] = array
+
+    @classmethod
+    def publish(cls, elevation: np.ndarray, obstacles: np.ndarray | None = None) -> SharedTerrain:
+        """Copies the terrain into a new shared memory block.
+
+        Args:
+            elevation (np.ndarray): Elevation grid, of shape (width, height), stored as integers like the height layer.
+            obstacles (np.ndarray | None, optional): Obstacle mask of the same shape. Defaults to None (no obstacles).
+        """
+        elevation = np.asarray(elevation).astype(int, copy=False)     # the dtype of the models' height layers
+        obstacles = np.zeros(elevation.shape, dtype=bool) if obstacles is None else np.asarray(obstacles, dtype=bool)
+        if obstacles.shape != elevation.shape:
+            raise ValueError(f"Obstacle mask of shape {obstacles.shape} doesn't match the elevation's {elevation.shape}")
+        arrays = {"obstacles": obstacles}
+        arrays.update((f"level{k}", level) for k, level in enumerate(TerrainIndex(elevation).levels))
+
+        layout, size = {}, 0
+        for key, array in arrays.items():
+            layout[key] = (array.dtype.str, array.shape, size)
+            size += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+        memory = SharedMemory(create=True, size=max(size, 1))
+        for key, array in arrays.items():
+            dtype, shape, offset = layout[key]
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)[...] = array
+        return cls(memory, layout)
+
+    @classmethod
+    def from_preset(cls, preset_name: str, obstacle_elevation: float | None = None) -> SharedTerrain:
+        """Publishes the terrain of a preset (see model.presets), with the obstacles DroneModel would mark for the
+        given obstacle_elevation (models using it should get the same obstacle_elevation)."""
+        preset = get_preset_instance(preset_name)
+        if preset is None:
+            raise ValueError(f"Preset with name {preset_name} doesn't exist.")
+        elevation = load_elevation_array(preset.elevation_path, preset.width, preset.height)
+        obstacles = elevation >= obstacle_elevation if obstacle_elevation is not None else None
+        return cls.publish(elevation, obstacles)
+
+    @classmethod
+    def attach(cls, name: str, layout: dict[str, tuple[str, tuple[int, ...], int]]) -> SharedTerrain:
+        """Attaches to a block published by another process."""
+        if sys.version_info >= (3, 13):
+            memory = SharedMemory(name=name, track=False)   # the publisher's process unlinks it
+        else:
+            memory = SharedMemory(name=name)
+        return cls(memory, layout)
+
+    def __reduce__(self):
+        return SharedTerrain.attach, (self.memory.name, self.layout)
+
+    @property
+    def elevation(self) -> np.ndarray:
+        return self._arrays["level0"]
+
+    @property
+    def obstacles(self) -> np.ndarray:
+        return self._arrays["obstacles"]
+
+    @property
+    def levels(self) -> list[np.ndarray]:
+        """Levels of the terrain's max-pyramid, see TerrainIndex."""
+        return [self._arrays[f"level{k}"] for k in range(len(self._arrays) - 1)]
+
+    def close(self) -> None:
+        """Detaches this process from the block (models using its views must be gone)."""
+        self._arrays.clear()
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Detaches and frees the block, call once in the publishing process when all the workers are done."""
+        self.close()
+        self.memory.unlink()
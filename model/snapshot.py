@@ -0,0 +1,197 @@
+from __future__ import annotations
+import gc
+import io
+import itertools
+import pickle
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+from mesa import Agent
+from mesa.discrete_space import Cell
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+
+
+SNAPSHOT_MAGIC = b"DRONESIM"
+SNAPSHOT_VERSION = 1        # bump whenever the layout below or the meaning of a snapshot's contents changes
+
+# Layout of a snapshot (see save_snapshot):
+#   magic (8 bytes) | version (uint16, little endian)
+#   header: pickled dict with the format version, the model's class, its tick, the states of its RNGs
+#           and the next agent id (mesa keeps the id counters in a class attribute of Agent, not in the model)
+#   payload: pickled model, then batches of pickled agent states ({unique_id: agent.__dict__}) closed by None.
+# Agents are written by reference (their class and unique_id) and created before anything refers to them,
+# so the dicts and sets keyed by agents (which hash by unique_id) can be rebuilt whatever the order.
+# Cells are written with their attributes (mesa drops them) but without their connections,
+# which the grid rebuilds when it is restored.
+
+
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file: BinaryIO):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.written: set[int] = set()      # unique ids of the agents referenced so far
+        self.pending: list[Agent] = []      # referenced agents whose state isn't written yet
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, Agent):
+            return None
+        if obj.unique_id not in self.written:
+            self.written.add(obj.unique_id)
+            self.pending.append(obj)
+        return "agent", type(obj), obj.unique_id
+
+    def reducer_override(self, obj):
+        if not isinstance(obj, Cell):
+            return NotImplemented
+        cls = type(obj)
+        if cls.__name__ == "GridCell":      # classes mesa creates for every grid, see _new_cell
+            cls = cls.__bases__[0]
+        slots = {name: getattr(obj, name) for name in ("_agents", "capacity", "coordinate", "properties", "random")}
+        slots["connections"] = {}
+        state = {key: value for key, value in obj.__dict__.items() if key != "neighborhood"}    # cached property
+        return _new_cell, (cls,), (state, slots)
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file: BinaryIO):
+        super().__init__(file)
+        self.agents: dict[int, Agent] = {}
+
+    def persistent_load(self, pid):
+        _, cls, unique_id = pid
+        agent = self.agents.get(unique_id)
+        if agent is None:
+            agent = self.agents[unique_id] = cls.__new__(cls)
+            agent.unique_id = unique_id
+        return agent
+
+
+_cell_classes: dict[type, type] = {}    # GridCell class per cell class, of the snapshot being restored
+
+
+def _new_cell(cls: type) -> Cell:
+    # like mesa's grids, cells get a class of their own, as the grid sets its property layers on it
+    if cls not in _cell_classes:
+        _cell_classes[cls] = type("GridCell", (cls,), {"_mesa_properties": set()})
+    cell_class = _cell_classes[cls]
+    return cell_class.__new__(cell_class)
+
+
+def save_snapshot(model: DroneModel, file: Path | str | BinaryIO) -> None:
+    """Writes the whole state of the model (agents, grid, strategy, schedulers, RNGs...) to a file.
+
+    The model can keep running afterwards. Records streamed to files (see record_path) are flushed first,
+    a restored model needs a record_path of its own (see load_snapshot).
+
+    Args:
+        model (DroneModel): The model, between two steps.
+        file (Path | str | BinaryIO): Path or binary file to write to.
+    """
+    if not hasattr(file, "write"):
+        with open(file, "wb") as f:
+            save_snapshot(model, f)
+        return
+    if model.simulator is not None:
+        raise ValueError("Models run by a simulator can't be saved, save the model between steps of a plain loop")
+    model.datacollector.flush()
+    if model.trajectory is not None:
+        model.trajectory.flush()
+
+    next_agent_id = next(Agent._ids[model])
+    Agent._ids[model] = itertools.count(next_agent_id)
+
+    file.write(SNAPSHOT_MAGIC + struct.pack("<H", SNAPSHOT_VERSION))
+    pickle.dump({
+        "version": SNAPSHOT_VERSION,
+        "model_class": type(model),
+        "steps": model.steps,
+        "random_state": model.random.getstate(),
+        "rng_state": model.rng.bit_generator.state,
+        "next_agent_id": next_agent_id,
+    }, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    pickler = _SnapshotPickler(file)
+    pickler.dump(model)
+    while pickler.pending:
+        agents, pickler.pending = pickler.pending, []
+        pickler.dump({agent.unique_id: agent.__dict__ for agent in agents})
+    pickler.dump(None)
+
+
+def load_snapshot(file: Path | str | BinaryIO, record_path: Path | str | None = None) -> DroneModel:
+    """Restores a model written by save_snapshot, it continues exactly like the saved model would have.
+
+    A model streaming records to files (see DroneModel record_path) is restored with a new, empty record_path,
+    starting with a copy of the records written before the snapshot, so neither the saved model (which may
+    still be running) nor other restores of the snapshot overwrite or read each other's records.
+
+    Args:
+        file (Path | str | BinaryIO): Path or binary file to read from.
+        record_path (Path | str | None, optional): Where the restored model streams its records.
+                                                   Required if the saved model streamed them to files. Defaults to None.
+
+    Raises:
+        ValueError: If the file isn't a snapshot or was written by an unsupported version of the format,
+                    or the saved model streamed its records to files and record_path is missing or not empty.
+
+    Returns:
+        DroneModel: The restored model.
+    """
+    if not hasattr(file, "read"):
+        with open(file, "rb") as f:
+            return load_snapshot(f, record_path)
+
+    preamble = file.read(len(SNAPSHOT_MAGIC) + 2)
+    if len(preamble) < len(SNAPSHOT_MAGIC) + 2 or preamble[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError("Not a model snapshot")
+    version, = struct.unpack("<H", preamble[len(SNAPSHOT_MAGIC):])
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}")
+    header = pickle.load(file)
+
+    _cell_classes.clear()
+    unpickler = _SnapshotUnpickler(file)
+    gc_enabled = gc.isenabled()
+    gc.disable()        # the collector would run over and over while the grid's cells are created
+    try:
+        model = unpickler.load()
+        while (states := unpickler.load()) is not None:
+            for unique_id, state in states.items():
+                unpickler.agents[unique_id].__dict__.update(state)
+    finally:
+        _cell_classes.clear()
+        if gc_enabled:
+            gc.enable()
+
+    model.random.setstate(header["random_state"])
+    model.rng.bit_generator.state = header["rng_state"]
+    Agent._ids[model] = itertools.count(header["next_agent_id"])
+    _move_records(model, record_path)
+    return model
+
+
+def _move_records(model: DroneModel, record_path: Path | str | None) -> None:
+    """Moves the restored model's records streamed to files to record_path (laid out like DroneModel does)."""
+    if model.datacollector.directory is None:
+        if record_path is not None:
+            raise ValueError("The saved model kept its records in memory, it can't be restored with a record_path")
+        return
+    if record_path is None:
+        raise ValueError("The saved model streamed its records to files, restore it with a record_path of its own")
+    record_path = Path(record_path)
+    model.datacollector.relocate(record_path)
+    if model.trajectory is not None:
+        model.trajectory.relocate(record_path / "trajectory")
+
+
+def snapshot(model: DroneModel) -> bytes:
+    """The model's snapshot as bytes, see save_snapshot."""
+    buffer = io.BytesIO()
+    save_snapshot(model, buffer)
+    return buffer.getvalue()
+
+
+def restore(data: bytes, record_path: Path | str | None = None) -> DroneModel:
+    """Model restored from a snapshot made by snapshot, see load_snapshot."""
+    return load_snapshot(io.BytesIO(data), record_path)
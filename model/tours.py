@@ -0,0 +1,151 @@
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING
+import numpy as np
+
+from utils.distance import xy_to_qrs_batch
+
+if TYPE_CHECKING:
+    from agents.drone import Drone
+    from agents.package import Package
+
+
+class _Tour:
+    """Optimizer state of a drone: its packages, their distance matrix and the current order."""
+    def __init__(self, packages: list[Package], order: list[int]):
+        self.packages = packages
+        self.index = {package: i for i, package in enumerate(packages)}
+        pickups = xy_to_qrs_batch([package.cell.coordinate for package in packages])
+        self.drop_offs = xy_to_qrs_batch([package.drop_zone.cell.coordinate for package in packages])
+        self.pickups = pickups
+        # node 0 is the drone, node i + 1 is package i (flown from its pickup to its drop-off),
+        # the tour is a cycle through node 0 whose return edges cost nothing
+        n = len(packages) + 1
+        self.distances = np.zeros((n, n), dtype=np.int64)
+        self.distances[1:, 1:] = np.abs(self.drop_offs[:, None, :] - pickups[None, :, :]).max(axis=-1)
+        self.order = order          # package indices, in the order they are served
+        self.next_move = 0          # local search state, see TourOptimizer._improve
+        self.failed_moves = 0       # consecutive moves that didn't improve the tour
+        self.converged = False
+
+
+class TourOptimizer:
+    """Orders the packages assigned to drones to shorten their tours.
+
+    A drone carries one package at a time, so a tour is an order of the packages (every package is flown
+    from its pickup to its drop zone), the cost of which is the distance flown between packages.
+    New packages are added by cheapest insertion of the package nearest to the tour, then the tour is
+    improved with 2-opt (segment reversal) and Or-opt (moving segments of up to 3 packages) moves until
+    no move improves it, or the time budget of the call runs out. The state is kept between calls, so
+    a small budget every tick converges over several ticks; delivered packages are dropped without
+    starting over. The drone's position is only taken into account when packages are added.
+    The state of a drone is dropped when it leaves the grid (see forget).
+    """
+    def __init__(self, time_budget: float | None = None):
+        """
+        Args:
+            time_budget (float | None, optional): Seconds a call may spend on local search (construction
+                                                  always completes). Defaults to None (run to convergence).
+        """
+        self.time_budget = time_budget
+        self._tours: dict[Drone, _Tour] = {}
+
+    def optimize(self, drone: Drone) -> None:
+        """Reorders drone.assigned_packages; a package the drone is carrying stays first."""
+        fixed = [drone.package] if drone.package is not None and drone.package in drone.assigned_packages else []
+        packages = [package for package in drone.assigned_packages
+                    if package not in fixed and package.cell is not None and package.drop_zone is not None]
+        if len(packages) < 2:
+            self._tours.pop(drone, None)
+            return
+        deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+
+        tour = self._tours.get(drone)
+        if tour is None or set(tour.packages) != set(packages):
+            tour = self._rebuild(drone, tour, packages, fixed)
+            self._tours[drone] = tour
+        if not tour.converged:
+            tour.order = self._improve(tour, deadline)
+
+        others = [package for package in drone.assigned_packages if package not in fixed and package not in tour.index]
+        drone.assigned_packages = fixed + [tour.packages[i] for i in tour.order] + others
+
+    def forget(self, drone: Drone) -> None:
+        """Drops the drone's state, called when it leaves the grid (destroyed or collected by a hub)."""
+        self._tours.pop(drone, None)
+
+    def _rebuild(self, drone: Drone, old: _Tour | None, packages: list[Package], fixed: list[Package]) -> _Tour:
+        """New state for the packages, keeping the order of the ones already in the old tour."""
+        kept = [old.packages[i] for i in old.order if old.packages[i] in packages] if old is not None else []
+        added = [package for package in packages if package not in kept]
+        tour = _Tour(kept + added, list(range(len(kept))))
+
+        start = fixed[0].drop_zone.cell.coordinate if fixed else drone.cell.coordinate
+        tour.distances[0, 1:] = np.abs(xy_to_qrs_batch(start) - tour.pickups).max(axis=-1)
+
+        # nearest insertion: the package closest to (any node of) the tour, at its cheapest position
+        d = tour.distances
+        nodes = [0] + [i + 1 for i in tour.order]
+        remaining = [len(kept) + i + 1 for i in range(len(added))]
+        while remaining:
+            closest = d[np.ix_(nodes, remaining)].min(axis=0)
+            node = remaining.pop(int(np.argmin(closest)))
+            following = nodes[1:] + [0]
+            costs = d[nodes, node] + d[node, following] - d[nodes, following]
+            nodes.insert(int(np.argmin(costs)) + 1, node)
+        tour.order = [node - 1 for node in nodes[1:]]
+        return tour
+
+    def _improve(self, tour: _Tour, deadline: float | None) -> list[int]:
+        """Local search from the tour's order, at least one move per call (so a call can't be a no-op)."""
+        d = tour.distances
+        nodes = [0] + [i + 1 for i in tour.order]
+        moves = (self._two_opt, self._or_opt)
+        while tour.failed_moves < len(moves):
+            if moves[tour.next_move](d, nodes):
+                tour.failed_moves = 0
+            else:
+                tour.failed_moves += 1
+            tour.next_move = (tour.next_move + 1) % len(moves)
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        tour.converged = tour.failed_moves == len(moves)
+        return [node - 1 for node in nodes[1:]]
+
+    @staticmethod
+    def _two_opt(d: np.ndarray, nodes: list[int]) -> bool:
+        """Applies the best segment reversal, if any shortens the tour."""
+        cycle = np.array(nodes + [0])
+        n = len(nodes)
+        forward = np.concatenate([[0], np.cumsum(d[cycle[:-1], cycle[1:]])])     # cost of the edges up to each node
+        backward = np.concatenate([[0], np.cumsum(d[cycle[1:], cycle[:-1]])])
+        # reverse nodes i + 1 .. j (1 <= i + 1 < j < n): the edges into and out of the segment change, and its edges flip
+        i, j = np.triu_indices(n, 2)
+        if len(i) == 0:
+            return False
+        old = d[cycle[i], cycle[i + 1]] + d[cycle[j], cycle[j + 1]] + forward[j] - forward[i + 1]
+        new = d[cycle[i], cycle[j]] + d[cycle[i + 1], cycle[j + 1]] + backward[j] - backward[i + 1]
+        best = int(np.argmin(new - old))
+        if new[best] - old[best] >= 0:
+            return False
+        nodes[i[best] + 1:j[best] + 1] = nodes[i[best] + 1:j[best] + 1][::-1]
+        return True
+
+    @staticmethod
+    def _or_opt(d: np.ndarray, nodes: list[int]) -> bool:
+        """Applies the first move of a segment of 1 to 3 packages to another position that shortens the tour."""
+        n = len(nodes)
+        for length in (1, 2, 3):
+            for start in range(1, n - length + 1):
+                end = start + length - 1
+                before, after = nodes[start - 1], nodes[(end + 1) % n]
+                first, last = nodes[start], nodes[end]
+                removed = d[before, first] + d[last, after] - d[before, after]
+                rest = nodes[:start] + nodes[end + 1:]
+                following = rest[1:] + [0]
+                inserted = d[rest, first] + d[last, following] - d[rest, following]
+                position = int(np.argmin(inserted))
+                if inserted[position] < removed:
+                    nodes[:] = rest[:position + 1] + nodes[start:end + 1] + rest[position + 1:]
+                    return True
+        return False
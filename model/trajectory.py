@@ -0,0 +1,299 @@
+from __future__ import annotations
+import io
+import math
+import shutil
+from enum import IntEnum
+from pathlib import Path
+from typing import TYPE_CHECKING
+import numpy as np
+from mesa import Model
+from mesa.agent import AgentSet
+from mesa.discrete_space import HexGrid
+from mesa.space import PropertyLayer
+
+from agents.collision import Collision
+from agents.drone import Drone
+from agents.drop_zone import DropZone
+from agents.hub import Hub
+from agents.package import Package
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
+
+
+# recorded agent classes, an agent's kind is its index + 1 (obstacles are static, they are in the obstacle layer)
+KINDS = (Drone, Hub, Package, DropZone, Collision)
+ALTITUDE_SCALE = 100        # altitudes are stored as integers in 1/100 of a unit
+
+
+class TrajectoryEvent(IntEnum):
+    DELIVERED = 1       # the event's agent is the delivered package
+    FAILED = 2          # the package whose delivery failed
+    COLLISION = 3       # the Collision marker created at the collision's cell
+
+
+def _encode_chunk(columns: dict[str, np.ndarray], events: np.ndarray) -> bytes:
+    """Delta-encodes the rows of a chunk along each agent's track and compresses them."""
+    order = np.lexsort((columns["tick"], columns["id"]))    # rows of an agent are consecutive, by tick
+    encoded = {"kind": columns["kind"][order].astype(np.int8), "events": events}
+    for name, dtype in (("id", np.int32), ("tick", np.int16), ("col", np.int16), ("row", np.int16), ("altitude", np.int32)):
+        encoded[name] = np.diff(columns[name][order], prepend=0).astype(dtype)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **encoded)
+    return buffer.getvalue()
+
+
+class _Chunk:
+    """Decoded chunk: the rows of every tick of the chunk, sorted by tick and agent id."""
+    def __init__(self, blob: bytes, start: int, length: int):
+        with np.load(io.BytesIO(blob)) as data:
+            columns = {name: np.cumsum(data[name], dtype=np.int64)
+                       for name in ("id", "tick", "col", "row", "altitude")}
+            columns["kind"] = data["kind"]
+            self.events = data["events"]
+        order = np.lexsort((columns["id"], columns["tick"]))
+        self.columns = {name: values[order] for name, values in columns.items()}
+        self.start = start
+        self.bounds = np.searchsorted(self.columns["tick"], np.arange(length + 1))
+
+    def rows(self, tick: int) -> dict[str, np.ndarray]:
+        begin, end = self.bounds[tick - self.start], self.bounds[tick - self.start + 1]
+        return {name: values[begin:end] for name, values in self.columns.items()}
+
+    def events_at(self, tick: int) -> list[tuple[TrajectoryEvent, int]]:
+        return [(TrajectoryEvent(kind), int(agent_id)) for event_tick, kind, agent_id in self.events if event_tick == tick]
+
+
+class Trajectory:
+    """Recorded run: the terrain, stored once, and the agents' states per tick in compressed chunks.
+
+    Chunk i holds ticks [i * chunk_ticks, (i + 1) * chunk_ticks) and can be decoded on its own, so its first
+    tick acts as a keyframe. Chunks are kept in memory or, if a directory is given, written to
+    <directory>/chunk-00000.npz, ... next to <directory>/terrain.npz.
+    """
+    def __init__(self, elevation: np.ndarray, obstacles: np.ndarray, chunk_ticks: int = 64, directory: Path | str | None = None):
+        """
+        Args:
+            elevation (np.ndarray): Height layer of the grid, of shape (width, height).
+            obstacles (np.ndarray): Obstacle layer of the grid, of shape (width, height).
+            chunk_ticks (int, optional): Ticks per chunk (at most 32767). Defaults to 64.
+            directory (Path | str | None, optional): Where to write the trajectory. Defaults to None (kept in memory).
+        """
+        if not 0 < chunk_ticks <= np.iinfo(np.int16).max:
+            raise ValueError(f"chunk_ticks must be between 1 and {np.iinfo(np.int16).max}, got {chunk_ticks}")
+        self.elevation = np.asarray(elevation)
+        self.obstacles = np.asarray(obstacles, dtype=bool)
+        self.chunk_ticks = chunk_ticks
+        self.directory = Path(directory) if directory is not None else None
+        self.last_tick = -1
+        self._chunks: dict[int, bytes] = {}
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(self.directory / "terrain.npz", elevation=self.elevation, obstacles=self.obstacles,
+                                chunk_ticks=chunk_ticks)
+
+    @classmethod
+    def open(cls, directory: Path | str) -> Trajectory:
+        """Trajectory written to a directory (by a run with record_trajectory and record_path)."""
+        directory = Path(directory)
+        with np.load(directory / "terrain.npz") as terrain:
+            trajectory = cls.__new__(cls)
+            trajectory.elevation = terrain["elevation"]
+            trajectory.obstacles = terrain["obstacles"]
+            trajectory.chunk_ticks = int(terrain["chunk_ticks"])
+        trajectory.directory = directory
+        trajectory._chunks = {}
+        indices = sorted(int(path.stem.split("-")[1]) for path in directory.glob("chunk-*.npz"))
+        trajectory.last_tick = -1
+        if indices:
+            chunk = trajectory.read_chunk(indices[-1])
+            trajectory.last_tick = int(chunk.columns["tick"].max(initial=-1)) + chunk.start
+        return trajectory
+
+    def write_chunk(self, index: int, blob: bytes) -> None:
+        """Stores (or replaces, e.g. after a partial chunk was flushed) the chunk."""
+        if self.directory is None:
+            self._chunks[index] = blob
+        else:
+            (self.directory / f"chunk-{index:05d}.npz").write_bytes(blob)
+
+    def read_chunk(self, index: int) -> _Chunk | None:
+        if self.directory is None:
+            blob = self._chunks.get(index)
+        else:
+            path = self.directory / f"chunk-{index:05d}.npz"
+            blob = path.read_bytes() if path.exists() else None
+        return _Chunk(blob, index * self.chunk_ticks, self.chunk_ticks) if blob is not None else None
+
+
+class TrajectoryRecorder:
+    """Records the cell and altitude of every agent on the grid and the deliveries and collisions of each tick.
+
+    The rows of the current chunk are buffered and encoded once the chunk is complete (see Trajectory),
+    the trajectory's last_tick is the last tick written so far: flush (or DroneModel.close) at the end of a run.
+    The run can then be watched or scrubbed through without simulating it again, see ReplayModel.
+    """
+    def __init__(self, model: DroneModel, chunk_ticks: int = 64, directory: Path | str | None = None):
+        """
+        Args:
+            model (DroneModel): The model, recorded from its current tick on.
+            chunk_ticks (int, optional): Ticks per chunk. Defaults to 64.
+            directory (Path | str | None, optional): Where to write the trajectory. Defaults to None (kept in memory).
+        """
+        self.trajectory = Trajectory(model.grid.height_layer.data, model.grid.obstacle_layer.data, chunk_ticks, directory)
+        self._chunk_index: int | None = None
+        self._rows: list[dict[str, np.ndarray]] = []
+        self._events: list[tuple[int, int, int]] = []
+        self._last_tick = -1        # last recorded tick, written once its chunk is
+        self._delivered = len(model.completed_deliveries)
+        self._failed = len(model.failed_deliveries)
+        self._collisions: set[Collision] = set(model.agents_by_type.get(Collision, ()))
+        self.record(model)
+
+    def record(self, model: DroneModel) -> None:
+        tick = model.steps
+        index = tick // self.trajectory.chunk_ticks
+        if index != self._chunk_index:
+            self.flush()
+            self._chunk_index, self._rows, self._events = index, [], []
+
+        agents = [(kind, agent) for kind, cls in enumerate(KINDS, start=1)
+                  for agent in model.agents_by_type.get(cls, ()) if agent.cell is not None]
+        self._rows.append({
+            "tick": np.full(len(agents), tick - index * self.trajectory.chunk_ticks, dtype=np.int64),
+            "id": np.array([agent.unique_id for _, agent in agents], dtype=np.int64),
+            "kind": np.array([kind for kind, _ in agents], dtype=np.int8),
+            "col": np.array([agent.cell.coordinate[0] for _, agent in agents], dtype=np.int64),
+            "row": np.array([agent.cell.coordinate[1] for _, agent in agents], dtype=np.int64),
+            "altitude": np.array([round(getattr(agent, "altitude", 0) * ALTITUDE_SCALE) for _, agent in agents], dtype=np.int64),
+        })
+        self._record_events(model, tick)
+        self._last_tick = tick
+
+    def _record_events(self, model: DroneModel, tick: int) -> None:
+        for log, event, attribute in ((model.completed_deliveries, TrajectoryEvent.DELIVERED, "_delivered"),
+                                      (model.failed_deliveries, TrajectoryEvent.FAILED, "_failed")):
+            new = len(log) - getattr(self, attribute)
+            setattr(self, attribute, len(log))
+            if new > 0:
+                self._events.extend((tick, event, package.unique_id) for package in list(log)[-new:])
+        collisions = set(model.agents_by_type.get(Collision, ()))
+        self._events.extend((tick, TrajectoryEvent.COLLISION, collision.unique_id)
+                            for collision in sorted(collisions - self._collisions, key=lambda c: c.unique_id))
+        self._collisions = collisions
+
+    def relocate(self, directory: Path | str) -> None:
+        """Writes the trajectory to another (empty) directory from now on, e.g. from a model restored from a snapshot
+        (see model.snapshot) while the saved model keeps writing to its own. The chunks written so far are copied over."""
+        trajectory = self.trajectory
+        if trajectory.directory is None:
+            raise ValueError("The trajectory is kept in memory, there are no files to move")
+        directory = Path(directory)
+        if directory.exists() and any(directory.iterdir()):
+            raise ValueError(f"{directory} isn't empty, the trajectory can only be moved to a new directory")
+        directory.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(trajectory.directory / "terrain.npz", directory / "terrain.npz")
+        # the current chunk may have been rewritten by the saved model since, it's written again from the buffered rows
+        for index in range(self._chunk_index or 0):
+            path = trajectory.directory / f"chunk-{index:05d}.npz"
+            if path.exists():
+                shutil.copyfile(path, directory / path.name)
+        trajectory.directory = directory
+        self.flush()
+
+    def flush(self) -> None:
+        """Writes the current chunk, even if incomplete (it is rewritten once more ticks are recorded)."""
+        if self._chunk_index is None or not self._rows:
+            return
+        columns = {name: np.concatenate([rows[name] for rows in self._rows]) for name in self._rows[0]}
+        events = np.array(self._events, dtype=np.int32).reshape(-1, 3)
+        self.trajectory.write_chunk(self._chunk_index, _encode_chunk(columns, events))
+        self.trajectory.last_tick = self._last_tick
+
+
+class _ReplayAgent:
+    """Recorded state of an agent, an instance of the recorded agent's class (for isinstance checks)
+    that is neither registered with the model nor placed into its cell."""
+    cell = None     # shadows CellAgent.cell, which would add the agent to the cell
+
+    def __init__(self, model: ReplayModel, unique_id: int):
+        self.model = model
+        self.unique_id = unique_id
+        self.altitude = 0.0
+
+
+_REPLAY_CLASSES = [type(f"Replay{cls.__name__}", (_ReplayAgent, cls), {}) for cls in KINDS]
+
+
+class ReplayModel(Model):
+    """Plays back a recorded trajectory through the model interface the visualization uses
+    (agents, grid, get_elevation, background, show_gridlines).
+
+    Every step shows the next recorded tick, seek jumps to any tick by decoding only the chunk
+    holding it (the last decoded chunk is kept, so stepping through a chunk decodes it once).
+    """
+    def __init__(self, trajectory: Trajectory | Path | str, background: Path = None, show_gridlines: bool = True):
+        """
+        Args:
+            trajectory (Trajectory | Path | str): The trajectory, or the directory it was written to.
+            background (Path, optional): Background image path. Defaults to None.
+            show_gridlines (bool, optional): Whether grid lines should be rendered. Defaults to True.
+        """
+        super().__init__()
+        if not isinstance(trajectory, Trajectory):
+            trajectory = Trajectory.open(trajectory)
+        self.trajectory = trajectory
+        self.width, self.height = trajectory.elevation.shape
+        self.background = background
+        self.show_gridlines = show_gridlines
+
+        self.grid = HexGrid((self.width, self.height), torus=False, capacity=math.inf, random=self.random)
+        self.grid.height_layer = PropertyLayer("height", self.width, self.height, default_value=0, dtype=int)
+        self.grid.height_layer.data[:] = trajectory.elevation
+        self.grid.obstacle_layer = PropertyLayer("obstacle", self.width, self.height, default_value=False, dtype=bool)
+        self.grid.obstacle_layer.data[:] = trajectory.obstacles
+
+        self.events: list[tuple[TrajectoryEvent, int]] = []     # events of the current tick
+        self._replay_agents: dict[int, _ReplayAgent] = {}
+        self._agents_set = AgentSet([], random=self.random)
+        self._chunk: _Chunk | None = None
+        self.seek(0)
+
+    @property
+    def agents(self) -> AgentSet:
+        """The agents on the grid at the current tick."""
+        return self._agents_set
+
+    def get_elevation(self, pos: tuple[int, int]) -> int:
+        return self.grid.height_layer.data[pos]
+
+    def is_obstacle(self, pos: tuple[int, int]) -> bool:
+        return self.grid.obstacle_layer.data[pos]
+
+    def step(self) -> None:
+        """Shows the next recorded tick (the mesa step wrapper has already advanced model.steps)."""
+        self.seek(self.steps)
+        self.running = self.steps < self.trajectory.last_tick
+
+    def seek(self, tick: int) -> None:
+        """Shows the recorded state at the tick (clamped to the recorded ticks)."""
+        tick = min(max(tick, 0), max(self.trajectory.last_tick, 0))
+        index = tick // self.trajectory.chunk_ticks
+        if self._chunk is None or self._chunk.start != index * self.trajectory.chunk_ticks:
+            self._chunk = self.trajectory.read_chunk(index)
+        self.steps = tick
+
+        agents = []
+        self.events = []
+        if self._chunk is not None:
+            rows = self._chunk.rows(tick)
+            for agent_id, kind, col, row, altitude in zip(rows["id"].tolist(), rows["kind"].tolist(), rows["col"].tolist(),
+                                                          rows["row"].tolist(), rows["altitude"].tolist()):
+                agent = self._replay_agents.get(agent_id)
+                if agent is None:
+                    agent = self._replay_agents[agent_id] = _REPLAY_CLASSES[kind - 1](self, agent_id)
+                agent.cell = self.grid._cells[(col, row)]
+                agent.altitude = altitude / ALTITUDE_SCALE
+                agents.append(agent)
+            self.events = self._chunk.events_at(tick)
+        self._agents_set = AgentSet(agents, random=self.random)
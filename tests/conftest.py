@@ -0,0 +1,54 @@
+import contextlib
+import io
+
+import pytest
+
+from model.model import DroneModel
+
+
+# a small hub_spawn model, tests pass the parameters they change
+MODEL_PARAMS = dict(
+    width=40,
+    height=40,
+    num_drones=6,
+    num_hubs=2,
+    algorithm_name="hub_spawn",
+    initial_state_setter_name="hubs",
+    drone_speed=8,
+    drone_acceleration=2,
+    drone_battery=1000,
+    drain_rate=1,
+    seed=2,
+)
+
+
+def quiet():
+    """Silences what agents and strategies print."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+@pytest.fixture
+def make_model():
+    def make_model(*presets: dict, **kwargs) -> DroneModel:
+        """Builds the model quietly from MODEL_PARAMS, updated with the presets and then the keyword arguments."""
+        params = dict(MODEL_PARAMS)
+        for preset in presets:
+            params.update(preset)
+        params.update(kwargs)
+        with quiet():
+            return DroneModel(**params)
+    return make_model
+
+
+@pytest.fixture
+def run():
+    def run(model, ticks: int, each=None) -> list:
+        """Steps the model quietly, the results of each(model) after every tick (if given)."""
+        results = []
+        with quiet():
+            for _ in range(ticks):
+                model.step()
+                if each is not None:
+                    results.append(each(model))
+        return results
+    return run
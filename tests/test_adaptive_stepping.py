@@ -0,0 +1,41 @@
+from utils.distance import hex_distance
+
+
+SPARSE = dict(width=200, height=200, num_drones=1, num_packages=3, num_hubs=0, initial_state_setter_name="random",
+              drone_speed=4, drone_battery=2000, seed=4)
+
+
+def updated(model):
+    """States of the drones updated this tick (not cruising)."""
+    return [(d.unique_id, d.cell.coordinate, d.altitude, d.battery, d.cur_speed_vec)
+            for d in model.get_drones() if d.cruise is None]
+
+
+def test_cruise_matches_per_tick_updates(make_model, run):
+    # with a single drone the per-tick shuffle draws no random numbers, so both runs share one random stream
+    full = run(make_model(SPARSE, adaptive_stepping=False), 300, updated)
+    model = make_model(SPARSE, adaptive_stepping=True)
+    adaptive = run(model, 300, updated)
+
+    skipped = [tick for tick, drones in enumerate(adaptive) if not drones]
+    assert skipped
+    for tick, drones in enumerate(adaptive):
+        if drones:
+            assert drones == full[tick]
+    assert len(model.completed_deliveries) == 3
+
+
+def test_no_other_drone_near_cruising_drones(make_model, run):
+    model = make_model(SPARSE, adaptive_stepping=True, num_drones=6, num_hubs=2)
+
+    def cruising(model):
+        drones = [drone for drone in model.get_drones() if drone.cell is not None]
+        for drone in drones:
+            if drone.cruise is None:
+                continue
+            for other in drones:
+                if other is not drone and other.cruise is None:
+                    assert hex_distance(drone.cell, other.cell) >= drone.interaction_range()
+        return sum(drone.cruise is not None for drone in drones)
+
+    assert sum(run(model, 150, cruising)) > 0
@@ -0,0 +1,37 @@
+import pytest
+
+from utils.agent_utils import get_closest_available_hub
+
+
+@pytest.fixture
+def ModelInstance(make_model):
+    return make_model(height=30, num_drones=0, num_hubs=6)
+
+
+def test_nearest_hub_map_matches_linear_scan(ModelInstance):
+    hubs = list(ModelInstance.get_hubs())
+    for full in ([], hubs[:2], hubs[1:5], hubs):
+        for hub in hubs:
+            hub.capacity = 0 if hub in full else 5
+        for cell in ModelInstance.grid.all_cells:
+            expected = get_closest_available_hub(cell, hubs)
+            assert ModelInstance.nearest_hubs.closest_available_hub(cell) is expected
+
+
+def test_nearest_hub_map_rebuilt_when_hubs_added(ModelInstance):
+    from agents.hub import Hub
+
+    cell = ModelInstance.empty_cells.sample(1, ModelInstance.random)[0]
+    ModelInstance.nearest_hubs.labels()
+    hub = Hub(ModelInstance, cell=cell)
+    assert ModelInstance.nearest_hubs.closest_hubs(cell)[0] is hub
+
+
+def test_nearest_hub_map_without_hubs(ModelInstance):
+    cell = ModelInstance.grid[(3, 4)]
+    for hub in list(ModelInstance.get_hubs()):
+        hub.remove()
+    assert (ModelInstance.nearest_hubs.labels() == -1).all()
+    assert ModelInstance.nearest_hubs.labels().shape == (40, 30)
+    assert ModelInstance.nearest_hubs.closest_hubs(cell) == []
+    assert ModelInstance.nearest_hubs.closest_available_hub(cell) is None
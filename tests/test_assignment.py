@@ -0,0 +1,65 @@
+import numpy as np
+
+from agents.drop_zone import DropZone
+from agents.package import Package
+from model.assignment import assign_packages, delivery_cost_matrix, delivery_distances, INFEASIBLE_COST
+from utils.distance import hex_distance
+
+
+# two drones and no packages, tests place them
+EMPTY = dict(num_drones=2, num_packages=0, num_hubs=0, initial_state_setter_name="random", drone_speed=4, seed=5)
+
+
+def make_package(model, pickup, drop_off):
+    return Package(model, model.grid[pickup], 0.5, 2, DropZone(model, model.grid[drop_off]))
+
+
+def test_delivery_distances_match_hex_distance(make_model):
+    model = make_model(EMPTY)
+    rng = np.random.default_rng(0)
+    origins, pickups, drop_offs = (rng.integers(0, 40, (n, 2)) for n in (5, 7, 7))
+    distances = delivery_distances(origins, pickups, drop_offs)
+    for i, origin in enumerate(origins):
+        for j, (pickup, drop_off) in enumerate(zip(pickups, drop_offs)):
+            expected = (hex_distance(model.grid[tuple(origin)], model.grid[tuple(pickup)])
+                        + hex_distance(model.grid[tuple(pickup)], model.grid[tuple(drop_off)]))
+            assert distances[i, j] == expected
+
+
+def test_infeasible_deliveries_cost_more():
+    costs = delivery_cost_matrix(np.array([[10, 100]]), np.array([20]), speed=4, acceleration=2, drain_rate=1)
+    assert costs[0, 0] == 10
+    assert costs[0, 1] == 100 + INFEASIBLE_COST
+
+
+def test_packages_go_to_the_closest_drones(make_model):
+    model = make_model(EMPTY)
+    drone, other = model.get_drones()
+    drone.assigned_packages, other.assigned_packages = [], []
+    drone.move_to(model.grid[(5, 5)])
+    other.move_to(model.grid[(35, 35)])
+
+    # round-robin would give the first package to the drone on the far side of the grid
+    far = make_package(model, (33, 34), (30, 30))
+    near = make_package(model, (6, 5), (10, 10))
+    next_near = make_package(model, (11, 10), (12, 12))
+    assign_packages([drone, other], [far, near, next_near])
+
+    assert drone.assigned_packages == [near, next_near]
+    assert other.assigned_packages == [far]
+
+
+def test_dispatch_prefers_the_closest_hub(make_model):
+    model = make_model(EMPTY, num_hubs=2, initial_state_setter_name="hubs")
+    hub_a, hub_b = model.get_hubs()
+    drone_a, drone_b = model.get_drones()
+    for hub, drone in ((hub_a, drone_a), (hub_b, drone_b)):
+        drone.cell = None
+        model.dispatcher.store(hub, drone)
+
+    package = Package(model, hub_b.cell, 0.5, 2, DropZone(model, hub_b.cell))
+    model.dispatcher.submit(hub_a, package)
+    assert not model.dispatcher.can_dispatch(hub_a)
+    assert model.dispatcher.dispatch(hub_b) == (drone_b, package)
+    assert not hub_a.package_requests
+    assert hub_a.stored_drones == [drone_a]
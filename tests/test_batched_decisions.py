@@ -0,0 +1,53 @@
+from agents.hub import Hub
+from algorithms.base import HubAction
+
+
+def test_decisions_are_made_on_the_same_snapshot(make_model, run):
+    model = make_model(num_drones=8, num_hubs=3, seed=4, batched_decisions=True)
+    batches, deployments, plans = [], [], []
+    decide_all, plan = model.strategy.decide_all, model.strategy.plan
+
+    def at_snapshot():
+        # no agent has acted yet in this tick
+        return all(drone.last_cell is drone.cell and drone.last_altitude == drone.altitude
+                   for drone in model.get_drones() if drone.cell is not None and drone.wants_decision())
+
+    def spy(agents):
+        assert at_snapshot()
+        batches.append(agents)
+        decisions = decide_all(agents)
+        deployments.extend(agent for agent, (action, _) in zip(agents, decisions)
+                           if isinstance(agent, Hub) and action == HubAction.DEPLOY_DRONE)
+        return decisions
+
+    def plan_spy(drone):
+        # drones following plans leave the batch, they still plan before anyone acts
+        assert at_snapshot()
+        plans.append(drone)
+        return plan(drone)
+
+    model.strategy.decide_all = spy
+    model.strategy.plan = plan_spy
+    run(model, 300)
+
+    assert len(batches) == 300
+    assert all(sum(isinstance(agent, Hub) for agent in batch) == 3 for batch in batches)
+    assert deployments      # drones are still deployed by the batched decisions
+    assert plans
+    assert model.completed_deliveries
+
+
+def test_strategies_without_bulk_decisions_fall_back_to_decide(make_model, run):
+    model = make_model(num_drones=8, num_hubs=3, seed=4, batched_decisions=True)
+    model.strategy.plan = lambda drone: None    # drones following a plan don't ask the strategy
+    calls = []
+    decide = model.strategy.decide
+
+    def spy(agent):
+        calls.append(agent)
+        return decide(agent)
+
+    model.strategy.decide = spy
+    active = sorted(agent.unique_id for agent in model.scheduler)
+    run(model, 1)
+    assert sorted(agent.unique_id for agent in calls) == active
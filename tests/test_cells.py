@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from utils.distance import hex_distance
+
+
+@pytest.fixture
+def ModelInstance(make_model):
+    return make_model(width=30, height=30, num_drones=10, num_packages=10, num_hubs=3, num_obstacles=20,
+                      initial_state_setter_name="random", drone_speed=20, drone_acceleration=4, drone_battery=100)
+
+
+def assert_index_matches_grid(model):
+    empty = {cell for cell in model.grid.all_cells if cell.is_empty and not model.is_obstacle(cell.coordinate)}
+    assert len(model.empty_cells) == len(empty)
+    assert all(cell in model.empty_cells for cell in empty)
+
+
+def assert_hub_events_match_grid(model):
+    for hub in model.get_hubs():
+        airborne = [d for d in model.get_drones() if d.cell is not None]
+        assert hub.airspace_occupancy == sum(1 for d in airborne if hex_distance(hub.cell, d.cell) <= hub.airspace_radius)
+        assert set(hub.docking_queue) == {d for d in airborne if d.cell is hub.cell}
+
+
+def test_empty_cell_index_tracks_agents(ModelInstance, run):
+    assert_index_matches_grid(ModelInstance)
+    run(ModelInstance, 50, assert_index_matches_grid)
+
+
+def test_hub_airspace_and_docking_track_drones(ModelInstance, run):
+    assert_hub_events_match_grid(ModelInstance)
+    run(ModelInstance, 50, assert_hub_events_match_grid)
+
+
+def test_empty_cell_sample(ModelInstance):
+    rng = random.Random(0)
+    sample = ModelInstance.empty_cells.sample(5, rng)
+    assert len(set(sample)) == 5
+    assert all(cell.is_empty for cell in sample)
+    assert len(ModelInstance.empty_cells.sample(10**6, rng)) == len(ModelInstance.empty_cells)
+
+
+def test_obstacles_without_agents_are_never_empty(make_model, run):
+    model = make_model(width=30, height=30, num_drones=10, num_packages=10, num_hubs=3, num_obstacles=200,
+                       obstacle_agents=False, initial_state_setter_name="random", drone_speed=20,
+                       drone_acceleration=4, drone_battery=100, seed=1)
+    assert not model.get_obstacles()
+    assert_index_matches_grid(model)
+    assert not any(model.is_obstacle(cell.coordinate) for cell in model.empty_cells.sample(10**6, random.Random(0)))
+
+    blocked = next(cell for cell in model.grid.all_cells if model.is_obstacle(cell.coordinate))
+    model.set_obstacle(blocked.coordinate, False)
+    assert blocked in model.empty_cells
+    model.load_obstacles(model.grid.obstacle_layer.data | (model.grid.height_layer.data > 140))
+    assert_index_matches_grid(model)
+
+    run(model, 100)
+    assert_index_matches_grid(model)
+    assert not any(model.is_obstacle(package.cell.coordinate) or model.is_obstacle(package.drop_zone.cell.coordinate)
+                   for package in model.get_packages() if package.cell is not None)
+
+
+def test_removed_hubs_leave_their_airspace(ModelInstance):
+    hub = ModelInstance.get_hubs()[0]
+    cell = hub.cell
+    hub.remove()
+    assert not any(hub in grid_cell.airspace for grid_cell in ModelInstance.grid.all_cells)
+    drone = ModelInstance.get_drones()[0]
+    drone.move_to(cell)
+    assert hub.airspace_occupancy == 0 and not hub.docking_queue
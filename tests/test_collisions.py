@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from agents.collision import Collision
+from model.collisions import CONTACT_DISTANCE, CollisionScheduler, sweep_contacts
+
+
+# crowded enough for collisions
+CROWDED = dict(num_drones=25, num_packages=25, num_hubs=3, initial_state_setter_name="random",
+               drone_acceleration=3, drone_battery=500)
+
+
+def collisions(model):
+    return sorted(c.cell.coordinate for c in model.agents_by_type.get(Collision, []))
+
+
+@pytest.mark.parametrize("speed_a, speed_b", [(0, 0), (2, 8), (8, 8)])
+def test_time_to_contact_is_a_lower_bound(make_model, speed_a, speed_b):
+    scheduler = CollisionScheduler(make_model(CROWDED, seed=0))
+    max_speed, acceleration = scheduler.max_speed, scheduler.acceleration
+    for distance in range(0, 120):
+        # drones flying straight at each other, speeding up as fast as possible;
+        # the sweep of a tick reaches back to the drones' positions at the start of it
+        gap, a, b, ticks = distance, speed_a, speed_b, 0
+        while True:
+            ticks += 1
+            a, b = min(a + acceleration, max_speed), min(b + acceleration, max_speed)
+            if gap - (a + b) <= CONTACT_DISTANCE:
+                break
+            gap -= a + b
+        assert scheduler.ticks_to_contact(distance, speed_a, speed_b) <= ticks
+
+
+def test_same_collisions_as_checking_every_pair(make_model, run, monkeypatch):
+    scheduled = [run(make_model(CROWDED, seed=seed), 120, collisions) for seed in range(3)]
+    monkeypatch.setattr(CollisionScheduler, "ticks_to_contact", lambda self, distance, speed_a, speed_b: 1)
+    monkeypatch.setattr(CollisionScheduler, "ticks_to_vertical_contact", lambda self, gap: 1)
+    monkeypatch.setattr(CollisionScheduler, "footprint", lambda self, drone: (0, 0, 0, 0))      # every pair is near
+    exhaustive = [run(make_model(CROWDED, seed=seed), 120, collisions) for seed in range(3)]
+    assert any(any(tick) for collisions in exhaustive for tick in collisions)
+    assert scheduled == exhaustive
+
+
+def test_only_near_pairs_are_queued(make_model, run):
+    model = make_model(width=150, height=150, num_drones=60, num_packages=60, num_hubs=4,
+                       initial_state_setter_name="random", drone_speed=4, seed=1)
+    scheduler = model.collision_scheduler
+
+    def check(model):
+        airborne = [drone for drone in model.get_drones() if drone.cell is not None]
+        footprints = {drone: scheduler.footprint(drone) for drone in airborne}
+        near = {(a.unique_id, b.unique_id) for a in airborne for b in airborne
+                if a.unique_id < b.unique_id and scheduler._near(footprints[a], footprints[b])}
+        assert near <= set(scheduler._tokens)
+        return len(airborne)
+
+    airborne = run(model, 60, check)[-1]
+    assert len(scheduler._queue) < airborne * (airborne - 1) // 4
+
+
+def test_sweep_contacts_matches_dense_sampling():
+    rng = np.random.default_rng(0)
+    n = 400
+    a_start, b_start = rng.integers(-6, 7, (2, n, 2))
+    a_end, b_end = a_start + rng.integers(-5, 6, (n, 2)), b_start + rng.integers(-5, 6, (n, 2))
+    cube = lambda qr: np.concatenate([qr, -qr.sum(axis=1, keepdims=True)], axis=1)
+    a_start, a_end, b_start, b_end = map(cube, (a_start, a_end, b_start, b_end))
+    dz_start, dz_end = rng.uniform(-3, 3, (2, n))
+    dz_min, dz_max = np.full(n, -1.0), np.full(n, 0.6)
+
+    contact, time = sweep_contacts(a_start, a_end, b_start, b_end, dz_start, dz_end, dz_min, dz_max)
+
+    t = np.linspace(0, 1, 20001)[None, :, None]
+    relative = (a_start - b_start)[:, None, :] + t * ((a_end - a_start) - (b_end - b_start))[:, None, :]
+    dz = dz_start[:, None] + t[..., 0] * (dz_end - dz_start)[:, None]
+    sampled = (np.abs(relative).sum(axis=-1) / 2 <= CONTACT_DISTANCE) & (dz_min[:, None] <= dz) & (dz <= dz_max[:, None])
+
+    assert contact.any() and not contact.all()
+    for i in range(n):
+        if sampled[i].any():
+            assert contact[i]
+            assert time[i] == pytest.approx(t[0, sampled[i].argmax(), 0], abs=1e-4)
+        elif contact[i]:    # touching for less than a sampling step
+            assert np.isclose(np.abs(relative[i]).sum(axis=-1) / 2, CONTACT_DISTANCE, atol=1e-3).any()
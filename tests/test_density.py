@@ -0,0 +1,49 @@
+import pytest
+
+from utils.distance import hex_vector, hex_vector_len
+
+
+CROWDED = dict(width=60, height=60, num_drones=30, num_packages=30, num_hubs=3,
+               initial_state_setter_name="random", drone_speed=6, seed=3)
+
+
+def test_unknown_repulsion_mode(make_model):
+    with pytest.raises(ValueError):
+        make_model(CROWDED, repulsion="magnetic")
+
+
+@pytest.mark.parametrize("offset", [(3, 0), (0, 3), (-2, 2), (2, -3)])
+def test_field_pushes_drones_apart(make_model, offset):
+    model = make_model(CROWDED, repulsion="field", num_drones=2, num_packages=0, num_hubs=0)
+    drone, other = model.get_drones()
+    drone.move_to(model.grid[(30, 30)])
+    other.move_to(model.grid[(30 + offset[0], 30 + offset[1])])
+    other.altitude = drone.altitude + 3
+    drone.cur_speed_vec = (1, 0, -1)    # hovering drones aren't pushed
+    model.density_field.update([drone, other])
+
+    vector, altitude_vector = model.density_field.repulsion(drone)
+    away = hex_vector(other.cell, drone.cell)
+    assert 0 < hex_vector_len(vector) <= drone.acceleration
+    assert sum(a * b for a, b in zip(vector, away)) > 0     # pointing away from the other drone
+    assert altitude_vector < 0                              # the other drone is above
+
+
+def test_no_self_gradient_at_the_grid_edges(make_model):
+    model = make_model(CROWDED, repulsion="field", num_drones=1, num_packages=0, num_hubs=0)
+    drone = model.get_drones()[0]
+    for coordinate in [(0, 30), (59, 30), (30, 0), (30, 59), (0, 0), (59, 59)]:
+        drone.move_to(model.grid[coordinate])
+        model.density_field.update([drone])
+        assert model.density_field.gradient[0][coordinate] == pytest.approx(0, abs=1e-15)
+        assert model.density_field.gradient[1][coordinate] == pytest.approx(0, abs=1e-15)
+
+
+def test_field_mode_delivers_like_pairwise_mode(make_model, run):
+    models = {repulsion: make_model(CROWDED, repulsion=repulsion) for repulsion in ("pairwise", "field")}
+    for model in models.values():
+        run(model, 150)
+    pairwise, field = models["pairwise"], models["field"]
+    assert field.collided_drones <= pairwise.collided_drones
+    assert len(field.get_drones()) == len(pairwise.get_drones())
+    assert len(field.completed_deliveries) >= len(pairwise.completed_deliveries) / 2
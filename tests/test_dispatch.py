@@ -0,0 +1,127 @@
+import pytest
+
+from agents.drone import Drone
+from agents.package import Package
+from model.dispatch import RequestQueue
+
+
+@pytest.fixture
+def ModelInstance(make_model):
+    return make_model(width=20, height=20, num_drones=2, num_packages=0, drone_speed=20, drone_acceleration=4,
+                      drone_battery=100)
+
+
+def test_request_queue_order(ModelInstance):
+    queue = RequestQueue()
+    packages = [Package(ModelInstance) for _ in range(4)]
+    queue.push(packages[0], created_at=5)
+    queue.push(packages[1], created_at=2)
+    queue.push(packages[2], created_at=9, priority=-1)
+    queue.push(packages[3], created_at=2)
+    assert list(queue) == [packages[2], packages[1], packages[3], packages[0]]
+    assert [queue.pop() for _ in range(4)] == [packages[2], packages[1], packages[3], packages[0]]
+    assert not queue
+
+
+def test_request_queue_remove_keeps_order(ModelInstance):
+    queue = RequestQueue()
+    packages = [Package(ModelInstance) for _ in range(4)]
+    for created_at, package in enumerate(packages):
+        queue.push(package, created_at=created_at)
+    queue.remove(packages[2])
+    queue.remove(packages[0])
+    assert len(queue) == 2
+    assert list(queue) == [packages[1], packages[3]]
+    assert queue.peek_key()[:2] == (0, 1)
+    assert [queue.pop() for _ in range(2)] == [packages[1], packages[3]]
+    assert not queue
+
+
+def test_requests_are_per_hub_and_per_model(ModelInstance, make_model):
+    hub_a, hub_b = list(ModelInstance.get_hubs())
+    ModelInstance.dispatcher.submit(hub_a, Package(ModelInstance))
+    assert len(hub_a.package_requests) == 1
+    assert len(hub_b.package_requests) == 0
+
+    other_model = make_model(width=10, height=10, num_drones=0, num_hubs=1)
+    assert len(other_model.get_hubs()[0].package_requests) == 0
+
+
+def test_dispatch_pairs_drone_with_request(ModelInstance):
+    hub_a, hub_b = list(ModelInstance.get_hubs())
+    drone = ModelInstance.get_drones()[0]
+    drone.cell = None
+    ModelInstance.dispatcher.store(hub_b, drone)
+    assert not ModelInstance.dispatcher.can_dispatch(hub_b)
+
+    package = Package(ModelInstance)
+    ModelInstance.dispatcher.submit(hub_a, package)
+    assert not ModelInstance.dispatcher.can_dispatch(hub_a)
+    assert ModelInstance.dispatcher.can_dispatch(hub_b)
+
+    assert ModelInstance.dispatcher.dispatch(hub_b) == (drone, package)
+    assert ModelInstance.dispatcher.pending == 0
+    assert not hub_b.stored_drones
+
+
+def test_dispatch_only_solves_the_matching_again_after_new_requests_or_drones(make_model):
+    model = make_model(width=20, height=20, num_drones=0, num_packages=0)
+    hub_a, hub_b = list(model.get_hubs())
+    for hub in (hub_a, hub_a, hub_b):
+        model.dispatcher.store(hub, Drone(model))
+    packages = [Package(model) for _ in range(3)]
+    for package in packages:
+        model.dispatcher.submit(hub_a, package)
+
+    assert model.dispatcher.can_dispatch(hub_a)
+    matches = {hub: list(hub_matches) for hub, hub_matches in model.dispatcher._matches.items()}
+    drone, package = model.dispatcher.dispatch(hub_a)
+    assert (drone, hub_a, package) == matches[hub_a][0]
+    assert not model.dispatcher._stale
+    assert model.dispatcher._matches[hub_b] == matches[hub_b]      # the other matches are kept as they were
+
+    model.dispatcher.store(hub_b, Drone(model))
+    assert model.dispatcher._stale
+    assert model.dispatcher.can_dispatch(hub_b)
+    assert not model.dispatcher._stale
+
+
+def test_queue_mode_serves_own_then_most_urgent_request(make_model):
+    model = make_model(width=20, height=20, num_drones=0, num_packages=0, num_hubs=3, dispatch="queue")
+    hub_a, hub_b, hub_c = list(model.get_hubs())
+    drones = [Drone(model) for _ in range(3)]
+    for drone in drones:
+        model.dispatcher.store(hub_c, drone)
+
+    own, old, urgent = (Package(model) for _ in range(3))
+    model.dispatcher.submit(hub_a, old)
+    model.steps += 1
+    model.dispatcher.submit(hub_b, urgent, priority=-1)
+    model.dispatcher.submit(hub_c, own, priority=5)
+    assert [model.dispatcher.dispatch(hub_c)[1] for _ in range(3)] == [own, urgent, old]
+    assert model.dispatcher.pending == 0
+    assert not model.dispatcher.can_dispatch(hub_c)
+
+
+@pytest.mark.parametrize("mode", ["matching", "queue"])
+def test_requests_of_a_removed_hub_move_to_the_closest_hub(make_model, mode):
+    model = make_model(width=20, height=20, num_drones=0, num_packages=0, dispatch=mode)
+    hub_a, hub_b = list(model.get_hubs())
+    packages = [Package(model) for _ in range(2)]
+    model.dispatcher.submit(hub_a, packages[0])
+    model.dispatcher.submit(hub_a, packages[1], priority=-1)
+    model.dispatcher.store(hub_b, Drone(model))
+
+    hub_a.remove()
+    assert model.dispatcher.pending == 2
+    assert list(hub_b.package_requests) == [packages[1], packages[0]]
+    assert model.dispatcher.dispatch(hub_b)[1] is packages[1]
+
+    hub_b.remove()
+    assert model.dispatcher.pending == 0
+    assert not model.dispatcher.can_dispatch(hub_b)
+
+
+def test_unknown_dispatch_mode(make_model):
+    with pytest.raises(ValueError):
+        make_model(width=10, height=10, num_drones=0, num_hubs=1, dispatch="auction")
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+from mesa.discrete_space import Cell
+
+from utils.distance import *
+
+
+@pytest.fixture
+def Coords():
+    rng = random.Random(42)
+    return [(rng.randint(0, 99), rng.randint(0, 99)) for _ in range(200)]
+
+
+@pytest.fixture
+def Vectors():
+    rng = random.Random(7)
+    return [(q, r, -q - r) for q, r in ((rng.randint(-40, 40), rng.randint(-40, 40)) for _ in range(500))]
+
+
+def test_xy_qrs_batch_matches_scalar(Coords):
+    qrs = xy_to_qrs_batch(np.array(Coords))
+    assert [tuple(v) for v in qrs.tolist()] == [xy_to_qrs(c) for c in Coords]
+    assert [tuple(v) for v in qrs_to_xy_batch(qrs).tolist()] == Coords
+
+
+def test_hex_distance_batch_matches_scalar(Coords):
+    a = np.array(Coords[:100])
+    b = np.array(Coords[100:])
+    expected = [hex_distance(Cell(x, None), Cell(y, None)) for x, y in zip(Coords[:100], Coords[100:])]
+    assert hex_distance_batch(a, b).tolist() == expected
+
+    one_to_many = hex_distance_batch(a, np.array(Coords[0]))
+    assert one_to_many.tolist() == [hex_distance(Cell(Coords[0], None), Cell(c, None)) for c in Coords[:100]]
+
+
+def test_pairwise_hex_distance_matches_scalar(Coords):
+    a = Coords[:20]
+    b = Coords[20:50]
+    distances = pairwise_hex_distance(np.array(a), np.array(b))
+    assert distances.shape == (20, 30)
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            assert distances[i, j] == hex_distance(Cell(x, None), Cell(y, None))
+    assert (np.diag(pairwise_hex_distance(np.array(a))) == 0).all()
+
+
+@pytest.mark.parametrize("n", [0, 1, 3, 4, 7, 20, 2.5])
+def test_normalize_hex_vector_batch_matches_scalar(Vectors, n):
+    batch = normalize_hex_vector_batch(np.array(Vectors), n)
+    assert [tuple(v) for v in batch.tolist()] == [normalize_hex_vector(v, n) for v in Vectors]
+
+
+def test_normalize_hex_vector_batch_per_vector_lengths(Vectors):
+    lengths = np.arange(len(Vectors)) % 21
+    batch = normalize_hex_vector_batch(np.array(Vectors), lengths)
+    assert [tuple(v) for v in batch.tolist()] == [normalize_hex_vector(v, int(n)) for v, n in zip(Vectors, lengths)]
+
+
+def test_vector_arithmetic_batch_matches_scalar(Vectors):
+    a = np.array(Vectors[:250])
+    b = np.array(Vectors[250:])
+    assert [tuple(v) for v in add_hex_vectors_batch(a, b).tolist()] == [add_hex_vectors(x, y) for x, y in zip(Vectors[:250], Vectors[250:])]
+    assert [tuple(v) for v in sub_hex_vectors_batch(a, b).tolist()] == [sub_hex_vectors(x, y) for x, y in zip(Vectors[:250], Vectors[250:])]
+    assert hex_vector_len_batch(a).tolist() == [hex_vector_len(v) for v in Vectors[:250]]
+
+    halves = a / 3
+    assert [tuple(v) for v in round_hex_vector_batch(halves).tolist()] == [round_hex_vector(tuple(v)) for v in halves.tolist()]
@@ -145,4 +145,15 @@ def test__astar(GraphBasedInstance):
         for package in GraphBasedInstance.model.get_packages():
             drone_cell = drone.cell
             package_cell = package.cell
-            assert GraphBasedInstance._astar(drone_cell, package_cell, hex_distance) is not None
\ No newline at end of file
+            assert GraphBasedInstance._astar(drone_cell, package_cell, hex_distance) is not None
+
+
+def test__neighbors_skip_obstacles(GraphBasedInstance):
+    GraphBasedInstance._create_adjacency_matrix()
+    model = GraphBasedInstance.model
+    cell = model.grid[(20, 61)]
+    blocked = list(cell.neighborhood)[0]
+    model.set_obstacle(blocked.coordinate)
+    neighbors = GraphBasedInstance._neighbors(cell)
+    assert blocked not in neighbors
+    assert all(not model.is_obstacle(neighbor.coordinate) for neighbor in neighbors)
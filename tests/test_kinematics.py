@@ -0,0 +1,43 @@
+import math
+import random
+
+import pytest
+
+from model.model import DroneStats
+from utils.distance import normalize_hex_vector
+from utils.kinematics import KinematicsTable
+
+
+@pytest.fixture
+def KinematicsTableInstance():
+    drone_stats = DroneStats(
+        drone_speed=20,
+        drone_acceleration=4,
+        drone_max_ascent_speed=5,
+        drone_max_descent_speed=3,
+        drone_max_altitude=50,
+        drone_min_altitude=20,
+        drone_height=0.5,
+        drone_battery=100,
+        drain_rate=1,
+    )
+    return KinematicsTable(drone_stats)
+
+
+def test_normalize_matches_scalar(KinematicsTableInstance):
+    rng = random.Random(3)
+    for _ in range(2000):
+        q, r = rng.randint(-60, 60), rng.randint(-60, 60)
+        vector = (q, r, -q - r)
+        n = rng.choice([rng.randint(0, 20), rng.randint(21, 30), rng.random() * 4])
+        assert KinematicsTableInstance.normalize(vector, n) == normalize_hex_vector(vector, n)
+
+
+def test_braking_distances_match_formula(KinematicsTableInstance):
+    acceleration = KinematicsTableInstance.acceleration
+    for cur_speed in range(25):
+        for end_speed in range(25):
+            expected = (cur_speed + end_speed) / 2 * math.ceil((cur_speed - end_speed) / acceleration)
+            assert KinematicsTableInstance.braking_distance(cur_speed, end_speed) == expected
+        expected_range = round((cur_speed + acceleration) / 2 * math.ceil(cur_speed / acceleration) * 2.5)
+        assert KinematicsTableInstance.repulsion_range(cur_speed) == expected_range
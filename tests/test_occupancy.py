@@ -0,0 +1,70 @@
+import pytest
+
+from utils.distance import hex_distance
+
+
+@pytest.fixture
+def ModelInstance(make_model):
+    return make_model(width=60, height=60, num_drones=30, num_packages=30, num_hubs=3,
+                      initial_state_setter_name="random", drone_speed=6, vertical_separation=8)
+
+
+def test_index_tracks_drones_on_the_grid(ModelInstance, run):
+    def check(model):
+        drones = [drone for drone in model.get_drones() if drone.cell is not None]
+        assert len(model.occupancy) == len(drones)
+
+        for drone in drones[:5]:
+            for radius in (3, 12, 40):
+                candidates = model.occupancy.nearby(drone.cell.coordinate, radius)
+                within = [other for other in drones if hex_distance(drone.cell, other.cell) <= radius]
+                assert set(within) <= set(candidates)
+                assert candidates == sorted(candidates, key=lambda d: d.unique_id)
+
+    run(ModelInstance, 40, check)
+
+
+def test_vertical_separation_filters_nearby_drones(ModelInstance):
+    drone, other = [drone for drone in ModelInstance.get_drones()][:2]
+    other.altitude = drone.altitude + 20
+    other.move_to(drone.cell)      # re-indexed with its new altitude
+    assert other not in drone.nearby_drones(5)
+    ModelInstance.vertical_separation = None
+    assert other in drone.nearby_drones(5)
+
+
+def test_drones_changing_altitude_in_place_are_re_indexed(ModelInstance, run):
+    drone, other = [drone for drone in ModelInstance.get_drones()][:2]
+    other.move_to(drone.cell)
+    other.altitude = drone.altitude + 40    # climbs several bands without changing cell
+    ModelInstance.occupancy.on_altitude_change(other)
+    assert other not in drone.nearby_drones(5)
+    other.altitude = drone.altitude + 1
+    ModelInstance.occupancy.on_altitude_change(other)
+    assert other in drone.nearby_drones(5)
+
+    occupancy = ModelInstance.occupancy
+    bands = run(ModelInstance, 40, lambda model: all(key[2] == occupancy.band(drone.altitude)
+                                                     for drone, key in occupancy._keys.items()))
+    assert all(bands)
+
+
+def test_opposite_headings_use_different_layers(ModelInstance):
+    occupancy = ModelInstance.occupancy
+    for heading in [(1, 0, -1), (1, -1, 0), (0, -1, 1), (3, -1, -2)]:
+        opposite = tuple(-x for x in heading)
+        assert occupancy.layer_altitude(heading, 20, 40) != occupancy.layer_altitude(opposite, 20, 40)
+        assert 20 <= occupancy.layer_altitude(heading, 20, 40) <= 40
+    assert occupancy.layer_altitude((1, 0, -1), 20, 25) == 22.5     # a single layer
+
+
+def test_heading_layers_without_vertical_separation(make_model):
+    model = make_model(width=30, height=30, num_drones=1, num_packages=0, num_hubs=0,
+                       initial_state_setter_name="random", heading_layers=True)
+    drone = model.get_drones()[0]
+    for heading in [(1, 0, -1), (1, -1, 0), (0, -1, 1)]:
+        opposite = tuple(-x for x in heading)
+        altitude = model.strategy.layer_altitude(drone, heading, None)
+        other = model.strategy.layer_altitude(drone, opposite, None)
+        lowest, highest = drone.vertical_contact_range(drone)
+        assert not lowest <= altitude - other <= highest        # the layers don't overlap under the default limits
@@ -0,0 +1,69 @@
+import pytest
+
+from algorithms.base import DroneAction
+
+
+# drones with several deliveries each
+BUSY = dict(width=50, height=50, num_packages=30, num_hubs=3, initial_state_setter_name="random", drone_speed=6,
+            drone_battery=3000, seed=11)
+
+
+def test_no_budget_defers_nothing(make_model, run):
+    model = make_model(BUSY, tick_budget=None)
+    run(model, 100)
+    metrics = model.datacollector.get_model_vars_dataframe()
+    assert (metrics["Budget Overruns"] == 0).all()
+    assert (metrics["Deferred Decisions"] == 0).all()
+
+
+def test_spent_budget_spreads_planning_over_ticks(make_model, run):
+    model = make_model(BUSY, tick_budget=0)
+    calls = []
+    plan = model.strategy.plan
+    model.strategy.plan = lambda drone: calls.append(model.steps) or plan(drone)
+
+    run(model, 300)
+
+    assert max(calls.count(tick) for tick in set(calls)) == 1
+    metrics = model.datacollector.get_model_vars_dataframe()
+    assert metrics["Budget Overruns"].iloc[-1] == 300
+    assert metrics["Deferred Decisions"].iloc[-1] > 0
+    # drones keep going on the strategy's fallback meanwhile
+    assert model.completed_deliveries
+
+
+def test_urgent_drones_are_planned_first(make_model):
+    model = make_model(BUSY, tick_budget=0, num_hubs=1)
+    carrying, assigned, idle = model.get_drones()[:3]
+    carrying.package = carrying.assigned_packages[0]
+    idle.assigned_packages = []
+    planner = model.planner
+    planner.start_tick()
+    planner.decide(model.get_drones()[5])       # spends the tick's budget
+    for drone in (idle, assigned, carrying):
+        assert not planner.can_plan(drone)
+
+    planned = []
+    model.strategy.plan = lambda drone: planned.append(drone)
+    for _ in range(3):
+        planner.start_tick()
+    assert planned == [carrying, assigned, idle]
+
+
+def test_fallback_keeps_going_without_looking_up_hubs_or_layers(make_model):
+    model = make_model(BUSY, tick_budget=0, num_hubs=1, heading_layers=True)
+    strategy = model.strategy
+    strategy.layer_altitude = lambda *args: pytest.fail("the fallback chose a flight layer")
+    model.nearest_hubs.closest_available_hub = lambda cell: pytest.fail("the fallback looked for a hub")
+    assigned, idle, homing = model.get_drones()[:3]
+
+    package = assigned.assigned_packages[0]
+    assert strategy.fallback(assigned) == (DroneAction.MOVE_TO_CELL, package.cell)
+    assigned.move_to(package.cell)
+    assigned.cur_speed_vec = (0, 0, 0)
+    assert strategy.fallback(assigned) == (DroneAction.PICKUP_PACKAGE, package)
+
+    idle.assigned_packages, idle.hub = [], None
+    assert strategy.fallback(idle) == (DroneAction.WAIT, idle.cell)
+    homing.assigned_packages, homing.hub = [], model.get_hubs()[0]
+    assert strategy.fallback(homing) == (DroneAction.MOVE_TO_CELL, homing.hub.cell)
@@ -0,0 +1,52 @@
+import pytest
+
+from agents.drone import Drone
+from algorithms.base import DroneAction
+
+
+# drones with several deliveries each
+BUSY = dict(width=50, height=50, num_packages=30, num_hubs=3, initial_state_setter_name="random", drone_speed=6,
+            drone_battery=3000, seed=11)
+
+
+def states(model):
+    return sorted((d.unique_id, d.cell.coordinate if d.cell else None, d.altitude) for d in model.get_drones())
+
+
+@pytest.mark.parametrize("params", [{}, {"heading_layers": True, "vertical_separation": 8}])
+def test_plans_follow_the_same_course_as_decisions(make_model, run, params):
+    planned = make_model(BUSY, params)
+    deciding = make_model(BUSY, params)
+    deciding.strategy.plan = lambda drone: None
+    assert run(planned, 300, states) == run(deciding, 300, states)
+    assert planned.completed_deliveries
+
+
+def test_strategy_is_only_asked_on_plan_completion(make_model, run):
+    model = make_model(BUSY)
+    decided, planned = [], []
+    decide, plan = model.strategy.decide, model.strategy.plan
+    model.strategy.decide = lambda agent: decided.append(agent) or decide(agent)
+    model.strategy.plan = lambda drone: planned.append(drone) or plan(drone)
+
+    def scheduled_drones(model):
+        return sum(isinstance(agent, Drone) for agent in model.scheduler)
+
+    # drones scheduled in each of the 300 ticks, counted before it
+    drone_ticks = scheduled_drones(model) + sum(run(model, 300, scheduled_drones)[:-1])
+
+    assert not any(isinstance(agent, Drone) for agent in decided)
+    assert len(planned) < drone_ticks / 5
+
+
+def test_plan_fails_when_its_package_is_taken_away(make_model, run):
+    model = make_model(BUSY, num_drones=1, num_packages=3, num_hubs=1)
+    drone = model.get_drones()[0]
+    run(model, 1)
+    assert drone.plan is not None
+    first = drone.plan.waypoints[0]
+    assert first.action == DroneAction.PICKUP_PACKAGE
+
+    drone.assigned_packages.remove(first.target)
+    assert drone.follow_plan() == (DroneAction.MOVE_TO_CELL, drone.assigned_packages[0].cell)
+    assert drone.plan.waypoints[0].target is drone.assigned_packages[0]
@@ -0,0 +1,10 @@
+import pytest
+
+from model.model import DroneModel
+
+
+def test_preset_without_reachable_delivery_locations():
+    # every cell is at or above the obstacle elevation, so every delivery location is an obstacle
+    with pytest.raises(ValueError, match="delivery location"):
+        DroneModel(preset_name="shanghai_56909", algorithm_name="hub_spawn", num_drones=2, num_packages=5, num_hubs=1,
+                   obstacle_elevation=-1000)
@@ -0,0 +1,70 @@
+import pandas as pd
+import pyarrow.dataset
+import pytest
+
+from model.recording import DeliveryLog, MetricsRecorder
+
+
+def test_chunks_add_up_to_every_tick(make_model, run):
+    model = make_model()
+    recorder = MetricsRecorder(model.datacollector.model_reporters, record_drones=True, chunk_size=7)
+    run(model, 50, recorder.collect)
+
+    metrics = recorder.get_model_vars_dataframe()
+    assert list(metrics.index) == list(range(1, 51))
+    assert metrics.equals(model.datacollector.get_model_vars_dataframe())
+    assert metrics["Completed Deliveries"].iloc[-1] == len(model.completed_deliveries)
+
+    drones = recorder.get_agent_vars_dataframe()
+    last = drones.loc[50]
+    for drone in model.get_drones():
+        if drone.cell is None:
+            assert drone.unique_id not in last.index
+            continue
+        row = last.loc[drone.unique_id]
+        assert (row["Col"], row["Row"]) == drone.cell.coordinate
+        assert row["Altitude"] == drone.altitude and row["Battery"] == drone.battery
+        if drone.last_action is None:
+            assert pd.isna(row["Action"])
+        else:
+            assert row["Action"] == drone.last_action.name
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_chunks_are_written_to_files(make_model, run, tmp_path, file_format):
+    model = make_model()
+    recorder = MetricsRecorder(model.datacollector.model_reporters, directory=tmp_path, record_drones=True,
+                               chunk_size=16, file_format=file_format)
+    run(model, 100, recorder.collect)
+    in_memory = make_model()
+    expected = MetricsRecorder(model.datacollector.model_reporters, record_drones=True)
+    run(in_memory, 100, expected.collect)
+    recorder.close()
+
+    assert len(list((tmp_path / "metrics").iterdir())) == 7     # 100 ticks in chunks of 16
+    metrics = pyarrow.dataset.dataset(tmp_path / "metrics", format=file_format).to_table().to_pandas()
+    assert metrics.set_index("Step").equals(expected.get_model_vars_dataframe())
+    assert recorder.get_agent_vars_dataframe().equals(expected.get_agent_vars_dataframe())
+    if file_format == "parquet":
+        assert pd.read_parquet(tmp_path / "drones").set_index(["Step", "AgentID"]).shape == expected.get_agent_vars_dataframe().shape
+
+
+def test_delivery_log_keeps_count_but_bounded_history():
+    log = DeliveryLog(keep=3)
+    for package in range(10):
+        log.append(package)
+    assert len(log) == 10
+    assert list(log) == [7, 8, 9]
+    assert not DeliveryLog()
+
+
+def test_memory_keeps_the_last_chunks(make_model, run):
+    model = make_model()
+    recorder = MetricsRecorder(model.datacollector.model_reporters, record_drones=True, chunk_size=8, keep_chunks=3)
+    run(model, 50, recorder.collect)
+    assert len(recorder.metrics.sink.tables()) == 3
+    assert list(recorder.get_model_vars_dataframe().index) == list(range(25, 51))     # 3 chunks of 8 and 2 rows not flushed
+
+    everything = MetricsRecorder(model.datacollector.model_reporters, chunk_size=8, keep_chunks=None)
+    run(model, 50, everything.collect)
+    assert len(everything.get_model_vars_dataframe()) == 50
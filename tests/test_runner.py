@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from algorithms.base import HubAction
+from experiments.runner import HeadlessRunner, summary
+from tests.conftest import MODEL_PARAMS
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="forking runs requires os.fork")
+
+
+def test_branches_without_reseeding_continue_like_the_parent():
+    runner = HeadlessRunner(**MODEL_PARAMS).run(30)
+    results = runner.fork([None, None], ticks=50, reseed=False, max_workers=1)
+    assert runner.model.steps == 30      # the parent's model isn't touched
+    expected = summary(runner.run(50).model)
+    assert results == [expected, expected]
+
+
+def test_reseeded_branches_are_reproducible_and_independent():
+    runner = HeadlessRunner(**MODEL_PARAMS).run(30)
+    variants = [None] * 4
+    first = runner.fork(variants, ticks=100, report=lambda m: m.random.random())
+    assert runner.fork(variants, ticks=100, report=lambda m: m.random.random()) == first
+    assert len(set(first)) == len(first)
+
+
+def test_variants_change_their_branch_only():
+    def no_requests(model):
+        model.strategy.decide_for_hub = lambda hub: (HubAction.WAIT, None)
+
+    runner = HeadlessRunner(**MODEL_PARAMS).run(10)
+    base, quiet = runner.fork([None, no_requests], ticks=100, report=lambda m: m.dispatcher.pending + len(m.completed_deliveries),
+                              reseed=False)
+    assert quiet < base
+
+
+def test_failed_branches_raise():
+    def fail(model):
+        raise KeyError("broken variant")
+
+    with pytest.raises(RuntimeError, match="broken variant"):
+        HeadlessRunner(**MODEL_PARAMS).fork([None, fail], ticks=5)
@@ -0,0 +1,46 @@
+import pytest
+
+from agents.collision import Collision
+from agents.drone import Drone
+from agents.hub import Hub
+
+
+CROWDED = dict(num_drones=10, num_packages=10, num_hubs=3, num_obstacles=20, initial_state_setter_name="random",
+               drone_speed=20, drone_acceleration=4, drone_battery=100)
+
+
+def traces(model):
+    return sorted((d.unique_id, d.cell.coordinate if d.cell else None, d.altitude) for d in model.get_drones())
+
+
+def test_only_agents_with_behaviour_are_scheduled(make_model, run):
+    model = make_model(CROWDED, seed=1)
+    run(model, 30)
+    for agent in model.scheduler:
+        assert isinstance(agent, (Drone, Hub, Collision))
+        assert not isinstance(agent, Drone) or agent.cell is not None
+    assert all(hub in model.scheduler for hub in model.get_hubs())
+    assert all(drone in model.scheduler for drone in model.get_drones() if drone.cell is not None)
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_same_seed_same_run(make_model, run, seed):
+    assert run(make_model(CROWDED, seed=seed), 60, traces) == run(make_model(CROWDED, seed=seed), 60, traces)
+
+
+def test_next_wakeup_skips_stale_entries(make_model):
+    model = make_model(CROWDED, seed=1)
+    scheduler = model.scheduler
+    first, second, third = model.get_drones()[:3]
+    scheduler.sleep_until(first, 5)
+    scheduler.sleep_until(second, 7)
+    scheduler.sleep_until(third, 9)
+    assert scheduler.next_wakeup() == 5
+    scheduler.sleep_until(first, 12)     # put to sleep again, its entry for tick 5 is stale
+    scheduler.sleep(second)
+    assert scheduler.next_wakeup() == 9
+    assert len(scheduler._wakeups) == 2
+    scheduler.wake_due(10)
+    assert scheduler.next_wakeup() == 12
+    scheduler.wake_due(12)
+    assert scheduler.next_wakeup() is None
@@ -0,0 +1,82 @@
+import functools
+import gc
+import multiprocessing
+import pickle
+
+import numpy as np
+import pytest
+
+from model.shared_terrain import SharedTerrain
+from utils.terrain import TerrainIndex
+
+
+@pytest.fixture
+def make_model(make_model):
+    return functools.partial(make_model, height=30)
+
+
+def drone_states(model):
+    return sorted((drone.unique_id, drone.cell.coordinate if drone.cell else None, drone.altitude)
+                  for drone in model.get_drones())
+
+
+@pytest.fixture
+def terrain(make_model):
+    private = make_model()
+    obstacles = np.zeros((40, 30), dtype=bool)
+    obstacles[5:8, 10] = True
+    shared = SharedTerrain.publish(private.grid.height_layer.data, obstacles)
+    yield shared
+    gc.collect()    # models holding views of the block must be gone before it's closed
+    shared.unlink()
+
+
+def test_model_uses_the_shared_views(make_model, terrain):
+    model = make_model(shared_terrain=terrain)
+    assert model.grid.height_layer.data is terrain.elevation
+    assert model.grid.obstacle_layer.data is terrain.obstacles
+    assert not model.grid.height_layer.data.flags.writeable
+    assert model.is_obstacle((6, 10))
+    assert model.grid[(6, 10)] not in model.empty_cells
+    assert model.terrain.levels[-1] is terrain.levels[-1]
+    assert all((a == b).all() for a, b in zip(model.terrain.levels, TerrainIndex(terrain.elevation).levels))
+
+
+def test_shared_terrain_runs_like_a_private_one(make_model, run, terrain):
+    private = make_model()
+    private.load_obstacles(terrain.obstacles)
+    shared = make_model(shared_terrain=terrain)
+    run(private, 80)
+    run(shared, 80)
+    assert drone_states(shared) == drone_states(private)
+
+
+def test_changes_are_copied_on_write(make_model, terrain):
+    model = make_model(shared_terrain=terrain)
+    other = make_model(shared_terrain=terrain)
+    before = terrain.elevation.copy()
+
+    model.set_elevation((3, 3), int(terrain.elevation[3, 3]) + 100)
+    model.set_obstacle((1, 1))
+    assert model.get_elevation((3, 3)) == before[3, 3] + 100
+    assert model.is_obstacle((1, 1))
+    assert model.terrain.max_in_box_bound(3, 3, 3, 3) == before[3, 3] + 100
+    assert (terrain.elevation == before).all() and not terrain.obstacles[1, 1]
+    assert other.grid.height_layer.data is terrain.elevation
+
+
+def test_shape_has_to_match_the_grid(make_model, terrain):
+    with pytest.raises(ValueError):
+        make_model(width=41, shared_terrain=terrain)
+
+
+def _elevation_sum(terrain):
+    return int(terrain.elevation.sum()), terrain.elevation.flags.writeable
+
+
+def test_workers_attach_to_the_published_block(terrain):
+    assert pickle.loads(pickle.dumps(terrain)).memory.name == terrain.memory.name
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    with multiprocessing.get_context(method).Pool(2) as pool:
+        results = pool.map(_elevation_sum, [terrain, terrain])
+    assert results == [(int(terrain.elevation.sum()), False)] * 2
@@ -0,0 +1,91 @@
+import struct
+
+import pandas as pd
+import pytest
+
+from agents.drone import Drone
+from model.snapshot import SNAPSHOT_MAGIC, SNAPSHOT_VERSION, load_snapshot, restore, save_snapshot, snapshot
+from model.trajectory import ReplayModel, Trajectory
+
+
+def state(model):
+    drones = sorted(model.get_drones(), key=lambda drone: drone.unique_id)
+    return ([(drone.unique_id, drone.cell.coordinate if drone.cell else None, drone.altitude, drone.cur_speed_vec,
+              drone.battery, [package.unique_id for package in drone.assigned_packages]) for drone in drones],
+            len(model.completed_deliveries), model.random.getstate())
+
+
+def test_restored_model_continues_like_the_saved_one(make_model, run):
+    model = make_model()
+    run(model, 60)
+    restored = restore(snapshot(model))
+    assert restored.steps == model.steps
+    assert state(restored) == state(model)
+
+    for _ in range(100):
+        run(model, 1)
+        run(restored, 1)
+        assert state(restored) == state(model)
+    pd.testing.assert_frame_equal(restored.datacollector.get_model_vars_dataframe(),
+                                  model.datacollector.get_model_vars_dataframe())
+
+
+def test_restored_grid_keeps_the_cells_bookkeeping(make_model, run):
+    model = make_model()
+    run(model, 30)
+    restored = restore(snapshot(model))
+    for hub, restored_hub in zip(model.get_hubs(), restored.get_hubs()):
+        assert restored_hub.cell.coordinate == hub.cell.coordinate
+        assert restored_hub in restored_hub.cell.airspace
+        assert restored_hub in restored_hub.cell.agents
+    assert len(restored.empty_cells) == len(model.empty_cells)
+    assert all(len(cell.connections) == len(original.connections)
+               for cell, original in zip(restored.grid.all_cells, model.grid.all_cells))
+    assert restored.grid[(3, 4)].agents is not model.grid[(3, 4)].agents
+
+
+def test_snapshot_file_with_streamed_records(make_model, run, tmp_path):
+    model = make_model(record_path=tmp_path / "records", record_trajectory=True)
+    run(model, 40)
+    save_snapshot(model, tmp_path / "model.snapshot")
+    states = {}
+    for _ in range(40):
+        run(model, 1)
+        states[model.steps] = state(model)[0]
+    model.close()
+    expected = model.datacollector.get_model_vars_dataframe()
+
+    # the restore runs for fewer ticks than the saved model did, its records mustn't pick up the saved model's
+    restored = load_snapshot(tmp_path / "model.snapshot", record_path=tmp_path / "restored")
+    run(restored, 20)
+    restored.close()
+    pd.testing.assert_frame_equal(restored.datacollector.get_model_vars_dataframe(), expected.iloc[:60])
+    pd.testing.assert_frame_equal(model.datacollector.get_model_vars_dataframe(), expected)
+    assert Trajectory.open(tmp_path / "restored" / "trajectory").last_tick == 60
+    assert Trajectory.open(tmp_path / "records" / "trajectory").last_tick == 80
+    replay = ReplayModel(tmp_path / "restored" / "trajectory")
+    replay.seek(60)
+    assert sorted((agent.unique_id, agent.cell.coordinate) for agent in replay.agents if isinstance(agent, Drone)) == \
+        sorted((drone_id, cell) for drone_id, cell, *_ in states[60] if cell is not None)
+
+
+def test_streamed_records_need_a_record_path_of_their_own(make_model, run, tmp_path):
+    model = make_model(record_path=tmp_path / "records")
+    run(model, 10)
+    data = snapshot(model)
+    with pytest.raises(ValueError, match="record_path"):
+        restore(data)
+    with pytest.raises(ValueError, match="isn't empty"):
+        restore(data, record_path=tmp_path / "records")
+    with pytest.raises(ValueError, match="in memory"):
+        restore(snapshot(make_model()), record_path=tmp_path / "other")
+    model.close()
+
+
+def test_rejects_other_files_and_versions(make_model):
+    with pytest.raises(ValueError, match="Not a model snapshot"):
+        restore(b"not a snapshot")
+    data = snapshot(make_model())
+    newer = SNAPSHOT_MAGIC + struct.pack("<H", SNAPSHOT_VERSION + 1) + data[len(SNAPSHOT_MAGIC) + 2:]
+    with pytest.raises(ValueError, match="Unsupported snapshot version"):
+        restore(newer)
@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+import pytest
+from mesa.discrete_space import Cell
+
+from utils.distance import hex_distance, hex_line_batch
+from utils.terrain import TerrainIndex
+
+
+@pytest.fixture
+def TerrainIndexInstance():
+    rng = np.random.default_rng(5)
+    return TerrainIndex(rng.integers(100, 150, size=(37, 53)))
+
+
+def test_hex_line_is_contiguous():
+    rng = random.Random(11)
+    for _ in range(200):
+        a = (rng.randint(0, 36), rng.randint(0, 52))
+        b = (rng.randint(0, 36), rng.randint(0, 52))
+        line = [tuple(c) for c in hex_line_batch(a, b).tolist()]
+        assert line[0] == a and line[-1] == b
+        assert len(line) == hex_distance(Cell(a, None), Cell(b, None)) + 1
+        for c1, c2 in zip(line, line[1:]):
+            assert hex_distance(Cell(c1, None), Cell(c2, None)) == 1
+
+
+def test_max_in_box_bound_is_upper_bound(TerrainIndexInstance):
+    rng = random.Random(12)
+    elevation = TerrainIndexInstance.elevation
+    for _ in range(300):
+        x0, x1 = sorted((rng.randint(0, 36), rng.randint(0, 36)))
+        y0, y1 = sorted((rng.randint(0, 52), rng.randint(0, 52)))
+        assert TerrainIndexInstance.max_in_box_bound(x0, y0, x1, y1) >= elevation[x0:x1 + 1, y0:y1 + 1].max()
+        assert TerrainIndexInstance.max_in_box_bound(x0, y0, x0, y0) == elevation[x0, y0]
+
+
+def test_segment_queries_match_brute_force(TerrainIndexInstance):
+    rng = random.Random(13)
+    elevation = TerrainIndexInstance.elevation
+    for _ in range(300):
+        a = (rng.randint(0, 36), rng.randint(0, 52))
+        b = (rng.randint(0, 36), rng.randint(0, 52))
+        expected = max(elevation[c] for c in map(tuple, hex_line_batch(a, b).tolist()))
+        assert TerrainIndexInstance.max_along_segment(a, b) == expected
+        altitude = rng.randint(100, 150)
+        assert TerrainIndexInstance.segment_clear(a, b, altitude) == (expected <= altitude)
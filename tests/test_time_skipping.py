@@ -0,0 +1,45 @@
+from mesa.experimental.devs import ABMSimulator
+
+from tests.conftest import quiet
+
+
+# a single hub keeps the scheduler's shuffle from consuming random numbers,
+# so runs with and without time skipping follow the same random stream;
+# it can store all the drones (capacity 5), so the model goes idle between requests
+IDLE = dict(width=30, height=30, num_drones=5, num_hubs=1, drone_speed=20, drone_acceleration=4, seed=3)
+
+
+def snapshot(model):
+    return (
+        len(model.completed_deliveries),
+        len(model.failed_deliveries),
+        sorted((d.unique_id, d.cell.coordinate if d.cell else None, d.battery) for d in model.get_drones()),
+    )
+
+
+def test_time_skipping_keeps_results(make_model, run):
+    ticks = 600
+    full = make_model(IDLE, time_skipping=False)
+    full_states = dict(enumerate(run(full, ticks, snapshot), start=1))
+
+    skipping = make_model(IDLE, time_skipping=True)
+    calls = 0
+    with quiet():
+        while skipping.steps < ticks:
+            skipping.step()
+            calls += 1
+            if skipping.steps <= ticks:
+                assert snapshot(skipping) == full_states[skipping.steps]
+
+    assert calls < ticks
+    collected = skipping.datacollector.get_model_vars_dataframe().iloc[:ticks]
+    assert collected.equals(full.datacollector.get_model_vars_dataframe().iloc[:ticks])
+
+
+def test_time_skipping_moves_simulator_step(make_model):
+    simulator = ABMSimulator()
+    model = make_model(IDLE, time_skipping=True, simulator=simulator)
+    with quiet():
+        simulator.run_until(300)
+    assert model.steps >= 300
+    assert len(model.datacollector.get_model_vars_dataframe()) == model.steps
@@ -0,0 +1,89 @@
+from agents.drop_zone import DropZone
+from agents.package import Package
+from algorithms.base import HubAction
+from model.tours import TourOptimizer
+from utils.distance import hex_distance
+
+
+# a single drone and no packages, tests place them
+EMPTY = dict(num_drones=1, num_packages=0, num_hubs=0, initial_state_setter_name="random", drone_speed=4, seed=7)
+
+
+def make_package(model, pickup, drop_off):
+    return Package(model, model.grid[pickup], 0.5, 2, DropZone(model, model.grid[drop_off]))
+
+
+def tour_length(drone):
+    length, cell = 0, drone.cell
+    for package in drone.assigned_packages:
+        length += hex_distance(cell, package.cell) + hex_distance(package.cell, package.drop_zone.cell)
+        cell = package.drop_zone.cell
+    return length
+
+
+def test_packages_along_a_line_are_served_in_order(make_model):
+    model = make_model(EMPTY)
+    drone = model.get_drones()[0]
+    drone.move_to(model.grid[(0, 20)])
+    packages = [make_package(model, (4 * i + 1, 20), (4 * i + 3, 20)) for i in range(8)]
+    drone.assigned_packages = [packages[i] for i in (5, 2, 7, 0, 3, 6, 1, 4)]
+
+    TourOptimizer().optimize(drone)
+    assert drone.assigned_packages == packages
+
+
+def test_tours_get_shorter_and_keep_the_carried_package_first(make_model):
+    model = make_model(EMPTY)
+    drone = model.get_drones()[0]
+    drone.move_to(model.grid[(20, 20)])
+    cells = model.empty_cells.sample(40, model.random)
+    drone.assigned_packages = [make_package(model, cells[2 * i].coordinate, cells[2 * i + 1].coordinate) for i in range(20)]
+    carried = drone.assigned_packages[7]
+    before = tour_length(drone)
+
+    optimizer = TourOptimizer()
+    optimizer.optimize(drone)
+    assert tour_length(drone) < before
+    assert len(set(drone.assigned_packages)) == 20
+
+    drone.assigned_packages.remove(carried)
+    drone.assigned_packages.insert(0, carried)
+    drone.pickup(carried)
+    optimizer.optimize(drone)
+    assert drone.assigned_packages[0] is carried
+    assert len(set(drone.assigned_packages)) == 20
+
+
+def test_time_budget_spreads_the_search_over_calls(make_model):
+    model = make_model(EMPTY, num_drones=2)
+    drone, converged = model.get_drones()
+    drone.move_to(model.grid[(20, 20)])
+    converged.move_to(model.grid[(20, 20)])
+    cells = model.empty_cells.sample(60, model.random)
+    drone.assigned_packages = [make_package(model, cells[2 * i].coordinate, cells[2 * i + 1].coordinate) for i in range(30)]
+    converged.assigned_packages = list(drone.assigned_packages)
+    TourOptimizer().optimize(converged)
+
+    optimizer = TourOptimizer(time_budget=0)
+    for _ in range(1000):
+        optimizer.optimize(drone)
+        assert len(set(drone.assigned_packages)) == 30
+        if optimizer._tours[drone].converged:
+            break
+    assert drone.assigned_packages == converged.assigned_packages
+
+
+def test_drones_leaving_the_grid_are_forgotten(make_model):
+    model = make_model(EMPTY, num_drones=2, num_hubs=1)
+    destroyed, collected = model.get_drones()
+    hub = model.get_hubs()[0]
+    for drone in (destroyed, collected):
+        drone.move_to(hub.cell)
+        cells = model.empty_cells.sample(6, model.random)
+        drone.assigned_packages = [make_package(model, cells[2 * i].coordinate, cells[2 * i + 1].coordinate) for i in range(3)]
+        model.tours.optimize(drone)
+    assert set(model.tours._tours) == {destroyed, collected}
+
+    destroyed.destroy()
+    hub.apply(HubAction.COLLECT_DRONE, collected)
+    assert not model.tours._tours
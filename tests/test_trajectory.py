@@ -0,0 +1,105 @@
+import pytest
+
+from agents.drone import Drone
+from agents.hub import Hub
+from model.trajectory import KINDS, ReplayModel, Trajectory, TrajectoryEvent, TrajectoryRecorder
+
+
+def snapshot(model):
+    """(id, class, coordinate, altitude) of every recorded agent on the grid."""
+    return sorted((agent.unique_id, cls.__name__, agent.cell.coordinate, round(getattr(agent, "altitude", 0), 2))
+                  for cls in KINDS for agent in model.agents_by_type.get(cls, ()) if agent.cell is not None)
+
+
+def replayed(replay):
+    return sorted((agent.unique_id, next(cls.__name__ for cls in KINDS if isinstance(agent, cls)),
+                   agent.cell.coordinate, round(agent.altitude, 2)) for agent in replay.agents)
+
+
+@pytest.fixture
+def record(make_model, run):
+    def record(ticks, **kwargs):
+        model = make_model()
+        recorder = TrajectoryRecorder(model, **kwargs)
+        states = {model.steps: snapshot(model)}
+
+        def each(model):
+            recorder.record(model)
+            states[model.steps] = snapshot(model)
+
+        run(model, ticks, each)
+        recorder.flush()
+        return model, recorder, states
+    return record
+
+
+def test_seek_matches_the_simulated_ticks_in_any_order(record):
+    _, recorder, states = record(60, chunk_ticks=8)
+    replay = ReplayModel(recorder.trajectory)
+    for tick in [37, 0, 59, 8, 7, 60, 12, 13, 36]:
+        replay.seek(tick)
+        assert replay.steps == tick
+        assert replayed(replay) == states[tick]
+
+
+def test_step_plays_the_ticks_in_order(record):
+    _, recorder, states = record(20, chunk_ticks=6)
+    replay = ReplayModel(recorder.trajectory)
+    while replay.running:
+        replay.step()
+        assert replayed(replay) == states[replay.steps]
+    assert replay.steps == 20
+
+
+def test_replay_exposes_the_visualized_model_surface(record):
+    model, recorder, _ = record(15)
+    replay = ReplayModel(recorder.trajectory)
+    replay.seek(15)
+    assert any(isinstance(agent, Drone) for agent in replay.agents)
+    assert len(replay.agents.select(agent_type=Hub)) == len(model.get_hubs())
+    assert [cell.coordinate for cell in replay.grid] == [cell.coordinate for cell in model.grid]
+    assert all(replay.get_elevation(cell.coordinate) == model.get_elevation(cell.coordinate) for cell in model.grid)
+    assert (replay.grid.obstacle_layer.data == model.grid.obstacle_layer.data).all()
+
+
+def test_events_are_recorded_at_their_tick(record):
+    model, recorder, _ = record(150, chunk_ticks=16)
+    replay = ReplayModel(recorder.trajectory)
+    delivered = []
+    for tick in range(151):
+        replay.seek(tick)
+        delivered += [agent_id for event, agent_id in replay.events if event == TrajectoryEvent.DELIVERED]
+    assert len(delivered) == len(model.completed_deliveries) > 0
+    assert delivered[-1] == list(model.completed_deliveries)[-1].unique_id
+
+
+def test_model_writes_the_trajectory_to_the_record_path(make_model, run, tmp_path):
+    model = make_model(record_path=tmp_path, record_trajectory=True)
+    states = {0: snapshot(model)}
+    run(model, 70, lambda model: states.update({model.steps: snapshot(model)}))
+    model.close()
+
+    trajectory = Trajectory.open(tmp_path / "trajectory")
+    assert trajectory.last_tick == 70
+    replay = ReplayModel(tmp_path / "trajectory")
+    for tick in (70, 3, 64, 63):
+        replay.seek(tick)
+        assert replayed(replay) == states[tick]
+
+
+def test_last_tick_is_the_last_tick_written(make_model, run):
+    model = make_model()
+    recorder = TrajectoryRecorder(model, chunk_ticks=16)
+    run(model, 40, recorder.record)
+    assert recorder.trajectory.last_tick == 31        # ticks 32 to 40 are still buffered
+    replay = ReplayModel(recorder.trajectory)
+    replay.seek(40)
+    assert replay.steps == 31 and len(replay.agents) > 0
+
+    recorder.flush()
+    assert recorder.trajectory.last_tick == 40
+
+
+def test_rejects_chunks_longer_than_int16_offsets(make_model):
+    with pytest.raises(ValueError):
+        TrajectoryRecorder(make_model(), chunk_ticks=40000)
@@ -1,10 +1,15 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
 import numpy as np
 from mesa.discrete_space import Cell
 from agents.hub import Hub
-from utils.distance import hex_distance
+from utils.distance import hex_distance, hex_distance_batch
+
+if TYPE_CHECKING:
+    from model.model import DroneModel
 
 def get_closest_available_hub(cell: Cell, hubs: list[Hub]) -> Hub | None:
-    available_hubs = [h for h in hubs if h.capacity > len(h.stored_drones)+len(h.incomming_drones)]
+    available_hubs = [h for h in hubs if h.has_free_capacity()]
     closest_hub = None
     distance = 10**10
     for hub in available_hubs:
@@ -13,4 +18,56 @@ def get_closest_available_hub(cell: Cell, hubs: list[Hub]) -> Hub | None:
             distance = new_dist
             closest_hub = hub
     return closest_hub
-    
\ No newline at end of file
+
+
+class NearestHubMap:
+    """Hex Voronoi partition of the grid: every cell's closest hubs, ranked by distance.
+
+    The map is rebuilt lazily after hubs are added (see Hub.__init__), so finding the closest hub
+    with free capacity is a lookup in the common case. Ties are broken by hub creation order,
+    the same way get_closest_available_hub breaks them.
+    """
+    ranks: int = 3
+
+    def __init__(self, model: DroneModel):
+        self.model = model
+        self.hubs: list[Hub] = []
+        self.ranked: np.ndarray | None = None     # (width, height, ranks) indices into self.hubs
+
+    def invalidate(self) -> None:
+        self.ranked = None
+
+    def _build(self) -> None:
+        self.hubs = [h for h in self.model.get_hubs() if h.cell is not None]
+        width, height = self.model.grid.dimensions
+        coords = np.stack(np.indices((width, height)), axis=-1)
+
+        distances = np.empty((width, height, len(self.hubs)), dtype=np.int32)
+        for i, hub in enumerate(self.hubs):
+            distances[:, :, i] = hex_distance_batch(coords, np.array(hub.cell.coordinate))
+
+        order = np.argsort(distances, axis=-1, kind="stable")[:, :, :self.ranks]
+        self.ranked = order.astype(np.int16)
+
+    def labels(self) -> np.ndarray:
+        """Index (into self.hubs) of the nearest hub of every cell, shape (width, height), -1 everywhere if there are no hubs."""
+        if self.ranked is None:
+            self._build()
+        if not self.hubs:
+            return np.full(self.ranked.shape[:2], -1, dtype=self.ranked.dtype)
+        return self.ranked[:, :, 0]
+
+    def closest_hubs(self, cell: Cell) -> list[Hub]:
+        """The (up to `ranks`) hubs closest to the cell, nearest first (none if there are no hubs)."""
+        if self.ranked is None:
+            self._build()
+        return [self.hubs[i] for i in self.ranked[cell.coordinate].tolist()]
+
+    def closest_available_hub(self, cell: Cell) -> Hub | None:
+        """Equivalent of get_closest_available_hub(cell, model.get_hubs())."""
+        for hub in self.closest_hubs(cell):
+            if hub.has_free_capacity():
+                return hub
+        if len(self.hubs) > self.ranks:
+            return get_closest_available_hub(cell, self.hubs)
+        return None
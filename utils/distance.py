@@ -19,7 +19,7 @@ def hex_distance(a: Cell, b: Cell):
     dq = q1 - q2
     dr = r1 - r2
 
-    return round((np.abs(dq) + np.abs(dq + dr) + np.abs(dr)) / 2)
+    return (abs(dq) + abs(dq + dr) + abs(dr)) // 2
 
 def qrs_hex_distance(qrs1: tuple[int, int, int], qrs2: tuple[int, int, int]) -> int:
     q1, r1, s1 = qrs1
@@ -121,4 +121,156 @@ def divide_hex_vector(vector: tuple[int, int, int], divider) -> tuple[int, int,
     return (vector[0]/divider, vector[1]/divider, vector[2]/divider)
 
 def round_hex_vector(vector: tuple[float, float, float]) -> tuple[int, int, int]:
-    return (round(vector[0]), round(vector[1]), round(vector[2]))
\ No newline at end of file
+    return (round(vector[0]), round(vector[1]), round(vector[2]))
+
+
+# Batch counterparts of the scalar helpers above. They accept NumPy arrays (or anything
+# np.asarray understands) with the coordinate/vector components in the last axis,
+# so e.g. offset coords are (..., 2) arrays and cube vectors are (..., 3) arrays.
+
+def xy_to_qrs_batch(coords: np.ndarray) -> np.ndarray:
+    """Converts an array of offset (col, row) coordinates to cubic coordinates.
+
+    Args:
+        coords (np.ndarray): Array of shape (..., 2) with (col, row) pairs.
+
+    Returns:
+        np.ndarray: Integer array of shape (..., 3) with (q, r, s) triples.
+    """
+    coords = np.asarray(coords, dtype=np.int64)
+    col = coords[..., 0]
+    row = coords[..., 1]
+    q = col - (row + (row & 1)) // 2
+    return np.stack([q, row, -q - row], axis=-1)
+
+
+def qrs_to_xy_batch(qrs: np.ndarray) -> np.ndarray:
+    """Converts an array of cubic coordinates to offset (col, row) coordinates.
+
+    Args:
+        qrs (np.ndarray): Array of shape (..., 3) with (q, r, s) triples.
+
+    Returns:
+        np.ndarray: Integer array of shape (..., 2) with (col, row) pairs.
+    """
+    qrs = np.asarray(qrs, dtype=np.int64)
+    q = qrs[..., 0]
+    r = qrs[..., 1]
+    return np.stack([q + (r + (r & 1)) // 2, r], axis=-1)
+
+
+def hex_vector_len_batch(vectors: np.ndarray) -> np.ndarray:
+    """Computes the lengths of an array of cubic hex vectors, shape (..., 3) -> (...)."""
+    return np.abs(np.asarray(vectors)).max(axis=-1)
+
+
+def qrs_hex_distance_batch(qrs1: np.ndarray, qrs2: np.ndarray) -> np.ndarray:
+    """Element-wise (broadcasting) distance between cubic coordinates, shape (..., 3) -> (...)."""
+    return hex_vector_len_batch(np.asarray(qrs1) - np.asarray(qrs2))
+
+
+def hex_distance_batch(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Element-wise (broadcasting) distance between offset coordinates.
+
+    Passing a single (2,) coordinate as one of the arguments gives one-to-many distances.
+
+    Args:
+        a (np.ndarray): Array of shape (..., 2) with (col, row) pairs.
+        b (np.ndarray): Array of shape (..., 2) with (col, row) pairs.
+
+    Returns:
+        np.ndarray: Integer array with the broadcast shape of a and b (without the last axis).
+    """
+    return qrs_hex_distance_batch(xy_to_qrs_batch(a), xy_to_qrs_batch(b))
+
+
+def pairwise_hex_distance(a: np.ndarray, b: np.ndarray | None = None) -> np.ndarray:
+    """Computes the distance between every pair of offset coordinates from a and b.
+
+    Args:
+        a (np.ndarray): Array of shape (N, 2) with (col, row) pairs.
+        b (np.ndarray | None, optional): Array of shape (M, 2). Defaults to a.
+
+    Returns:
+        np.ndarray: Integer array of shape (N, M).
+    """
+    qrs_a = xy_to_qrs_batch(a)
+    qrs_b = qrs_a if b is None else xy_to_qrs_batch(b)
+    return qrs_hex_distance_batch(qrs_a[:, np.newaxis, :], qrs_b[np.newaxis, :, :])
+
+
+def normalize_hex_vector_batch(vectors: np.ndarray, n: float | np.ndarray) -> np.ndarray:
+    """Batch version of normalize_hex_vector, including its rounding fix-up.
+
+    Args:
+        vectors (np.ndarray): Array of shape (N, 3) with cubic hex vectors.
+        n (float | np.ndarray): Target length, a scalar or an array of shape (N,).
+
+    Returns:
+        np.ndarray: Integer array of shape (N, 3) with vectors of length n (or zero vectors).
+    """
+    vectors = np.asarray(vectors)
+    length = hex_vector_len_batch(vectors)
+    k = np.asarray(n, dtype=np.float64) / np.where(length == 0, 1, length)
+    scaled = vectors * k[..., np.newaxis]
+    rounded = np.round(scaled)
+    err = np.abs(rounded - scaled)
+
+    err_q, err_r, err_s = err[..., 0], err[..., 1], err[..., 2]
+    pick_q = (err_q > err_r) & (err_q > err_s)
+    pick_r = ~pick_q & (err_r > err_s)
+    pick_s = ~pick_q & ~pick_r
+
+    current_sum = rounded.sum(axis=-1)
+    fix = np.where(np.abs(current_sum) == 1, -current_sum, 0)
+    rounded[..., 0] += np.where(pick_q, fix, 0)
+    rounded[..., 1] += np.where(pick_r, fix, 0)
+    rounded[..., 2] += np.where(pick_s, fix, 0)
+
+    rounded[length == 0] = 0
+    return rounded.astype(np.int64)
+
+
+def add_hex_vectors_batch(vectors1: np.ndarray, vectors2: np.ndarray) -> np.ndarray:
+    return np.asarray(vectors1) + np.asarray(vectors2)
+
+
+def sub_hex_vectors_batch(vectors1: np.ndarray, vectors2: np.ndarray) -> np.ndarray:
+    return np.asarray(vectors1) - np.asarray(vectors2)
+
+
+def round_hex_vector_batch(vectors: np.ndarray) -> np.ndarray:
+    return np.round(np.asarray(vectors)).astype(np.int64)
+
+
+def hex_line_batch(a: tuple[int, int], b: tuple[int, int]) -> np.ndarray:
+    """Rasterizes the straight hex line between two offset coordinates.
+
+    Args:
+        a (tuple[int, int]): Start (col, row) coordinate.
+        b (tuple[int, int]): End (col, row) coordinate.
+
+    Returns:
+        np.ndarray: Integer array of shape (hex_distance(a, b) + 1, 2) with the (col, row)
+                    coordinates of every cell on the line, from a to b.
+    """
+    qrs_a, qrs_b = xy_to_qrs_batch(np.array([a, b]))
+    n = int(hex_vector_len_batch(qrs_b - qrs_a))
+    if n == 0:
+        return np.array([a], dtype=np.int64)
+
+    # nudge the endpoints so that lines running exactly along cell edges round consistently
+    nudge = np.array([1e-6, 2e-6, -3e-6])
+    t = np.arange(n + 1)[:, np.newaxis] / n
+    points = (qrs_a + nudge) + (qrs_b - qrs_a) * t
+
+    rounded = np.round(points)
+    diff = np.abs(rounded - points)
+    fix_q = (diff[:, 0] > diff[:, 1]) & (diff[:, 0] > diff[:, 2])
+    fix_r = ~fix_q & (diff[:, 1] > diff[:, 2])
+    fix_s = ~fix_q & ~fix_r
+    rounded[fix_q, 0] = -rounded[fix_q, 1] - rounded[fix_q, 2]
+    rounded[fix_r, 1] = -rounded[fix_r, 0] - rounded[fix_r, 2]
+    rounded[fix_s, 2] = -rounded[fix_s, 0] - rounded[fix_s, 1]
+
+    return qrs_to_xy_batch(rounded.astype(np.int64))
@@ -0,0 +1,89 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import TYPE_CHECKING
+import math
+import numpy as np
+
+from utils.distance import normalize_hex_vector, normalize_hex_vector_batch
+
+if TYPE_CHECKING:
+    from model.model import DroneStats
+
+
+@lru_cache(maxsize=2**16)
+def _normalize_hex_vector_cached(vector: tuple[int, int, int], n: float) -> tuple[int, int, int]:
+    return normalize_hex_vector(vector, n)
+
+
+class KinematicsTable:
+    """Lookup tables for drone motion, built once per DroneStats.
+
+    Speeds are integers bounded by drone_speed, so every quantized direction vector
+    and braking distance a drone needs while moving can be computed up front.
+    Lookups outside of the precomputed range fall back to a memoized normalize_hex_vector.
+    """
+    def __init__(self, drone_stats: DroneStats):
+        self.speed: int = drone_stats.drone_speed
+        self.acceleration: int = drone_stats.drone_acceleration
+
+        # velocity corrections (target vector - current velocity) are at most 2 * speed long
+        self.radius: int = 2 * self.speed
+        self._directions = self._build_directions()
+
+        self._braking_distances = [
+            [(cur + end) / 2 * math.ceil((cur - end) / self.acceleration) for end in range(self.speed + 1)]
+            for cur in range(self.speed + 1)
+        ]
+
+        # repulsion (see Drone.get_repulsive_vector)
+        self.max_repulsion_distance: float = self.speed / 2 * math.ceil(self.speed / self.acceleration)
+        self._repulsion_ranges = [
+            round((cur + self.acceleration) / 2 * math.ceil(cur / self.acceleration) * 2.5)
+            for cur in range(self.speed + 1)
+        ]
+        self._repulsion_magnitudes = [
+            max(1 - distance / self.max_repulsion_distance, 0) * self.acceleration
+            for distance in range(max(self._repulsion_ranges) + 1)
+        ]
+
+    def _build_directions(self) -> list[list[list[tuple[int, int, int]]]]:
+        """Builds a [n][q + radius][r + radius] table of normalized (q, r, -q-r) vectors."""
+        radius = self.radius
+        side = np.arange(-radius, radius + 1)
+        q, r = np.meshgrid(side, side, indexing="ij")
+        vectors = np.stack([q, r, -q - r], axis=-1).reshape(-1, 3)
+
+        # normalized vectors are at most `speed` long, so share one tuple per distinct result
+        interned: dict[tuple[int, int, int], tuple[int, int, int]] = {}
+        table = []
+        for n in range(self.speed + 1):
+            normalized = normalize_hex_vector_batch(vectors, n).tolist()
+            flat = [interned.setdefault(tuple(v), tuple(v)) for v in normalized]
+            table.append([flat[i:i + len(side)] for i in range(0, len(flat), len(side))])
+        return table
+
+    def normalize(self, vector: tuple[int, int, int], n: float) -> tuple[int, int, int]:
+        """Table-backed equivalent of normalize_hex_vector(vector, n)."""
+        q, r, _ = vector
+        radius = self.radius
+        if type(n) is int and 0 <= n <= self.speed and -radius <= q <= radius and -radius <= r <= radius:
+            return self._directions[n][q + radius][r + radius]
+        return _normalize_hex_vector_cached(vector, n)
+
+    def braking_distance(self, cur_speed: int, end_speed: int) -> float:
+        """Distance covered while slowing down from cur_speed to end_speed (sum of arithmetic sequence)."""
+        if 0 <= cur_speed <= self.speed and 0 <= end_speed <= self.speed:
+            return self._braking_distances[cur_speed][end_speed]
+        return (cur_speed + end_speed) / 2 * math.ceil((cur_speed - end_speed) / self.acceleration)
+
+    def repulsion_range(self, cur_speed: int) -> int:
+        """Distance within which other drones push a drone moving at cur_speed away."""
+        if 0 <= cur_speed <= self.speed:
+            return self._repulsion_ranges[cur_speed]
+        return round((cur_speed + self.acceleration) / 2 * math.ceil(cur_speed / self.acceleration) * 2.5)
+
+    def repulsion_magnitude(self, distance: int) -> float:
+        """Length of the repulsive vector between two drones that are `distance` cells apart."""
+        if 0 <= distance < len(self._repulsion_magnitudes):
+            return self._repulsion_magnitudes[distance]
+        return max(1 - distance / self.max_repulsion_distance, 0) * self.acceleration
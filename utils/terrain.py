@@ -0,0 +1,69 @@
+from __future__ import annotations
+import numpy as np
+
+from utils.distance import hex_line_batch
+
+
+class TerrainIndex:
+    """Max-elevation queries over a heightfield, built once per heightfield.
+
+    Keeps a max-pyramid of the elevation grid (level k holds the maximum of every
+    2^k x 2^k block), which bounds the maximum over any rectangle with at most four lookups.
+    Line segment queries use that bound to answer the common "clearly above the terrain"
+    case in constant time and only rasterize the hex line when the bound is inconclusive.
+    """
+    def __init__(self, elevation: np.ndarray, levels: list[np.ndarray] | None = None):
+        """
+        Args:
+            elevation (np.ndarray): Elevation grid indexed by cell coordinates, shape (width, height).
+            levels (list[np.ndarray] | None, optional): The pyramid, if already built for this elevation grid
+                                                        (e.g. shared between processes, see model.shared_terrain).
+                                                        Defaults to None (built here).
+        """
+        self.elevation = np.asarray(elevation)
+        self.width, self.height = self.elevation.shape
+        if levels is not None:
+            self.levels: list[np.ndarray] = list(levels)
+            return
+        self.levels: list[np.ndarray] = [self.elevation]
+
+        lowest = np.iinfo(self.elevation.dtype).min if np.issubdtype(self.elevation.dtype, np.integer) else -np.inf
+        level = self.elevation
+        while level.shape[0] > 1 or level.shape[1] > 1:
+            w, h = level.shape
+            padded = np.full((w + (w & 1), h + (h & 1)), lowest, dtype=level.dtype)
+            padded[:w, :h] = level
+            level = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(axis=(1, 3))
+            self.levels.append(level)
+
+    def max_in_box_bound(self, x0: int, y0: int, x1: int, y1: int) -> int:
+        """Upper bound of the maximum elevation in the inclusive box [x0, x1] x [y0, y1].
+
+        The bound is exact for single cells and never lower than the true maximum.
+        """
+        x0, x1 = max(min(x0, x1), 0), min(max(x0, x1), self.width - 1)
+        y0, y1 = max(min(y0, y1), 0), min(max(y0, y1), self.height - 1)
+        extent = max(x1 - x0, y1 - y0) + 1
+        k = min((extent - 1).bit_length(), len(self.levels) - 1)
+        level = self.levels[k]
+        return level[x0 >> k:(x1 >> k) + 1, y0 >> k:(y1 >> k) + 1].max()
+
+    def max_over_cells(self, coords: list[tuple[int, int]] | np.ndarray) -> int:
+        """Exact maximum elevation over a collection of (col, row) coordinates, e.g. a path."""
+        coords = np.asarray(coords)
+        return self.elevation[coords[:, 0], coords[:, 1]].max()
+
+    def max_along_segment(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        """Exact maximum elevation over the cells of the hex line segment from a to b."""
+        line = hex_line_batch(a, b)
+        line[:, 0] = np.clip(line[:, 0], 0, self.width - 1)
+        line[:, 1] = np.clip(line[:, 1], 0, self.height - 1)
+        return self.max_over_cells(line)
+
+    def segment_clear(self, a: tuple[int, int], b: tuple[int, int], altitude: float) -> bool:
+        """Whether a flight at the given altitude along the hex line from a to b stays above the terrain."""
+        # hex lines can leave the offset-coordinate bounding box of their endpoints by one column
+        bound = self.max_in_box_bound(min(a[0], b[0]) - 1, a[1], max(a[0], b[0]) + 1, b[1])
+        if bound <= altitude:
+            return True
+        return self.max_along_segment(a, b) <= altitude
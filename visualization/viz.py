@@ -80,8 +80,8 @@ def VisualizationComponent(model: DroneModel) -> None:
     batches = {}
 
     for agent in model.agents:
-        if agent.cell is None:
-            continue
+        if agent.cell is None or isinstance(agent, Obstacle):
+            continue    # obstacles are drawn from the obstacle layer below
         
         style = agent_portrayal(agent)
         if style is None: 
@@ -102,6 +102,22 @@ def VisualizationComponent(model: DroneModel) -> None:
         batches[marker]["z"].append(style["zorder"])
         batches[marker]["a"].append(style["alpha"])
 
+    obstacle_coords = np.argwhere(model.grid.obstacle_layer.data)
+    if len(obstacle_coords) > 0:
+        style = obstacle_portrayal()
+        marker = style["marker"]
+        xs_o, ys_o = get_screen_coords(obstacle_coords[:, 0], obstacle_coords[:, 1])
+        
+        if marker not in batches:
+            batches[marker] = {"x": [], "y": [], "c": [], "s": [], "z": [], "a": []}
+        
+        batches[marker]["x"].extend(xs_o)
+        batches[marker]["y"].extend(ys_o)
+        batches[marker]["c"].extend([style["color"]] * len(obstacle_coords))
+        batches[marker]["s"].extend([style["size"]] * len(obstacle_coords))
+        batches[marker]["z"].extend([style["zorder"]] * len(obstacle_coords))
+        batches[marker]["a"].extend([style["alpha"]] * len(obstacle_coords))
+
     for marker, data in batches.items():
         ax.scatter(
             data["x"], data["y"], 
@@ -235,7 +251,7 @@ def agent_portrayal(agent: CellAgent) -> dict | None:
     elif isinstance(agent, Hub):
         style.update({"color": "cyan", "marker": "p", "size": 150, "zorder": 4})
     elif isinstance(agent, Obstacle):
-        style.update({"color": "black", "marker": "s", "size": 100})
+        style = obstacle_portrayal()
     elif isinstance(agent, Package):
         style.update({"color": "brown", "marker": "*", "size": 80, "zorder": 5})
     elif isinstance(agent, DropZone):
@@ -245,4 +261,14 @@ def agent_portrayal(agent: CellAgent) -> dict | None:
     else:
         style.update({"color": "gray", "size": 20, "alpha": 0})
     
-    return style
\ No newline at end of file
+    return style
+
+
+def obstacle_portrayal() -> dict:
+    """
+    Visual style attributes of obstacles, shared by Obstacle agents and cells of the obstacle layer.
+
+    Returns:
+        dict: A dictionary of style parameters.
+    """
+    return {"color": "black", "marker": "s", "size": 100, "zorder": 2, "alpha": 1.0}